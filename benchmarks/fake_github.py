@@ -0,0 +1,230 @@
+"""Serve GitHub's API offline from a synthetic repository.
+
+:class:`FakeGitHub` replaces :meth:`requests.adapters.HTTPAdapter.send` while
+active, so that every request made by PyGithub and
+:class:`~changelist._query.GitHubGraphQl` is answered without network access.
+"""
+
+import json
+import re
+from contextlib import contextmanager
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import HTTPAdapter
+from synthetic import SyntheticCommit, SyntheticRepo, SyntheticUser
+
+from changelist._snapshot import build_response, node_ids_of
+
+API = "https://api.github.com"
+
+
+def _user_json(user: SyntheticUser) -> dict:
+    return {
+        "login": user.login,
+        "id": user.id,
+        "node_id": user.node_id,
+        "type": "User",
+        "url": f"{API}/users/{user.login}",
+        "html_url": f"https://github.com/{user.login}",
+    }
+
+
+class FakeGitHub:
+    """Answer the requests changelist makes from a :class:`SyntheticRepo`."""
+
+    PAGE_SIZE = 250
+
+    def __init__(self, repo: SyntheticRepo):
+        self.repo = repo
+        self.requests = 0
+        self._positions = {commit.sha: i for i, commit in enumerate(repo.commits)}
+        self._positions[repo.start_sha] = -1
+
+    @contextmanager
+    def active(self):
+        """Answer all requests while in this context."""
+
+        def send(_adapter, request, **_):
+            return self.respond(request)
+
+        with mock.patch.object(HTTPAdapter, "send", send):
+            yield self
+
+    def respond(self, request):
+        self.requests += 1
+        url = urlsplit(request.url)
+        if url.path == "/graphql":
+            data = self._graphql(json.loads(request.body)["query"])
+            return build_response(request, 200, json.dumps(data).encode())
+        status, data, headers = self._rest(url.path, parse_qs(url.query))
+        body = json.dumps(data).encode()
+        return build_response(request, status, body, headers)
+
+    def _commit_json(self, commit: SyntheticCommit) -> dict:
+        url = f"{API}/repos/{self.repo.org_repo}/commits/{commit.sha}"
+        git_user = {"date": "2024-01-01T00:00:00Z"}
+        return {
+            "sha": commit.sha,
+            "node_id": f"C_{commit.sha}",
+            "url": url,
+            "html_url": f"https://github.com/{self.repo.org_repo}/commit/{commit.sha}",
+            "commit": {
+                "message": commit.message,
+                "author": {
+                    "name": commit.author.name,
+                    "email": commit.author.email,
+                    **git_user,
+                },
+                "committer": {
+                    "name": self.repo.committer.name,
+                    "email": "noreply@github.com",
+                    **git_user,
+                },
+            },
+            "author": _user_json(commit.author),
+            "committer": _user_json(self.repo.committer),
+            "parents": [],
+        }
+
+    def _rest(self, path: str, query: dict) -> tuple[int, object, dict]:
+        prefix = f"/repos/{self.repo.org_repo}"
+        if path == prefix:
+            return (
+                200,
+                {
+                    "id": 1,
+                    "name": self.repo.org_repo.split("/")[1],
+                    "full_name": self.repo.org_repo,
+                    "url": f"{API}{prefix}",
+                },
+                {},
+            )
+        if path.startswith(f"{prefix}/contents/"):
+            return 404, {"message": "Not Found"}, {}
+        if match := re.fullmatch(rf"{prefix}/commits/(\w+)", path):
+            sha = match[1]
+            if sha == self.repo.start_sha:
+                commit = self.repo.commits[0]
+                data = self._commit_json(commit)
+                data["sha"] = sha
+                data["url"] = f"{API}{prefix}/commits/{sha}"
+                return 200, data, {}
+            return 200, self._commit_json(self.repo.by_sha[sha]), {}
+        if match := re.fullmatch(rf"{prefix}/compare/(\w+)\.\.\.(\w+)", path):
+            base, head = (self._positions[sha] for sha in match.groups())
+            in_range = self.repo.commits[base + 1 : head + 1]
+            page = int(query.get("page", ["1"])[0])
+            start = (page - 1) * self.PAGE_SIZE
+            commits = in_range[start : start + self.PAGE_SIZE]
+            headers = {}
+            if start + self.PAGE_SIZE < len(in_range):
+                headers["Link"] = (
+                    f"<{API}{path}?per_page={self.PAGE_SIZE}&page={page + 1}>; "
+                    'rel="next"'
+                )
+            data = {
+                "url": f"{API}{path}",
+                "status": "ahead",
+                "total_commits": len(in_range),
+                "commits": [self._commit_json(commit) for commit in commits],
+            }
+            return 200, data, headers
+        return 404, {"message": f"Not Found: {path}"}, {}
+
+    def _graphql(self, query: str) -> dict:
+        data = {
+            "rateLimit": {
+                "cost": 1,
+                "remaining": 4999,
+                "resetAt": "2030-01-01T00:00:00Z",
+            }
+        }
+        node_ids = node_ids_of(query)
+        if node_ids is not None:
+            data["nodes"] = []
+            for node_id in node_ids:
+                user = self.repo.users[int(node_id.removeprefix("U_"))]
+                data["nodes"].append(
+                    {
+                        "id": user.node_id,
+                        "databaseId": user.id,
+                        "login": user.login,
+                        "name": user.name,
+                        "url": f"https://github.com/{user.login}",
+                    }
+                )
+            return {"data": data}
+
+        repository = data["repository"] = {}
+        for match in re.finditer(r'(\w+): object\(expression: "(\w+)" \)', query):
+            commit = self.repo.by_sha[match[2]]
+            if "associatedPullRequests" in query:
+                repository[match[1]] = self._pulls_of(commit)
+            else:
+                repository[match[1]] = self._authors_of(commit)
+        for match in re.finditer(r"(\w+): pullRequest\(number: (\d+)\)", query):
+            commit = self.repo.by_number[int(match[2])]
+            repository[match[1]] = {
+                **self._pull_node(commit),
+                "reviews": {
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                    "nodes": [
+                        {"author": self._graphql_user(user)}
+                        for user in commit.reviewers
+                    ],
+                },
+            }
+        return {"data": data}
+
+    @staticmethod
+    def _graphql_user(user: SyntheticUser) -> dict:
+        return {"id": user.node_id, "login": user.login, "databaseId": user.id}
+
+    def _actor(self, user: SyntheticUser) -> dict:
+        return {
+            "name": user.name,
+            "email": user.email,
+            "user": self._graphql_user(user),
+        }
+
+    def _authors_of(self, commit: SyntheticCommit) -> dict:
+        authors = [commit.author, *commit.co_authors]
+        return {
+            "oid": commit.sha,
+            "commitUrl": f"https://github.com/{self.repo.org_repo}/commit/{commit.sha}",
+            "authors": {
+                "pageInfo": {"hasNextPage": False, "endCursor": None},
+                "edges": [
+                    {"cursor": str(i), "node": self._actor(user)}
+                    for i, user in enumerate(authors)
+                ],
+            },
+            "committer": self._actor(self.repo.committer),
+        }
+
+    @staticmethod
+    def _pull_node(commit: SyntheticCommit) -> dict:
+        pull = commit.pull
+        return {
+            "number": pull.number,
+            "title": pull.title,
+            "body": pull.body,
+            "url": pull.html_url,
+            "merged": pull.merged,
+            "mergedAt": pull.merged_at.isoformat().replace("+00:00", "Z"),
+            "labels": {
+                "totalCount": len(pull.labels),
+                "nodes": [{"name": label.name} for label in pull.labels],
+            },
+        }
+
+    def _pulls_of(self, commit: SyntheticCommit) -> dict:
+        return {
+            "oid": commit.sha,
+            "commitUrl": f"https://github.com/{self.repo.org_repo}/commit/{commit.sha}",
+            "associatedPullRequests": {
+                "totalCount": 1,
+                "nodes": [self._pull_node(commit)],
+            },
+        }
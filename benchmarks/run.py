@@ -0,0 +1,394 @@
+"""Run changelist's benchmarks offline and compare them to a baseline.
+
+The complete pipeline of :func:`changelist._cli.main` runs against a synthetic
+repository served by :class:`~fake_github.FakeGitHub`, or replays a snapshot of
+GitHub's API recorded with ``--record`` and passed with ``--fixture``. Creating
+notes and formatting them is measured separately on large synthetic inputs.
+
+Examples::
+
+    # Run all benchmarks with small inputs and fail if one is 20% slower than
+    # the committed baseline, as CI does with a wider tolerance
+    python benchmarks/run.py --quick --baseline benchmarks/baseline.json
+
+    # Update the baseline after an intended change
+    python benchmarks/run.py --quick --save-baseline benchmarks/baseline.json
+
+    # Record a real range once (needs GH_TOKEN and network) ...
+    python benchmarks/run.py --record scikit-image/scikit-image v0.22.0 v0.23.0 \\
+        --fixture skimage.json.gz
+    # ... and replay it offline
+    python benchmarks/run.py --fixture skimage.json.gz --history history.jsonl
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+import requests_cache
+import synthetic
+from fake_github import FakeGitHub
+from github import Github
+
+from changelist import _cli
+from changelist._config import add_config_defaults
+from changelist._format import LabelClassifier, MdFormatter, RstFormatter
+from changelist._incremental import commit_info
+from changelist._objects import ChangeNote
+from changelist._query import commits_between, iter_commits_between
+from changelist._snapshot import Snapshot
+
+here = Path(__file__).parent
+
+# Sizes of the inputs, the quick variant is meant for a smoke test
+SIZES = {
+    "full": {"commits": 2000, "pull_requests": 50_000, "contributors": 5000},
+    "quick": {"commits": 200, "pull_requests": 2000, "contributors": 500},
+}
+
+
+def best_of(func: Callable[[], object], *, repeat: int, setup=None) -> float:
+    """Return the fastest of `repeat` calls of `func` in seconds."""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@contextlib.contextmanager
+def isolated_run(tmp_dir: Path):
+    """Keep caches and state of :func:`changelist._cli.main` in `tmp_dir`."""
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(
+            mock.patch.object(_cli, "REQUESTS_CACHE_PATH", tmp_dir / "cache.sqlite")
+        )
+        stack.enter_context(
+            mock.patch.object(_cli, "INCREMENTAL_STATE_DIR", tmp_dir / "state")
+        )
+        stack.enter_context(
+            mock.patch.object(_cli, "IDENTITY_INDEX_PATH", tmp_dir / "identities.json")
+        )
+        stack.enter_context(
+            mock.patch.object(_cli, "FACT_STORE_PATH", tmp_dir / "facts.sqlite")
+        )
+        stack.enter_context(
+            mock.patch.dict(os.environ, {"GH_TOKEN": os.environ.get("GH_TOKEN", "-")})
+        )
+        try:
+            yield
+        finally:
+            requests_cache.uninstall_cache()
+
+
+def run_main(org_repo: str, start_rev: str, stop_rev: str, **kwargs) -> None:
+    """Run the complete pipeline, discarding its output."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        _cli.main(
+            org_repo=org_repo,
+            start_rev=start_rev,
+            stop_rev=stop_rev,
+            version="x.y.z",
+            out=None,
+            formats=["md"],
+            config_path=None,
+            verbose=0,
+            **kwargs,
+        )
+
+
+def bench_replay(fixture: Path, *, repeat: int, jobs: int) -> dict[str, float]:
+    """Time the pipeline replaying a snapshot."""
+    args = Snapshot.load(fixture).args
+    with tempfile.TemporaryDirectory() as tmp, isolated_run(Path(tmp)):
+        seconds = best_of(
+            lambda: run_main(**args, clear_cache=False, jobs=jobs, replay=fixture),
+            repeat=repeat,
+        )
+    return {"pipeline_replay": seconds}
+
+
+def bench_pipeline(api: FakeGitHub, *, repeat: int, jobs: int) -> dict[str, float]:
+    """Time the pipeline with an empty (cold) and a filled (warm) requests cache."""
+    args = {
+        "org_repo": api.repo.org_repo,
+        "start_rev": api.repo.start_sha,
+        "stop_rev": api.repo.stop_sha,
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, isolated_run(Path(tmp)), api.active():
+        results["pipeline_cold"] = best_of(
+            lambda: run_main(**args, clear_cache=True, jobs=jobs), repeat=repeat
+        )
+        results["pipeline_warm"] = best_of(
+            lambda: run_main(**args, clear_cache=False, jobs=jobs), repeat=repeat
+        )
+    return results
+
+
+def traced_memory(func: Callable[[], object]) -> tuple[float, float]:
+    """Return the memory kept by the result of `func` and its peak in MiB."""
+    tracemalloc.start()
+    try:
+        result = func()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained / 2**20, peak / 2**20
+
+
+def bench_memory(api: FakeGitHub) -> dict[str, float]:
+    """Measure the memory of a range's commits and of the complete pipeline.
+
+    Commits are held once as PyGithub objects and once as compact records, as
+    the pipeline keeps them.
+    """
+    repo = api.repo
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, isolated_run(Path(tmp)), api.active():
+        gh = Github(seconds_between_requests=None, retry=None)
+        results["commits_pygithub_mib"], _ = traced_memory(
+            lambda: commits_between(gh, repo.org_repo, repo.start_sha, repo.stop_sha)
+        )
+        results["commits_records_mib"], _ = traced_memory(
+            lambda: {
+                commit_info(commit)
+                for commit in iter_commits_between(
+                    gh, repo.org_repo, repo.start_sha, repo.stop_sha
+                )
+            }
+        )
+        _, results["pipeline_peak_mib"] = traced_memory(
+            lambda: run_main(
+                repo.org_repo, repo.start_sha, repo.stop_sha, clear_cache=True
+            )
+        )
+    return results
+
+
+def bench_notes(sizes: dict, *, repeat: int) -> dict[str, float]:
+    """Time creating and formatting notes of many pull requests and contributors."""
+    config = add_config_defaults({})
+    pulls = synthetic.pull_requests(sizes["pull_requests"])
+    contributors = synthetic.contributors(sizes["contributors"])
+    results = {}
+
+    def change_notes():
+        return ChangeNote.from_pull_requests(
+            pulls,
+            pr_summary_regex=config["pr_summary_regex"],
+            pr_summary_label_regex=config["pr_summary_label_regex"],
+        )
+
+    results["change_notes"] = best_of(change_notes, repeat=repeat)
+    notes = change_notes()
+    results["label_index"] = best_of(
+        lambda: LabelClassifier(config["label_section_map"]).index(notes),
+        repeat=repeat,
+    )
+
+    kwargs = {
+        "repo_name": "repo",
+        "change_notes": notes,
+        "authors": contributors,
+        "reviewers": contributors,
+        "version": "x.y.z",
+        "title_template": config["title_template"],
+        "intro_template": config["intro_template"],
+        "outro_template": config["outro_template"],
+        "label_section_map": config["label_section_map"],
+        "ignored_user_logins": config["ignored_user_logins"],
+    }
+    for name, Formatter in [("format_md", MdFormatter), ("format_rst", RstFormatter)]:
+        # A new formatter each time, so that its sections are sorted again
+        results[name] = best_of(
+            lambda Formatter=Formatter: sum(1 for _ in Formatter(**kwargs)),
+            repeat=repeat,
+        )
+    return results
+
+
+def bench_import(*, repeat: int) -> dict[str, float]:
+    """Time importing the command line interface in a fresh interpreter.
+
+    The cumulative time of ``changelist.__main__`` is taken from the report of
+    ``python -X importtime``, which excludes starting the interpreter itself.
+    """
+    code = "import changelist.__main__"
+    timings = []
+    for _ in range(repeat):
+        stderr = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stderr
+        for line in stderr.splitlines():
+            # Lines are "import time: self [us] | cumulative | imported package"
+            _, cumulative, name = line.split("|")
+            if name.strip() == "changelist.__main__":
+                timings.append(int(cumulative) / 1e6)
+    return {"import_cli": min(timings)}
+
+
+def record(fixture: Path, org_repo: str, start_rev: str, stop_rev: str) -> None:
+    """Run the pipeline against GitHub's API and save a snapshot of it."""
+    with tempfile.TemporaryDirectory() as tmp, isolated_run(Path(tmp)):
+        run_main(org_repo, start_rev, stop_rev, clear_cache=False, record=fixture)
+    print(f"Recorded snapshot {fixture}")
+
+
+def environment() -> dict:
+    """Describe where the benchmarks ran, to make results comparable."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=here,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+
+
+def _unit(name: str) -> str:
+    return "MiB" if name.endswith("_mib") else "s"
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return a message for each result worse than its baseline by `tolerance`."""
+    messages = []
+    for name, value in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if value > reference * (1 + tolerance):
+            unit = _unit(name)
+            messages.append(
+                f"{name}: {value:.3f} {unit} is {value / reference - 1:.0%} worse "
+                f"than the baseline of {reference:.3f} {unit}"
+            )
+    return messages
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--quick", action="store_true", help="Use small inputs for a smoke test"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Use the fastest of this many runs"
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=1)
+    parser.add_argument(
+        "--fixture",
+        type=Path,
+        help="Replay recorded API responses instead of a synthetic repository",
+    )
+    parser.add_argument(
+        "--record",
+        nargs=3,
+        metavar=("ORG_REPO", "START_REV", "STOP_REV"),
+        help="Record the responses for a range to --fixture and exit",
+    )
+    parser.add_argument(
+        "--only",
+        choices=["pipeline", "notes", "memory", "import"],
+        help="Run only one group of benchmarks",
+    )
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument(
+        "--history", type=Path, help="Append results to this JSON lines file"
+    )
+    parser.add_argument(
+        "--baseline", type=Path, help="Fail if results regress compared to this file"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown relative to the baseline, defaults to 0.2 (20%%)",
+    )
+    parser.add_argument(
+        "--save-baseline", type=Path, help="Write results as a new baseline"
+    )
+    args = parser.parse_args(argv)
+    # Warnings about e.g. unlabeled pull requests would only skew the timings
+    logging.disable(logging.WARNING)
+
+    if args.record:
+        if args.fixture is None:
+            parser.error("--record requires --fixture")
+        record(args.fixture, *args.record)
+        return 0
+
+    sizes = SIZES["quick" if args.quick else "full"]
+    results = {}
+    if args.only in (None, "pipeline"):
+        if args.fixture is not None:
+            results |= bench_replay(args.fixture, repeat=args.repeat, jobs=args.jobs)
+        else:
+            api = FakeGitHub(synthetic.SyntheticRepo.generate(sizes["commits"]))
+            results |= bench_pipeline(api, repeat=args.repeat, jobs=args.jobs)
+    if args.only in (None, "notes"):
+        results |= bench_notes(sizes, repeat=args.repeat)
+    if args.only in (None, "memory"):
+        api = FakeGitHub(synthetic.SyntheticRepo.generate(sizes["commits"]))
+        results |= bench_memory(api)
+    if args.only in (None, "import"):
+        results |= bench_import(repeat=args.repeat)
+
+    for name, value in results.items():
+        print(f"{name:<20} {value:>10.3f} {_unit(name)}")
+
+    record_ = {
+        **environment(),
+        "sizes": sizes,
+        "fixture": None if args.fixture is None else str(args.fixture),
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(record_, indent=2))
+    if args.history:
+        with args.history.open("a") as fp:
+            fp.write(json.dumps(record_) + "\n")
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        failed = regressions(
+            results, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for message in failed:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
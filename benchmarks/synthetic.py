@@ -0,0 +1,219 @@
+"""Generate synthetic repositories, pull requests and contributors.
+
+All data is derived from a seeded random generator, so that every run of the
+benchmarks works on the same input.
+"""
+
+import hashlib
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from changelist._objects import Contributor
+from changelist._records import Label, PullRequestInfo
+
+LABELS = [
+    "Highlight",
+    "New feature",
+    "API",
+    "Enhancement",
+    "Performance",
+    "Bug fix",
+    "Documentation",
+    "Infrastructure",
+    "Maintenance",
+    "Needs review",
+    "good first issue",
+    "backport candidate",
+    "sprint",
+    "priority: high",
+    "priority: low",
+]
+
+WORDS = [
+    "array",
+    "image",
+    "filter",
+    "segment",
+    "transform",
+    "graph",
+    "measure",
+    "region",
+    "label",
+    "feature",
+    "registration",
+    "morphology",
+    "restoration",
+    "exposure",
+    "color",
+    "util",
+    "io",
+    "draw",
+    "data",
+    "support",
+    "handle",
+    "fix",
+    "add",
+    "improve",
+    "deprecate",
+    "remove",
+    "docs",
+    "test",
+    "speed",
+    "memory",
+]
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _body(rng: random.Random, paragraphs: int) -> str:
+    """Return a long pull request description, sometimes with release notes."""
+    parts = [
+        " ".join(_sentence(rng, 12) + "." for _ in range(6)) for _ in range(paragraphs)
+    ]
+    if rng.random() < 0.5:
+        label = rng.choice(LABELS)
+        parts.insert(
+            rng.randrange(len(parts) + 1),
+            f'```release-note {{label="{label}"}}\n{_sentence(rng, 15)}.\n```',
+        )
+    return "\n\n".join(parts)
+
+
+def pull_requests(
+    count: int, *, seed: int = 0, paragraphs: int = 8, max_labels: int = 8
+) -> set[PullRequestInfo]:
+    """Return `count` merged pull requests with long bodies and many labels."""
+    rng = random.Random(seed)
+    pulls = set()
+    for number in range(1, count + 1):
+        labels = rng.sample(LABELS, rng.randint(0, max_labels))
+        pulls.add(
+            PullRequestInfo(
+                number=number,
+                title=_sentence(rng, 8),
+                body=_body(rng, paragraphs),
+                labels=tuple(Label(name=name) for name in labels),
+                merged=True,
+                merged_at=EPOCH + timedelta(minutes=number),
+                html_url=f"https://github.com/org/repo/pull/{number}",
+            )
+        )
+    return pulls
+
+
+def contributors(count: int, *, seed: int = 0) -> set[Contributor]:
+    """Return `count` contributors, some without a display name."""
+    rng = random.Random(seed)
+    return {
+        Contributor(
+            name=None if rng.random() < 0.2 else f"{_sentence(rng, 2)} {i}",
+            login=f"user{i}",
+            reference_url=f"https://github.com/user{i}",
+        )
+        for i in range(count)
+    }
+
+
+@dataclass(frozen=True)
+class SyntheticUser:
+    id: int
+    login: str
+    name: str
+
+    @property
+    def node_id(self) -> str:
+        return f"U_{self.id}"
+
+    @property
+    def email(self) -> str:
+        return f"{self.login}@example.org"
+
+
+@dataclass(frozen=True)
+class SyntheticCommit:
+    sha: str
+    message: str
+    author: SyntheticUser
+    co_authors: tuple[SyntheticUser, ...]
+    pull: PullRequestInfo
+    reviewers: tuple[SyntheticUser, ...]
+
+
+@dataclass
+class SyntheticRepo:
+    """A repository with one squash-merged pull request per commit.
+
+    Commits are listed from oldest to newest. `start_rev` is the commit before
+    the first one, i.e. it isn't part of the range.
+    """
+
+    org_repo: str
+    start_sha: str
+    commits: list[SyntheticCommit]
+    users: dict[int, SyntheticUser]
+    committer: SyntheticUser
+    by_sha: dict[str, SyntheticCommit] = field(init=False)
+    by_number: dict[int, SyntheticCommit] = field(init=False)
+
+    def __post_init__(self):
+        self.by_sha = {commit.sha: commit for commit in self.commits}
+        self.by_number = {commit.pull.number: commit for commit in self.commits}
+
+    @property
+    def stop_sha(self) -> str:
+        return self.commits[-1].sha
+
+    @classmethod
+    def generate(
+        cls,
+        commits: int,
+        *,
+        users: int = 300,
+        org_repo: str = "org/repo",
+        seed: int = 0,
+    ) -> "SyntheticRepo":
+        """Generate a repository with `commits` commits by `users` people."""
+        rng = random.Random(seed)
+        people = [
+            SyntheticUser(id=1000 + i, login=f"user{i}", name=f"User {i}")
+            for i in range(users)
+        ]
+        committer = SyntheticUser(id=19864447, login="web-flow", name="GitHub")
+        pulls = sorted(
+            pull_requests(commits, seed=seed, paragraphs=2), key=lambda p: p.number
+        )
+
+        def sha(i):
+            return hashlib.sha1(f"{org_repo}-{seed}-{i}".encode()).hexdigest()
+
+        synthetic_commits = []
+        for i, pull in enumerate(pulls, start=1):
+            author = rng.choice(people)
+            co_authors = tuple(
+                rng.sample(people, rng.randint(1, 3)) if rng.random() < 0.2 else ()
+            )
+            trailers = "".join(
+                f"\nCo-authored-by: {user.name} <{user.email}>" for user in co_authors
+            )
+            synthetic_commits.append(
+                SyntheticCommit(
+                    sha=sha(i),
+                    message=f"{pull.title} (#{pull.number})\n{trailers}",
+                    author=author,
+                    co_authors=co_authors,
+                    pull=pull,
+                    reviewers=tuple(rng.sample(people, rng.randint(0, 3))),
+                )
+            )
+        return cls(
+            org_repo=org_repo,
+            start_sha=sha(0),
+            commits=synthetic_commits,
+            users={user.id: user for user in [*people, committer]},
+            committer=committer,
+        )
@@ -0,0 +1,190 @@
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import timedelta
+from functools import partial
+from pathlib import Path
+from typing import Union
+
+import requests
+import requests_cache
+from requests_cache import DO_NOT_CACHE, NEVER_EXPIRE, CacheMixin
+from requests_cache.session import OriginalSession
+
+from ._http import RequestPolicy
+from ._profile import Profile
+from ._ratelimit import RateLimitScheduler
+from ._snapshot import Snapshot
+
+logger = logging.getLogger(__name__)
+
+ExpireAfter = Union[int, timedelta]
+
+# PyGithub includes the default port in its URLs, other clients don't
+_API = r"^https://api\.github\.com(?::443)?"
+_REPO = rf"{_API}/repos/[^/]+/[^/]+"
+_SHA = r"[0-9a-f]{40}"
+_END = r"(?:\?|$)"
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """Decide how long responses of GitHub's API are cached, based on their URL.
+
+    Responses that are addressed by an immutable identifier are kept
+    indefinitely (`immutable_expire_after`). This includes commits and
+    comparisons addressed by SHA. GraphQL queries are sent to a single URL, so
+    queries for the authors of commit SHAs are marked as immutable per request
+    by :class:`~changelist._query.GitHubGraphQl`.
+
+    Requests that resolve a branch name or tag, e.g. comparing to "main" or
+    reading the configuration at `stop_rev`, expire quickly
+    (`ref_expire_after`). The rate limit is never cached, so that it's always
+    current. Everything else, e.g. user profiles and pull requests, including
+    those associated with a commit SHA, whose titles, descriptions, labels and
+    reviews are edited even after they're merged, expires after
+    `default_expire_after`.
+
+    GraphQL responses with errors aren't cached at all, see :meth:`is_cacheable`.
+
+    Expired responses aren't discarded. They are revalidated with a conditional
+    request using their `ETag` or `Last-Modified` header. If GitHub answers
+    "304 Not Modified", the cached response is used and its expiration is
+    renewed. Such requests transfer almost nothing and don't count against
+    GitHub's primary rate limit.
+    """
+
+    immutable_expire_after: ExpireAfter = NEVER_EXPIRE
+    ref_expire_after: ExpireAfter = timedelta(minutes=5)
+    default_expire_after: ExpireAfter = timedelta(hours=1)
+
+    def urls_expire_after(self) -> dict[re.Pattern, ExpireAfter]:
+        """Return URL patterns mapped to their expiration, first match wins.
+
+        Can be passed as `urls_expire_after` to :class:`requests_cache.CachedSession`.
+        """
+        immutable = [
+            rf"{_REPO}/commits/{_SHA}{_END}",
+            rf"{_REPO}/compare/{_SHA}\.\.\.{_SHA}{_END}",
+            rf"{_REPO}/contents/[^?]+\?(?:.*&)?ref={_SHA}(?:&|$)",
+        ]
+        refs = [
+            rf"{_REPO}/commits/[^/?]+{_END}",
+            rf"{_REPO}/compare/",
+            rf"{_REPO}/contents/",
+        ]
+        patterns = {re.compile(rf"{_API}/rate_limit{_END}"): DO_NOT_CACHE}
+        for pattern in immutable:
+            patterns[re.compile(pattern)] = self.immutable_expire_after
+        for pattern in refs:
+            patterns[re.compile(pattern)] = self.ref_expire_after
+        return patterns
+
+    @staticmethod
+    def is_cacheable(response: requests.Response) -> bool:
+        """Return whether `response` may be cached.
+
+        GraphQL errors, e.g. a timeout or an exhausted rate limit, are reported
+        with status 200. Caching them would repeat the error in every later run.
+
+        Can be passed as `filter_fn` to :class:`requests_cache.CachedSession`.
+        """
+        if not re.match(rf"{_API}/graphql{_END}", response.url or ""):
+            return True
+        # Avoid parsing large results that can't contain errors
+        if b'"errors"' not in response.content:
+            return True
+        try:
+            data = response.json()
+        except ValueError:
+            return False
+        return isinstance(data, dict) and "errors" not in data
+
+
+@dataclass
+class CacheStats:
+    """Count requests that were answered by the cache or by GitHub.
+
+    Expired responses that GitHub confirmed to be unchanged ("304 Not Modified")
+    count as hits, and as `revalidated`.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def __str__(self) -> str:
+        return (
+            f"{self.hits} cache hits, {self.misses} cache misses, "
+            f"{self.revalidated} revalidated (304)"
+        )
+
+    def record(self, response: requests.Response) -> None:
+        """Count `response` as a hit or miss."""
+        with self._lock:
+            if getattr(response, "from_cache", False):
+                self.hits += 1
+                self.revalidated += getattr(response, "revalidated", False)
+            else:
+                self.misses += 1
+
+
+def install_cache(
+    cache_path: Path,
+    *,
+    policy: Union[CachePolicy, None] = None,
+    stats: Union[CacheStats, None] = None,
+    scheduler: Union[RateLimitScheduler, None] = None,
+    request_policy: Union[RequestPolicy, None] = None,
+    profile: Union[Profile, None] = None,
+    snapshot: Union[Snapshot, None] = None,
+    backend: str = "sqlite",
+) -> CacheStats:
+    """Install a global requests cache following `policy`.
+
+    Affects all requests made with :mod:`requests`, including those of PyGithub.
+    Requests that aren't answered by the cache are sent through `scheduler` and
+    `request_policy`, if given, and are recorded in or answered by `snapshot`.
+    Every response is recorded in `stats` and `profile`. Returns the statistics
+    that are updated with each request.
+    """
+    policy = CachePolicy() if policy is None else policy
+    stats = CacheStats() if stats is None else stats
+
+    # `requests.Session` itself is replaced while a cache is installed
+    class ScheduledSession(OriginalSession):
+        # Placed after `CacheMixin` in the MRO, so that only requests that are
+        # actually sent to GitHub pass through the scheduler and policy
+        def send(self, request, **kwargs):
+            send = super().send
+            if snapshot is not None:
+                send = partial(snapshot.send, send)
+            if request_policy is not None:
+                send = partial(request_policy.send, send)
+            if scheduler is None:
+                return send(request, **kwargs)
+            return scheduler.send(send, request, **kwargs)
+
+    class CountingCachedSession(CacheMixin, ScheduledSession):
+        def send(self, request, **kwargs):
+            response = super().send(request, **kwargs)
+            stats.record(response)
+            if profile is not None:
+                profile.record(response)
+            return response
+
+    requests_cache.install_cache(
+        cache_path,
+        backend=backend,
+        session_factory=CountingCachedSession,
+        expire_after=policy.default_expire_after,
+        urls_expire_after=policy.urls_expire_after(),
+        filter_fn=policy.is_cacheable,
+        # Allow caching GraphQL queries, which are sent as POST requests
+        allowable_methods=("GET", "HEAD", "POST"),
+    )
+    return stats
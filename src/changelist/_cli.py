@@ -1,19 +1,25 @@
 import argparse
+import dataclasses
 import logging
+import math
 import os
 import sys
 import tempfile
+import warnings
+from functools import partial
 from pathlib import Path
-from typing import Callable
+from typing import TYPE_CHECKING, Callable, Union
 
-import requests_cache
-from github import Github
-from tqdm import tqdm
+from ._manifest import ManifestEntry, read_manifest
+from ._model import parse_formats
+from ._output import out_path, write_lines
 
-from ._config import add_config_defaults, local_config, remote_config
-from ._format import MdFormatter, RstFormatter
-from ._objects import ChangeNote, Contributor
-from ._query import commits_between, contributors, pull_requests_from_commits
+# Modules that import PyGithub, requests and the like are only imported once
+# `main` runs, so that `--help` and invalid arguments are answered right away
+if TYPE_CHECKING:
+    import requests
+
+    from ._objects import Contributor
 
 logger = logging.getLogger(__name__)
 
@@ -21,18 +27,53 @@ here = Path(__file__).parent
 
 REQUESTS_CACHE_PATH = Path(tempfile.gettempdir()) / "github_cache.sqlite"
 
+INCREMENTAL_STATE_DIR = Path(tempfile.gettempdir()) / "changelist_state"
+
+IDENTITY_INDEX_PATH = Path(tempfile.gettempdir()) / "changelist_identities.json"
+
+FACT_STORE_PATH = Path(tempfile.gettempdir()) / "changelist_facts.sqlite"
+
 GH_URL = "https://github.com"
 
 
-def lazy_tqdm(*args, **kwargs):
-    """Defer initialization of progress bar until first item is requested.
+def _format_list(value: str) -> list[str]:
+    """Parse the option `--format` with :func:`parse_formats`."""
+    try:
+        return parse_formats(value)
+    except ValueError as e:
+        # Reported as usage error, other than the generic one for ValueError
+        raise argparse.ArgumentTypeError(str(e)) from e
 
-    Calling `tqdm(...)` prints the progress bar right there and then. This can scramble
-    output, if more than one progress bar are initialized at the same time but their
-    iteration is meant to be done later in successive order.
-    """
-    kwargs["file"] = kwargs.get("file", sys.stderr)
-    yield from tqdm(*args, **kwargs)
+
+def _write_contributors(
+    path: Path,
+    *,
+    authors: "set[Contributor]",
+    reviewers: "set[Contributor]",
+    repo_count: int,
+    version: str,
+    format: str,
+) -> None:
+    """Write the combined contributors of many repositories to `path`."""
+    from ._config import add_config_defaults
+    from ._format import MdFormatter, RstFormatter
+
+    config = add_config_defaults({})
+    Formatter = {"md": MdFormatter, "rst": RstFormatter}[format]
+    formatter = Formatter(
+        repo_name="",
+        change_notes=set(),
+        authors=authors,
+        reviewers=reviewers,
+        version=version,
+        title_template=f"Contributors to {repo_count} repositories",
+        intro_template="",
+        outro_template=config["outro_template"],
+        label_section_map={},
+        # Ignored logins of each repository were already removed
+        ignored_user_logins=(),
+    )
+    write_lines(formatter.iter_lines(), str(path))
 
 
 def parse_command_line(func: Callable) -> Callable:
@@ -41,19 +82,24 @@ def parse_command_line(func: Callable) -> Callable:
     Has no effect if any keyword argument is passed to the underlying function.
     """
     parser = argparse.ArgumentParser(
-        usage="Prepare an automatic changelog from GitHub's pull requests."
+        usage="Prepare an automatic changelog from GitHub's pull requests.",
+        epilog="Run 'changelist render --help' to render notes saved with "
+        "'--format json'.",
     )
     parser.add_argument(
         "org_repo",
+        nargs="?",
         help="Org and repo name of a repository on GitHub (delimited by a slash), "
         "e.g. 'scientific-python/changelist'",
     )
     parser.add_argument(
         "start_rev",
+        nargs="?",
         help="The starting revision (excluded), e.g. the tag of the previous release",
     )
     parser.add_argument(
         "stop_rev",
+        nargs="?",
         help="The stop revision (included), e.g. the 'main' branch or the current "
         "release",
     )
@@ -65,14 +111,19 @@ def parse_command_line(func: Callable) -> Callable:
     parser.add_argument("--out", help="Write to file, prints to STDOUT otherwise")
     parser.add_argument(
         "--format",
-        choices=["rst", "md"],
+        dest="formats",
+        type=_format_list,
         default="md",
-        help="Choose format, defaults to Markdown",
+        help="Choose format, defaults to Markdown ('md'). Several formats, e.g. "
+        "'md,rst,json', are rendered from one fetch and require --out with a "
+        "'{format}' placeholder. 'json' saves the notes, to be rendered later "
+        "with the 'render' command",
     )
     parser.add_argument(
         "--clear-cache",
         action="store_true",
-        help="Clear cached requests to GitHub's API before running",
+        help="Clear cached requests to GitHub's API, known identities and facts "
+        "before running",
     )
     parser.add_argument(
         "--config",
@@ -80,6 +131,109 @@ def parse_command_line(func: Callable) -> Callable:
         help="Path to local TOML configuration (falls back on remote "
         "pyproject.toml or default config if not given)",
     )
+    parser.add_argument(
+        "--backend",
+        choices=["graphql", "rest"],
+        default="graphql",
+        help="API used to find the pull requests of each commit, defaults to "
+        "GraphQL which resolves many commits per request",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of concurrent requests to GitHub's API, defaults to 1",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse the results of a previous run for the same range and only "
+        "fetch commits that were added since then",
+    )
+    parser.add_argument(
+        "--git-dir",
+        help="Path to a local clone of the repository, if given commits and the "
+        "configuration are read from it instead of fetched from GitHub (requires "
+        "the GraphQL backend)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=30.0,
+        help="Seconds a request to GitHub may stall before it's retried or fails, "
+        "defaults to 30",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Number of retries for reads that failed due to connection errors, "
+        "timeouts or server errors, defaults to 3",
+    )
+    parser.add_argument(
+        "--hedge-after",
+        type=float,
+        help="Send a duplicate of a read that didn't complete within this many "
+        "seconds and use the first response, disabled by default",
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="Abort if requests to GitHub are still needed after this many seconds",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the time spent in each stage, the requests per endpoint, "
+        "cache statistics and rate limit consumption",
+    )
+    parser.add_argument(
+        "--profile-out",
+        help="Write the profile as JSON to this file, e.g. to track it in CI",
+    )
+    parser.add_argument(
+        "--releases",
+        nargs="+",
+        metavar="TAG",
+        help="Tags of releases between start_rev and stop_rev in order, writes "
+        "notes for each release to --out, which must contain '{version}'. "
+        "Resources shared by the releases are fetched only once",
+    )
+    parser.add_argument(
+        "--manifest",
+        help="File with an 'org/repo start_rev stop_rev [version]' per line to "
+        "prepare notes for many repositories at once, instead of the positional "
+        "arguments. Writes to --out, which must contain '{repo_name}' (and may "
+        "contain '{org_name}')",
+    )
+    parser.add_argument(
+        "--repo-jobs",
+        type=int,
+        default=4,
+        help="Number of repositories of a --manifest processed concurrently, "
+        "defaults to 4",
+    )
+    parser.add_argument(
+        "--contributors-out",
+        help="Write all authors and reviewers across the repositories to this file",
+    )
+    parser.add_argument(
+        "--record",
+        help="Record every response from GitHub's API that the run needs to this "
+        "compressed snapshot file, bypassing the requests cache",
+    )
+    parser.add_argument(
+        "--replay",
+        help="Run from a snapshot file created with --record instead of accessing "
+        "the network, e.g. to iterate on the configuration",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only estimate the number of requests and the GraphQL points needed "
+        "for the range and compare them to the remaining rate limits",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -90,95 +244,319 @@ def parse_command_line(func: Callable) -> Callable:
 
     def wrapped(**kwargs):
         if not kwargs:
+            if sys.argv[1:2] == ["render"]:
+                return render(**vars(_render_parser().parse_args(sys.argv[2:])))
             kwargs = vars(parser.parse_args())
+            if kwargs["manifest"] is None and kwargs["stop_rev"] is None:
+                parser.error("org_repo, start_rev and stop_rev are required")
         return func(**kwargs)
 
     return wrapped
 
 
+def _render_parser() -> argparse.ArgumentParser:
+    """Define command line options of the `render` command."""
+    parser = argparse.ArgumentParser(
+        prog="changelist render",
+        description="Render notes saved with '--format json' without accessing GitHub.",
+    )
+    parser.add_argument(
+        "model",
+        help="File with the saved notes, may hold the notes of several "
+        "repositories or releases, one per line",
+    )
+    parser.add_argument(
+        "--format",
+        dest="formats",
+        type=_format_list,
+        default="md",
+        help="Choose format, defaults to Markdown ('md'). Several formats, e.g. "
+        "'md,rst', require --out with a '{format}' placeholder",
+    )
+    parser.add_argument(
+        "--out",
+        help="Write to file, prints to STDOUT otherwise. May contain the "
+        "placeholders '{repo_name}' and '{version}'",
+    )
+    return parser
+
+
+def render(*, model: str, formats: list[str], out: Union[str, None]) -> None:
+    """Render notes saved with the format "json" in each of `formats`."""
+    from ._model import load_models
+
+    if len(formats) > 1 and "{format}" not in (out or ""):
+        raise ValueError("several formats require `out` with a '{format}' placeholder")
+    models = load_models(Path(model))
+    written = set()
+    for notes in models:
+        for format_ in formats:
+            notes_out = out and out_path(
+                out, repo_name=notes.repo_name, version=notes.version, format=format_
+            )
+            if notes_out and notes_out in written:
+                msg = f"notes of several releases would overwrite {notes_out}"
+                raise ValueError(msg)
+            write_lines(notes.iter_lines(format_), notes_out)
+            if notes_out:
+                written.add(notes_out)
+                print(f"Notes written to {notes_out}", file=sys.stderr)
+
+
 @parse_command_line
 def main(
     *,
-    org_repo: str,
-    start_rev: str,
-    stop_rev: str,
+    org_repo: Union[str, None],
+    start_rev: Union[str, None],
+    stop_rev: Union[str, None],
     version: str,
     out: str,
-    format: str,
+    formats: Union[list[str], None] = None,
     clear_cache: bool,
     config_path: str,
     verbose: int,
+    backend: str = "graphql",
+    jobs: int = 1,
+    incremental: bool = False,
+    git_dir: Union[str, None] = None,
+    dry_run: bool = False,
+    timeout: float = 30.0,
+    retries: int = 3,
+    hedge_after: Union[float, None] = None,
+    budget: Union[float, None] = None,
+    profile: bool = False,
+    profile_out: Union[str, None] = None,
+    releases: Union[list[str], None] = None,
+    manifest: Union[str, None] = None,
+    repo_jobs: int = 4,
+    contributors_out: Union[str, None] = None,
+    record: Union[str, None] = None,
+    replay: Union[str, None] = None,
+    session: "Union[requests.Session, None]" = None,
+    format: Union[str, None] = None,
 ):
     """Main function of the script.
 
     See :func:`parse_command_line` for a description of the accepted input.
+    `session` is used for requests to GitHub's GraphQL API, by default a new one
+    with a connection pool sized for `jobs`. `format` is a deprecated alias of
+    `formats` that accepts the option's comma-separated string, e.g. "md,rst".
     """
+    if format is not None:
+        warnings.warn(
+            "`format` is deprecated, use `formats` instead",
+            DeprecationWarning,
+            # Point at the caller of the function wrapped by `parse_command_line`
+            stacklevel=3,
+        )
+        if formats is not None:
+            raise ValueError("`format` and `formats` can't be used together")
+        formats = parse_formats(format)
+    if formats is None:
+        formats = ["md"]
+
     level = {0: logging.WARNING, 1: logging.INFO}.get(verbose, logging.DEBUG)
     logger.setLevel(level)
 
-    requests_cache.install_cache(
-        REQUESTS_CACHE_PATH, backend="sqlite", expire_after=3600
+    if git_dir is not None and backend != "graphql":
+        raise ValueError("`git_dir` requires the GraphQL backend")
+    if record is not None and replay is not None:
+        raise ValueError("`record` and `replay` can't be used together")
+    if releases and "{version}" not in (out or ""):
+        raise ValueError("`releases` requires `out` with a '{version}' placeholder")
+
+    if len(formats) > 1 and "{format}" not in (out or ""):
+        raise ValueError("several formats require `out` with a '{format}' placeholder")
+    # Contributors are only written in formats meant to be read
+    contributor_formats = [f for f in formats if f != "json"]
+    if contributors_out:
+        if not contributor_formats:
+            raise ValueError("`contributors_out` requires the format 'md' or 'rst'")
+        if len(contributor_formats) > 1 and "{format}" not in contributors_out:
+            raise ValueError(
+                "several formats require `contributors_out` with a '{format}' "
+                "placeholder"
+            )
+
+    if manifest is None:
+        if None in (org_repo, start_rev, stop_rev):
+            raise ValueError("`org_repo`, `start_rev` and `stop_rev` are required")
+        entries = [ManifestEntry(org_repo, start_rev, stop_rev)]
+        snapshot_args = {
+            "org_repo": org_repo,
+            "start_rev": start_rev,
+            "stop_rev": stop_rev,
+        }
+        if releases:
+            snapshot_args["releases"] = list(releases)
+    else:
+        if org_repo is not None:
+            raise ValueError(
+                "`manifest` replaces `org_repo`, `start_rev` and `stop_rev`"
+            )
+        if releases or git_dir is not None:
+            raise ValueError("`manifest` can't be used with `releases` or `git_dir`")
+        if "{repo_name}" not in (out or ""):
+            raise ValueError(
+                "`manifest` requires `out` with a '{repo_name}' placeholder"
+            )
+        entries = read_manifest(Path(manifest))
+        snapshot_args = {"manifest": [dataclasses.astuple(e) for e in entries]}
+
+    import requests_cache
+    from github import Github
+
+    from ._cache import install_cache
+    from ._facts import FactStore
+    from ._http import LatencyStats, RequestPolicy, create_session
+    from ._identity import IdentityIndex
+    from ._pipeline import RunContext, notes_for_repo, print_estimates
+    from ._profile import Profile
+    from ._query import map_concurrently
+    from ._ratelimit import RateLimitScheduler
+    from ._snapshot import Snapshot
+
+    snapshot = None
+    if replay is not None:
+        snapshot = Snapshot.load(Path(replay))
+        if snapshot.args != snapshot_args:
+            msg = f"snapshot {replay} was recorded for {snapshot.args}"
+            raise ValueError(msg)
+    elif record is not None:
+        snapshot = Snapshot(snapshot_args)
+    # Repositories are processed concurrently, each with up to `jobs` requests
+    repo_jobs = min(repo_jobs, len(entries))
+    pool_size = max(jobs * repo_jobs, 10)
+
+    scheduler = RateLimitScheduler()
+    latencies = LatencyStats()
+    request_policy = RequestPolicy(
+        timeout=timeout,
+        retries=retries,
+        hedge_after=hedge_after,
+        budget=budget,
+        latencies=latencies,
+    )
+    run_profile = Profile(scheduler=scheduler, latencies=latencies)
+    cache_stats = install_cache(
+        REQUESTS_CACHE_PATH,
+        scheduler=scheduler,
+        request_policy=request_policy,
+        profile=run_profile,
+        snapshot=snapshot,
+        # A snapshot must neither be answered from nor leak into the persistent cache
+        backend="sqlite" if snapshot is None else "memory",
     )
-    print(f"Using requests cache at {REQUESTS_CACHE_PATH}", file=sys.stderr)
+    if replay is not None:
+        print(f"Replaying snapshot {replay}", file=sys.stderr)
+    elif record is not None:
+        print(f"Recording snapshot to {record}", file=sys.stderr)
+    else:
+        print(f"Using requests cache at {REQUESTS_CACHE_PATH}", file=sys.stderr)
     if clear_cache:
         requests_cache.clear()
         logger.info("cleared requests cache at %s", REQUESTS_CACHE_PATH)
+    # Runs with a snapshot neither read nor write the persistent stores below
+    if clear_cache and snapshot is None:
+        IDENTITY_INDEX_PATH.unlink(missing_ok=True)
+        logger.info("cleared identity index at %s", IDENTITY_INDEX_PATH)
+        FACT_STORE_PATH.unlink(missing_ok=True)
+        logger.info("cleared fact store at %s", FACT_STORE_PATH)
 
     gh_token = os.environ.get("GH_TOKEN")
-    if gh_token is None:
+    # Replays don't access GitHub
+    if gh_token is None and replay is None:
         raise RuntimeError(
             "You need to set the environment variable `GH_TOKEN`. "
             "The token is used to avoid rate limiting, "
             "and can be created at https://github.com/settings/tokens.\n\n"
             "The token does not require any permissions (we only use the public API)."
         )
-    gh = Github(gh_token)
+    # Requests are paced by `scheduler` instead of PyGithub's fixed delay, which
+    # applies to cached responses as well. PyGithub's own retries would happen
+    # below `scheduler` and `request_policy`, unseen by both, and multiply theirs.
+    # PyGithub sends its own timeout, in whole seconds, with every request
+    gh = Github(
+        gh_token,
+        pool_size=pool_size,
+        seconds_between_requests=None,
+        retry=None,
+        timeout=math.ceil(timeout),
+    )
+
+    if dry_run:
+        print_estimates(
+            gh,
+            entries,
+            backend=backend,
+            git_dir=None if git_dir is None else Path(git_dir),
+        )
+        if record is not None:
+            snapshot.save(Path(record))
+        return
 
-    if config_path is None:
-        config = remote_config(gh, org_repo, rev=stop_rev)
+    if snapshot is None:
+        identities = IdentityIndex.load(IDENTITY_INDEX_PATH)
+        facts = FactStore(FACT_STORE_PATH)
     else:
-        config = local_config(Path(config_path))
-    config = add_config_defaults(config)
-
-    print("Fetching commits...", file=sys.stderr)
-    commits = commits_between(gh, org_repo, start_rev, stop_rev)
-    pull_requests = pull_requests_from_commits(
-        lazy_tqdm(commits, desc="Fetching pull requests")
-    )
-    authors, reviewers = contributors(
+        # Start from scratch, so that a replay needs the same requests as its
+        # recording
+        identities = IdentityIndex()
+        facts = None
+    run = RunContext(
         gh=gh,
-        org_repo=org_repo,
-        commits=lazy_tqdm(commits, desc="Fetching authors"),
-        pull_requests=lazy_tqdm(pull_requests, desc="Fetching reviewers"),
+        session=session or create_session(pool_size=pool_size),
+        scheduler=scheduler,
+        identities=identities,
+        facts=facts,
+        state_dir=INCREMENTAL_STATE_DIR,
+        formats=tuple(formats),
+        backend=backend,
+        jobs=jobs,
+        incremental=incremental,
+        git_dir=None if git_dir is None else Path(git_dir),
+        config_path=None if config_path is None else Path(config_path),
+        releases=tuple(releases or ()),
+        # Progress bars of concurrent repositories would garble each other
+        quiet=repo_jobs > 1,
     )
 
-    print("Formatting notes...", file=sys.stderr)
-    change_notes = ChangeNote.from_pull_requests(
-        pull_requests,
-        pr_summary_regex=config["pr_summary_regex"],
-        pr_summary_label_regex=config["pr_summary_label_regex"],
-    )
+    with run_profile.activate():
+        all_authors, all_reviewers = set(), set()
+        for authors, reviewers in map_concurrently(
+            partial(notes_for_repo, run, version=version, out=out),
+            entries,
+            jobs=repo_jobs,
+        ):
+            all_authors |= authors
+            all_reviewers |= reviewers
+        if snapshot is None:
+            identities.save()
+            facts.close()
 
-    Formatter = {"md": MdFormatter, "rst": RstFormatter}[format]
-    formatter = Formatter(
-        repo_name=org_repo.split("/")[-1],
-        change_notes=change_notes,
-        authors=Contributor.from_named_users(authors),
-        reviewers=Contributor.from_named_users(reviewers),
-        version=version,
-        title_template=config["title_template"],
-        intro_template=config["intro_template"],
-        outro_template=config["outro_template"],
-        label_section_map=config["label_section_map"],
-        ignored_user_logins=config["ignored_user_logins"],
-    )
+        if contributors_out:
+            for format_ in contributor_formats:
+                path = Path(out_path(contributors_out, format=format_))
+                _write_contributors(
+                    path,
+                    authors=all_authors,
+                    reviewers=all_reviewers,
+                    repo_count=len(entries),
+                    version=version,
+                    format=format_,
+                )
+                print(f"Contributors written to {path}", file=sys.stderr)
 
-    if out:
-        out_path = Path(out)
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(out, "w") as io:
-            io.writelines(formatter.iter_lines())
-    else:
-        print()
-        notes = str(formatter)
-        print(notes, file=sys.stdout)
+    if record is not None:
+        snapshot.save(Path(record))
+        print(f"Recorded {len(snapshot)} responses to {record}", file=sys.stderr)
+    print(f"Requests cache: {cache_stats}", file=sys.stderr)
+    if facts is not None:
+        print(f"Fact store: {facts}", file=sys.stderr)
+    print(f"Rate limits: {scheduler}", file=sys.stderr)
+    print(f"Request latencies:\n{latencies}", file=sys.stderr)
+    if profile:
+        print(f"\n{run_profile.format_table()}", file=sys.stderr)
+    if profile_out:
+        run_profile.save(Path(profile_out))
+        print(f"Profile written to {profile_out}", file=sys.stderr)
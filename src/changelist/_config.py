@@ -1,3 +1,5 @@
+import copy
+import functools
 import logging
 from pathlib import Path
 
@@ -8,6 +10,9 @@ try:
 except ModuleNotFoundError:
     import tomli as tomllib
 
+from ._git import read_file
+from ._profile import stage
+
 logger = logging.getLogger(__name__)
 
 DEFAULT_CONFIG_PATH = Path(__file__).parent / "default_config.toml"
@@ -15,18 +20,29 @@ DEFAULT_CONFIG_PATH = Path(__file__).parent / "default_config.toml"
 
 def remote_config(gh: Github, org_repo: str, *, rev: str):
     """Return configuration options in remote pyproject.toml if they exist."""
-    repo = gh.get_repo(org_repo)
-    try:
-        file = repo.get_contents("pyproject.toml", ref=rev)
-        logger.debug("found pyproject.toml in %s@%s", org_repo, rev)
-        content = file.decoded_content.decode()
-    except UnknownObjectException:
-        content = ""
+    with stage("config"):
+        repo = gh.get_repo(org_repo)
+        try:
+            file = repo.get_contents("pyproject.toml", ref=rev)
+            logger.debug("found pyproject.toml in %s@%s", org_repo, rev)
+            content = file.decoded_content.decode()
+        except UnknownObjectException:
+            content = ""
     config = tomllib.loads(content)
     config = config.get("tool", {}).get("changelist", {})
     return config
 
 
+def git_config(git_dir: Path, *, rev: str) -> dict:
+    """Return configuration options in pyproject.toml of a local clone at `rev`."""
+    content = read_file(git_dir, rev, "pyproject.toml")
+    if content is not None:
+        logger.debug("found pyproject.toml in %s@%s", git_dir, rev)
+    config = tomllib.loads(content or "")
+    config = config.get("tool", {}).get("changelist", {})
+    return config
+
+
 def local_config(path: Path) -> dict:
     """Return configuration options in local TOML file if they exist."""
     with path.open("rb") as fp:
@@ -35,19 +51,25 @@ def local_config(path: Path) -> dict:
     return config
 
 
+@functools.lru_cache(maxsize=8)
+def _default_config(path: Path) -> dict:
+    """Return the options in the default config file at `path`, parsed once."""
+    with path.open("rb") as fp:
+        config = tomllib.load(fp)
+    return config["tool"]["changelist"]
+
+
 def add_config_defaults(
     config: dict, *, default_config_path: Path = DEFAULT_CONFIG_PATH
 ) -> dict:
     """Fill in default config options if they don't exist in `config`.
 
-    The options are taken from the TOML file given in `default_config_path`.
-    Collections such as lists aren't merged.
+    The options are taken from the TOML file given in `default_config_path`,
+    which is only parsed once. Collections such as lists aren't merged.
     """
-    with default_config_path.open("rb") as fp:
-        defaults = tomllib.load(fp)
-    defaults = defaults["tool"]["changelist"]
+    defaults = _default_config(default_config_path)
     for key, value in defaults.items():
         if key not in config:
-            config[key] = value
+            config[key] = copy.deepcopy(value)
             logger.debug("using default config value for %s", key)
     return config
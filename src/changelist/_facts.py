@@ -0,0 +1,232 @@
+import logging
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Union
+
+from ._records import PullRequestInfo, UserInfo
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+-- Commits whose associated pull requests are known, possibly none. Only the
+-- numbers are kept, titles, descriptions and labels are edited after merging
+CREATE TABLE IF NOT EXISTS commits (
+    repo TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    PRIMARY KEY (repo, sha)
+);
+CREATE TABLE IF NOT EXISTS commit_pulls (
+    repo TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    PRIMARY KEY (repo, sha, number)
+);
+-- Pull requests whose reviewers are known, possibly none
+CREATE TABLE IF NOT EXISTS reviewed_pulls (
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    PRIMARY KEY (repo, number)
+);
+-- Reviewers as reviews reveal them, complete users are kept by IdentityIndex
+CREATE TABLE IF NOT EXISTS pull_reviewers (
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    login TEXT NOT NULL,
+    name TEXT,
+    html_url TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    PRIMARY KEY (repo, number, user_id)
+);
+"""
+
+_TABLES = (
+    "commits",
+    "commit_pulls",
+    "reviewed_pulls",
+    "pull_reviewers",
+)
+
+# Stay below SQLite's limit of variables in a statement of older versions
+_MAX_VARIABLES = 900
+
+
+def _batches(items: list, size: int = _MAX_VARIABLES) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _placeholders(items: list) -> str:
+    return ", ".join("?" * len(items))
+
+
+class FactStore:
+    """Remember facts fetched from GitHub's API in an SQLite database.
+
+    Other than the requests cache, which stores raw responses, the store keeps
+    facts that don't change: the numbers of the pull requests associated with
+    each commit and the reviewers of pull requests. Commits and pull requests
+    are namespaced by their repository ("org/repo"). Facts are written as soon
+    as they are fetched, so that later runs for any range, as well as other
+    tools, can query them directly.
+
+    Commits are only remembered once all their pull requests are merged. While
+    a pull request is open, its commits may still be associated with other
+    ones. Titles, descriptions and labels of pull requests are edited even after
+    they're merged, so they're left to the requests cache, which expires them
+    (see :class:`~changelist._cache.CachePolicy`). Reviewers are kept as reviews
+    reveal them, there's no separate table of users. Complete users, including
+    their names, are kept by :class:`~changelist._identity.IdentityIndex`, the
+    single cache of users, which also resolves the identities of commit authors.
+
+    The store can be shared between threads. `hits` and `misses` count the
+    commits and pull requests that were or weren't known.
+    """
+
+    SCHEMA_VERSION = 3
+
+    def __init__(self, path: Union[Path, str] = ":memory:"):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._connection:
+            version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, self.SCHEMA_VERSION):
+                logger.info("recreating fact store with outdated schema at %s", path)
+                tables = self._connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                ).fetchall()
+                for (table,) in tables:
+                    self._connection.execute(f"DROP TABLE IF EXISTS {table}")
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def __str__(self) -> str:
+        return f"{self.hits} facts known, {self.misses} fetched"
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def clear(self) -> None:
+        """Forget all facts."""
+        with self._lock, self._connection:
+            for table in _TABLES:
+                self._connection.execute(f"DELETE FROM {table}")
+
+    def _query(self, sql: str, parameters: Iterable = ()) -> list[tuple]:
+        with self._lock:
+            return self._connection.execute(sql, tuple(parameters)).fetchall()
+
+    def _count(self, known: int, total: int) -> None:
+        with self._lock:
+            self.hits += known
+            self.misses += total - known
+
+    def pull_numbers_of(
+        self, org_repo: str, commit_shas: Iterable[str]
+    ) -> "dict[str, list[int]]":
+        """Return the numbers of the pull requests of `commit_shas`, by their SHA.
+
+        Commits whose pull requests aren't known are left out.
+        """
+        commit_shas = list(dict.fromkeys(commit_shas))
+        numbers_by_sha = {}
+        for batch in _batches(commit_shas):
+            rows = self._query(
+                f"""
+                SELECT c.sha, cp.number
+                FROM commits c
+                LEFT JOIN commit_pulls cp ON cp.repo = c.repo AND cp.sha = c.sha
+                WHERE c.repo = ? AND c.sha IN ({_placeholders(batch)})
+                ORDER BY c.sha, cp.number
+                """,
+                [org_repo, *batch],
+            )
+            for sha, number in rows:
+                numbers = numbers_by_sha.setdefault(sha, [])
+                if number is not None:
+                    numbers.append(number)
+        self._count(len(numbers_by_sha), len(commit_shas))
+        return numbers_by_sha
+
+    def add_pull_requests(
+        self, org_repo: str, pulls_by_sha: "dict[str, list[PullRequestInfo]]"
+    ) -> None:
+        """Remember the numbers of the pull requests associated with each commit.
+
+        Commits associated with a pull request that isn't merged are skipped.
+        """
+        with self._lock, self._connection:
+            for sha, pulls in pulls_by_sha.items():
+                if not all(pull.merged for pull in pulls):
+                    continue
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO commits VALUES (?, ?)", (org_repo, sha)
+                )
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO commit_pulls VALUES (?, ?, ?)",
+                    [(org_repo, sha, pull.number) for pull in pulls],
+                )
+
+    def reviewers_of(
+        self, org_repo: str, numbers: Iterable[int]
+    ) -> "dict[int, set[UserInfo]]":
+        """Return the known reviewers of pull requests, mapped to their number.
+
+        Pull requests whose reviewers aren't known are left out.
+        """
+        numbers = list(dict.fromkeys(numbers))
+        reviewers_by_number = {}
+        for batch in _batches(numbers):
+            rows = self._query(
+                f"""
+                SELECT r.number, pr.user_id, pr.login, pr.name, pr.html_url,
+                    pr.node_id
+                FROM reviewed_pulls r
+                LEFT JOIN pull_reviewers pr
+                    ON pr.repo = r.repo AND pr.number = r.number
+                WHERE r.repo = ? AND r.number IN ({_placeholders(batch)})
+                """,
+                [org_repo, *batch],
+            )
+            for number, user_id, *user in rows:
+                reviewers = reviewers_by_number.setdefault(number, set())
+                if user_id is not None:
+                    reviewers.add(_user_from_row(user_id, *user))
+        self._count(len(reviewers_by_number), len(numbers))
+        return reviewers_by_number
+
+    def add_reviewers(
+        self, org_repo: str, reviewers_by_number: "dict[int, set[UserInfo]]"
+    ) -> None:
+        """Remember the reviewers of each pull request number."""
+        with self._lock, self._connection:
+            for number, reviewers in reviewers_by_number.items():
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO reviewed_pulls VALUES (?, ?)",
+                    (org_repo, number),
+                )
+                for user in reviewers:
+                    self._connection.execute(
+                        "INSERT OR IGNORE INTO pull_reviewers "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (org_repo, number, *_user_to_row(user)),
+                    )
+
+
+def _user_to_row(user: UserInfo) -> tuple:
+    return (user.id, user.login, user.name, user.html_url, user.node_id)
+
+
+def _user_from_row(
+    user_id: int, login: str, name: Union[str, None], html_url: str, node_id: str
+) -> UserInfo:
+    return UserInfo(
+        id=user_id, login=login, name=name, html_url=html_url, node_id=node_id
+    )
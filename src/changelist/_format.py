@@ -2,13 +2,64 @@ import logging
 import re
 from collections import OrderedDict
 from collections.abc import Iterable
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Union
 
 from changelist._objects import ChangeNote, Contributor
 
 logger = logging.getLogger(__name__)
 
 
+class LabelClassifier:
+    """Sort labels into sections with regexes that are compiled once.
+
+    `label_section_map` maps regexes to section titles. A label belongs to each
+    section whose regex matches its start, ignoring case. As projects use few
+    distinct labels on many notes, the sections of each label are memoized.
+    Notes without a matching label belong to the section "Other".
+    """
+
+    def __init__(self, label_section_map: dict[str, str]):
+        self.sections = tuple(dict.fromkeys([*label_section_map.values(), "Other"]))
+        self._regexes = [
+            (re.compile(pattern, flags=re.IGNORECASE), section_name)
+            for pattern, section_name in label_section_map.items()
+        ]
+        self._sections_by_label: dict[str, frozenset[str]] = {}
+
+    def sections_of_label(self, label: str) -> frozenset[str]:
+        """Return the sections `label` belongs to."""
+        sections = self._sections_by_label.get(label)
+        if sections is None:
+            sections = frozenset(
+                section_name
+                for regex, section_name in self._regexes
+                if regex.match(label)
+            )
+            self._sections_by_label[label] = sections
+        return sections
+
+    def sections_of(self, labels: Iterable[str]) -> frozenset[str]:
+        """Return the sections of any of `labels`, excluding "Other"."""
+        return frozenset().union(*map(self.sections_of_label, labels))
+
+    def index(self, notes: Iterable[ChangeNote]) -> OrderedDict[str, set[ChangeNote]]:
+        """Map each section title to its notes, in the order of the sections."""
+        notes_by_section = OrderedDict((name, set()) for name in self.sections)
+        for note in notes:
+            matching_sections = self.sections_of(note.labels)
+            for section_name in matching_sections:
+                notes_by_section[section_name].add(note)
+            if not matching_sections:
+                logger.warning(
+                    "%s without matching label, sorting into section 'Other'",
+                    note.reference_url,
+                )
+                notes_by_section["Other"].add(note)
+        return notes_by_section
+
+
 @dataclass(frozen=True)
 class MdFormatter:
     """Format release notes in Markdown from PRs, authors and reviewers."""
@@ -28,6 +79,15 @@ class MdFormatter:
 
     ignored_user_logins: tuple[str, ...]
 
+    # Classifier of `label_section_map` and its index of `change_notes`, if
+    # they're shared with other formatters of the same notes
+    classifier: Union[LabelClassifier, None] = field(
+        default=None, compare=False, repr=False
+    )
+    notes_by_section: Union[OrderedDict[str, set[ChangeNote]], None] = field(
+        default=None, compare=False, repr=False
+    )
+
     def __str__(self) -> str:
         """Return complete release notes document as a string."""
         return self.document
@@ -54,34 +114,19 @@ class MdFormatter:
         yield from self._format_contributor_section(self.authors, self.reviewers)
         yield from self._format_outro()
 
-    @property
+    @cached_property
+    def label_classifier(self) -> "LabelClassifier":
+        """Classifier sorting labels into the sections of `label_section_map`."""
+        if self.classifier is not None:
+            return self.classifier
+        return LabelClassifier(self.label_section_map)
+
+    @cached_property
     def _notes_by_section(self) -> OrderedDict[str, set[ChangeNote]]:
         """Map change notes to section titles."""
-        label_section_map = {
-            re.compile(pattern, flags=re.IGNORECASE): section_name
-            for pattern, section_name in self.label_section_map.items()
-        }
-
-        notes_by_section = OrderedDict()
-        for _, section_name in self.label_section_map.items():
-            notes_by_section[section_name] = set()
-        notes_by_section["Other"] = set()
-
-        for note in self.change_notes:
-            matching_sections = [
-                section_name
-                for regex, section_name in label_section_map.items()
-                if any(regex.match(label) for label in note.labels)
-            ]
-            for section_name in matching_sections:
-                notes_by_section[section_name].add(note)
-            if not matching_sections:
-                logger.warning(
-                    "%s without matching label, sorting into section 'Other'",
-                    note.reference_url,
-                )
-                notes_by_section["Other"].add(note)
-        return notes_by_section
+        if self.notes_by_section is not None:
+            return self.notes_by_section
+        return self.label_classifier.index(self.change_notes)
 
     def _sanitize_text(self, text: str) -> str:
         """Remove newlines and strip whitespace."""
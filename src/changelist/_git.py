@@ -0,0 +1,122 @@
+import logging
+import re
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Union
+
+from ._records import SLOTS
+
+logger = logging.getLogger(__name__)
+
+CO_AUTHOR_REGEX = re.compile(
+    r"^Co-authored-by:\s*(?P<name>.*?)\s*<(?P<email>[^>]+)>\s*$",
+    flags=re.MULTILINE | re.IGNORECASE,
+)
+
+# Separate fields and records with ASCII control characters that don't occur in
+# commit messages
+_FIELD_SEP = "\x1f"
+_RECORD_SEP = "\x1e"
+_LOG_FORMAT = _FIELD_SEP.join(["%H", "%an", "%ae", "%cn", "%ce", "%B"]) + _RECORD_SEP
+
+
+@dataclass(frozen=True, **SLOTS)
+class GitCommit:
+    """Commit as found in a local git repository.
+
+    Other than commits from GitHub's API, only the names and emails of authors
+    and committer are known, not their GitHub users.
+    """
+
+    sha: str
+    message: str
+    html_url: str
+    author_name: str
+    author_email: str
+    committer_name: str
+    committer_email: str
+
+    @property
+    def co_authors(self) -> tuple[tuple[str, str], ...]:
+        """Name and email of each "Co-authored-by" trailer in the message."""
+        return co_authors_of(self.message)
+
+
+def co_authors_of(message: str) -> tuple[tuple[str, str], ...]:
+    """Return name and email of each "Co-authored-by" trailer in `message`."""
+    return tuple(
+        (match["name"], match["email"]) for match in CO_AUTHOR_REGEX.finditer(message)
+    )
+
+
+def _git(git_dir: Path, *args: str) -> str:
+    """Run a git command in `git_dir` and return its output."""
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(git_dir), *args],
+            capture_output=True,
+            check=True,
+            text=True,
+            encoding="utf-8",
+        )
+    except subprocess.CalledProcessError as e:
+        msg = f"`git {' '.join(args)}` failed in {git_dir}: {e.stderr.strip()}"
+        raise RuntimeError(msg) from e
+    return result.stdout
+
+
+def resolve_rev(git_dir: Path, rev: str) -> str:
+    """Return the SHA of the commit `rev` points to."""
+    return _git(git_dir, "rev-parse", "--verify", f"{rev}^{{commit}}").strip()
+
+
+def is_ancestor(git_dir: Path, ancestor: str, rev: str) -> bool:
+    """Check if `ancestor` is an ancestor of `rev` or the same commit."""
+    try:
+        _git(git_dir, "merge-base", "--is-ancestor", ancestor, rev)
+    except RuntimeError:
+        return False
+    return True
+
+
+def read_file(git_dir: Path, rev: str, path: str) -> Union[str, None]:
+    """Return the content of the file at `path` in `rev`, `None` if it's missing."""
+    if not _git(git_dir, "ls-tree", "--name-only", rev, "--", path).strip():
+        return None
+    return _git(git_dir, "show", f"{rev}:{path}")
+
+
+def local_commits_between(
+    git_dir: Path, org_repo: str, start_rev: str, stop_rev: str
+) -> set[GitCommit]:
+    """Find commits between two revisions excluding the commit of `start_rev`.
+
+    Like :func:`~changelist._query.commits_between` but the commits are read from
+    the local git repository in `git_dir` instead of GitHub's API. The repository
+    must contain both revisions, e.g. a clone with full history.
+    """
+    output = _git(
+        git_dir, "log", f"--format={_LOG_FORMAT}", f"{start_rev}..{stop_rev}", "--"
+    )
+    commits = set()
+    for raw_record in output.split(_RECORD_SEP):
+        record = raw_record.strip("\n")
+        if not record:
+            continue
+        sha, author_name, author_email, committer_name, committer_email, message = (
+            record.split(_FIELD_SEP)
+        )
+        commits.add(
+            GitCommit(
+                sha=sha,
+                message=message,
+                html_url=f"https://github.com/{org_repo}/commit/{sha}",
+                author_name=author_name,
+                author_email=author_email,
+                committer_name=committer_name,
+                committer_email=committer_email,
+            )
+        )
+    logger.debug("found %i commits in %s", len(commits), git_dir)
+    return commits
@@ -0,0 +1,240 @@
+import logging
+import math
+import random
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from typing import TypeVar, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+
+def create_session(*, pool_size: int = 10) -> requests.Session:
+    """Create a session that keeps up to `pool_size` connections alive.
+
+    The session can be shared between threads, `pool_size` should be at least
+    the number of concurrent requests. Connections are reused across requests,
+    so that TCP and TLS handshakes are only needed once per connection.
+    Responses are requested compressed with every encoding supported by the
+    installed packages (e.g. brotli).
+
+    If a requests cache is installed (see :func:`~changelist._cache.install_cache`),
+    the session uses it.
+    """
+    session = requests.Session()
+    # Block instead of opening throwaway connections beyond `pool_size`
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(make_headers(accept_encoding=True))
+    logger.debug("created session with a pool of %i connections", pool_size)
+    return session
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Return the `q`-th percentile (0-100) of `samples` (nearest rank)."""
+    ordered = sorted(samples)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class LatencyStats:
+    """Collect the latencies of requests sent to GitHub, grouped by stage.
+
+    The stage of a request is whatever :meth:`stage` was last entered in the
+    thread that sends it. Threads that work on behalf of a stage, e.g. those of
+    :func:`~changelist._query.map_concurrently`, enter it with :meth:`bind`.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._samples: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def __str__(self) -> str:
+        lines = []
+        for stage, samples in self.samples().items():
+            p50, p95, p99 = (percentile(samples, q) for q in (50, 95, 99))
+            lines.append(
+                f"{stage}: {len(samples)} requests, "
+                f"p50 {p50:.3f} s, p95 {p95:.3f} s, p99 {p99:.3f} s"
+            )
+        return "\n".join(lines) or "no requests sent"
+
+    @property
+    def current_stage(self) -> str:
+        """The stage of the calling thread."""
+        return getattr(self._local, "stage", "other")
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Attribute requests within this context to stage `name`."""
+        previous = self.current_stage
+        self._local.stage = name
+        try:
+            yield
+        finally:
+            self._local.stage = previous
+
+    def bind(self, func: Callable[..., R]) -> Callable[..., R]:
+        """Wrap `func` to run in the current stage, even in another thread."""
+        name = self.current_stage
+
+        def wrapped(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+
+        return wrapped
+
+    def record(self, seconds: float) -> None:
+        """Add the latency of a request to the current stage."""
+        with self._lock:
+            self._samples.setdefault(self.current_stage, []).append(seconds)
+
+    def samples(self) -> dict[str, list[float]]:
+        """Return a copy of the latencies recorded for each stage."""
+        with self._lock:
+            return {stage: list(values) for stage, values in self._samples.items()}
+
+
+class RequestPolicy:
+    """Bound the time requests to GitHub may take and retry failed reads.
+
+    Each request times out after `timeout` seconds without progress, or earlier
+    if the caller sets a shorter timeout itself. Reads, including GraphQL
+    queries which never modify anything here, are retried up to `retries` times
+    on connection errors, timeouts and server errors. Retries wait a random
+    time up to `backoff` seconds doubled with each attempt ("full jitter").
+
+    If `hedge_after` is given, a duplicate of a read that hasn't completed
+    after that many seconds is sent, and whichever finishes first is used.
+    If `budget` is given, requests fail with :class:`TimeoutError` once that
+    many seconds passed since the policy was created, and timeouts are
+    shortened to the remaining budget.
+
+    Latencies are recorded in `latencies`, if given.
+    """
+
+    RETRY_STATUS_CODES = frozenset({500, 502, 503, 504})
+
+    def __init__(
+        self,
+        *,
+        timeout: float = 30.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        hedge_after: Union[float, None] = None,
+        budget: Union[float, None] = None,
+        latencies: Union[LatencyStats, None] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.latencies = latencies
+        self._clock = clock
+        self._sleep = sleep
+        self.deadline = None if budget is None else clock() + budget
+        self._executor = None
+        if hedge_after is not None:
+            self._executor = ThreadPoolExecutor(thread_name_prefix="hedge")
+
+    @staticmethod
+    def is_idempotent(request: requests.PreparedRequest) -> bool:
+        """Check if `request` only reads and can be sent more than once."""
+        if request.method in ("GET", "HEAD", "OPTIONS"):
+            return True
+        # Only queries are sent to the GraphQL API, no mutations
+        return request.method == "POST" and request.url.rstrip("/").endswith("/graphql")
+
+    def remaining(self) -> Union[float, None]:
+        """Return seconds left of the budget, `None` if there is no budget."""
+        if self.deadline is None:
+            return None
+        remaining = self.deadline - self._clock()
+        if remaining <= 0:
+            raise TimeoutError("exceeded time budget for requests to GitHub")
+        return remaining
+
+    def send(
+        self,
+        send: Callable[..., requests.Response],
+        request: requests.PreparedRequest,
+        **kwargs,
+    ) -> requests.Response:
+        """Send `request` with `send` following this policy."""
+        idempotent = self.is_idempotent(request)
+        attempt = 0
+        while True:
+            timeout = kwargs.get("timeout") or self.timeout
+            if isinstance(timeout, (int, float)):
+                timeout = min(timeout, self.timeout)
+            remaining = self.remaining()
+            if remaining is not None and isinstance(timeout, (int, float)):
+                timeout = min(timeout, remaining)
+            kwargs["timeout"] = timeout
+
+            start = self._clock()
+            try:
+                if idempotent and self._executor is not None:
+                    response = self._send_hedged(send, request, **kwargs)
+                else:
+                    response = send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not idempotent or attempt >= self.retries:
+                    raise
+                logger.warning("retrying %s after %r", request.url, e)
+            else:
+                if self.latencies is not None:
+                    self.latencies.record(self._clock() - start)
+                if (
+                    not idempotent
+                    or attempt >= self.retries
+                    or response.status_code not in self.RETRY_STATUS_CODES
+                ):
+                    return response
+                logger.warning(
+                    "retrying %s after status %i", request.url, response.status_code
+                )
+                response.close()
+            self._sleep(random.uniform(0, self.backoff * 2**attempt))
+            attempt += 1
+
+    def _send_hedged(
+        self,
+        send: Callable[..., requests.Response],
+        request: requests.PreparedRequest,
+        **kwargs,
+    ) -> requests.Response:
+        """Send a duplicate of `request` if it's slow, return the first response."""
+        futures = [self._executor.submit(send, request, **kwargs)]
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done:
+            logger.debug("hedging slow request to %s", request.url)
+            futures.append(self._executor.submit(send, request.copy(), **kwargs))
+
+        error = None
+        for future in as_completed(futures):
+            if future.exception() is None:
+                for other in futures:
+                    if other is not future:
+                        other.add_done_callback(_close_response)
+                return future.result()
+            error = future.exception()
+        raise error
+
+
+def _close_response(future: Future) -> None:
+    """Release the connection of a response that isn't used."""
+    if future.exception() is None:
+        future.result().close()
@@ -0,0 +1,140 @@
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Union
+
+from ._records import UserInfo
+
+logger = logging.getLogger(__name__)
+
+
+class IdentityIndex:
+    """Map git identities (name and email) to GitHub users.
+
+    Resolving the GitHub user behind a "Co-authored-by" trailer or a commit from
+    a local clone requires GitHub's API. The same people contribute to many
+    releases though, so the results are remembered in this index and can be
+    persisted with :meth:`save`.
+
+    The index holds two mappings: git identities to GitHub user IDs (`None` if
+    the email isn't associated with a GitHub user), and user IDs to complete
+    users including their display name. Users older than `max_age` are
+    dropped on :meth:`load`, so that changed names are picked up eventually.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(
+        self,
+        path: Union[Path, None] = None,
+        *,
+        max_age: timedelta = timedelta(days=30),
+    ):
+        self.path = path
+        self.max_age = max_age
+        self._identities: dict[tuple[str, str], Union[int, None]] = {}
+        self._users: dict[int, UserInfo] = {}
+        self._fetched_at: dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._identities)
+
+    def __contains__(self, identity: tuple[str, str]) -> bool:
+        """Check if the GitHub user for (name, email) `identity` is known."""
+        return identity in self._identities
+
+    def lookup(self, name: str, email: str) -> Union[UserInfo, None]:
+        """Return the complete user for a git identity.
+
+        Returns `None` if the identity or its user's details aren't known, or if
+        the identity isn't associated with a GitHub user. Use `in` to
+        differentiate the latter.
+        """
+        user_id = self.user_id(name, email)
+        if user_id is None:
+            return None
+        return self._users.get(user_id)
+
+    def user_id(self, name: str, email: str) -> Union[int, None]:
+        """Return the ID of the GitHub user for a git identity, if known."""
+        return self._identities.get((name, email))
+
+    def user(self, user_id: int) -> Union[UserInfo, None]:
+        """Return the complete user with `user_id`, if known."""
+        return self._users.get(user_id)
+
+    def add_identity(self, name: str, email: str, user_id: Union[int, None]) -> None:
+        """Associate a git identity with the GitHub user `user_id`."""
+        with self._lock:
+            self._identities[name, email] = user_id
+
+    def add_user(self, user: UserInfo) -> None:
+        """Remember a complete `user`, including its display name."""
+        with self._lock:
+            self._users[user.id] = user
+            self._fetched_at[user.id] = time.time()
+
+    @classmethod
+    def load(cls, path: Path, **kwargs) -> "IdentityIndex":
+        """Load index from `path`, an empty index if it doesn't exist yet."""
+        index = cls(path, **kwargs)
+        if not path.exists():
+            return index
+        with path.open() as fp:
+            data = json.load(fp)
+        if data.get("format_version") != cls.FORMAT_VERSION:
+            logger.info("ignoring incompatible identity index in %s", path)
+            return index
+
+        for item in data["identities"]:
+            index._identities[item["name"], item["email"]] = item["user_id"]
+        oldest = time.time() - index.max_age.total_seconds()
+        for item in data["users"]:
+            if item["fetched_at"] < oldest:
+                continue
+            user = UserInfo(
+                id=item["id"],
+                login=item["login"],
+                name=item["name"],
+                html_url=item["html_url"],
+            )
+            index._users[user.id] = user
+            index._fetched_at[user.id] = item["fetched_at"]
+        logger.debug(
+            "loaded %i identities and %i users from %s",
+            len(index._identities),
+            len(index._users),
+            path,
+        )
+        return index
+
+    def save(self) -> None:
+        """Save index to its `path`."""
+        data = {
+            "format_version": self.FORMAT_VERSION,
+            "identities": [
+                {"name": name, "email": email, "user_id": user_id}
+                for (name, email), user_id in sorted(
+                    self._identities.items(), key=lambda item: item[0]
+                )
+            ],
+            "users": [
+                {
+                    "id": user.id,
+                    "login": user.login,
+                    "name": user.name,
+                    "html_url": user.html_url,
+                    "fetched_at": self._fetched_at[user.id],
+                }
+                for user in sorted(self._users.values(), key=lambda user: user.id)
+            ],
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with tmp_path.open("w") as fp:
+            json.dump(data, fp)
+        tmp_path.replace(self.path)
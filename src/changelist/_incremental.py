@@ -0,0 +1,262 @@
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Union
+
+from ._git import GitCommit
+from ._objects import (
+    ChangeNote,
+    Contributor,
+    contributor_from_json,
+    contributors_to_json,
+    note_from_json,
+    notes_to_json,
+)
+from ._records import CommitInfo, Label, PullRequestInfo, UserInfo
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RunState:
+    """Results of a previous run for a repository and range of revisions.
+
+    `stop_sha` is the commit `stop_rev` resolved to when the results were
+    fetched. A later run for the same range only needs to fetch commits after
+    `stop_sha`. `pr_summary_regex` and `pr_summary_label_regex` are the options
+    `change_notes` were created with.
+
+    A state that isn't `complete` is a checkpoint of an interrupted run. It holds
+    the results of some of the commits up to `stop_sha`, the others still need to
+    be fetched.
+    """
+
+    FORMAT_VERSION = 1
+
+    org_repo: str
+    start_rev: str
+    stop_rev: str
+    stop_sha: str
+    pr_summary_regex: str
+    pr_summary_label_regex: str
+    commits: set[CommitInfo] = field(default_factory=set)
+    pull_requests: set[PullRequestInfo] = field(default_factory=set)
+    change_notes: set[ChangeNote] = field(default_factory=set)
+    authors: set[Contributor] = field(default_factory=set)
+    reviewers: set[Contributor] = field(default_factory=set)
+    complete: bool = True
+
+    @staticmethod
+    def path(state_dir: Path, org_repo: str, start_rev: str, stop_rev: str) -> Path:
+        """Return the file that stores the state for the given range."""
+        key = json.dumps([org_repo, start_rev, stop_rev])
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return state_dir / f"{org_repo.replace('/', '_')}_{digest}.json"
+
+    @classmethod
+    def load(
+        cls, state_dir: Path, org_repo: str, start_rev: str, stop_rev: str
+    ) -> "Union[RunState, None]":
+        """Load the state of a previous run, `None` if there is none."""
+        path = cls.path(state_dir, org_repo, start_rev, stop_rev)
+        if not path.exists():
+            return None
+        with path.open() as fp:
+            data = json.load(fp)
+        if data.get("format_version") != cls.FORMAT_VERSION:
+            logger.info("ignoring incompatible state in %s", path)
+            return None
+        state = cls(
+            org_repo=data["org_repo"],
+            start_rev=data["start_rev"],
+            stop_rev=data["stop_rev"],
+            stop_sha=data["stop_sha"],
+            pr_summary_regex=data["pr_summary_regex"],
+            pr_summary_label_regex=data["pr_summary_label_regex"],
+            commits={_commit_from_json(c) for c in data["commits"]},
+            pull_requests={_pull_from_json(p) for p in data["pull_requests"]},
+            change_notes={note_from_json(n) for n in data["change_notes"]},
+            authors={contributor_from_json(c) for c in data["authors"]},
+            reviewers={contributor_from_json(c) for c in data["reviewers"]},
+            complete=data.get("complete", True),
+        )
+        logger.info("loaded state of previous run from %s", path)
+        return state
+
+    def merge(self, previous: "RunState") -> None:
+        """Add the results of a `previous` run for the preceding commits.
+
+        If the options to detect summaries changed since the `previous` run, its
+        notes are recreated from its pull requests.
+        """
+        self.commits |= previous.commits
+        self.pull_requests |= previous.pull_requests
+        self.authors |= previous.authors
+        self.reviewers |= previous.reviewers
+        if (previous.pr_summary_regex, previous.pr_summary_label_regex) == (
+            self.pr_summary_regex,
+            self.pr_summary_label_regex,
+        ):
+            self.change_notes |= previous.change_notes
+        else:
+            logger.info("summary options changed, recreating notes of previous run")
+            self.change_notes |= ChangeNote.from_pull_requests(
+                previous.pull_requests,
+                pr_summary_regex=self.pr_summary_regex,
+                pr_summary_label_regex=self.pr_summary_label_regex,
+            )
+
+    def save(self, state_dir: Path) -> Path:
+        """Save state to a JSON file in `state_dir` and return its path."""
+        data = {
+            "format_version": self.FORMAT_VERSION,
+            "org_repo": self.org_repo,
+            "start_rev": self.start_rev,
+            "stop_rev": self.stop_rev,
+            "stop_sha": self.stop_sha,
+            "pr_summary_regex": self.pr_summary_regex,
+            "pr_summary_label_regex": self.pr_summary_label_regex,
+            "commits": sorted(
+                (_commit_to_json(c) for c in self.commits), key=lambda c: c["sha"]
+            ),
+            "pull_requests": sorted(
+                (_pull_to_json(p) for p in self.pull_requests),
+                key=lambda p: p["number"],
+            ),
+            "change_notes": notes_to_json(self.change_notes),
+            "authors": contributors_to_json(self.authors),
+            "reviewers": contributors_to_json(self.reviewers),
+            "complete": self.complete,
+        }
+        path = self.path(state_dir, self.org_repo, self.start_rev, self.stop_rev)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so that an interrupted run doesn't leave
+        # a corrupted state behind
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("w") as fp:
+            json.dump(data, fp)
+        tmp_path.replace(path)
+        return path
+
+
+def commit_info(commit) -> CommitInfo:
+    """Return `commit` as :class:`CommitInfo`, converting other commit types."""
+    if isinstance(commit, CommitInfo):
+        return commit
+    if isinstance(commit, GitCommit):
+        # GitHub users of local commits aren't known
+        return CommitInfo(
+            sha=commit.sha,
+            message=commit.message,
+            html_url=commit.html_url,
+            author=None,
+            committer=None,
+        )
+    # Read attributes, as `raw_data` would request the complete commit for each
+    # commit of a comparison
+    return CommitInfo(
+        sha=commit.sha,
+        message=commit.commit.message,
+        html_url=commit.html_url,
+        author=commit.author and user_info(commit.author),
+        committer=commit.committer and user_info(commit.committer),
+    )
+
+
+def pull_request_info(pull) -> PullRequestInfo:
+    """Return `pull` as :class:`PullRequestInfo`, converting PyGithub objects."""
+    if isinstance(pull, PullRequestInfo):
+        return pull
+    return PullRequestInfo(
+        number=pull.number,
+        title=pull.title,
+        body=pull.body,
+        labels=tuple(Label(name=label.name) for label in pull.labels),
+        merged=pull.merged_at is not None,
+        merged_at=pull.merged_at,
+        html_url=pull.html_url,
+    )
+
+
+def user_info(user) -> UserInfo:
+    """Return `user` as :class:`UserInfo`, converting PyGithub objects.
+
+    The name of partial users, e.g. authors of commits, isn't requested.
+    """
+    if isinstance(user, UserInfo):
+        return user
+    return UserInfo(
+        id=user.id, login=user.login, html_url=user.html_url, node_id=user.node_id
+    )
+
+
+def _user_to_json(user: Union[UserInfo, None]) -> Union[dict, None]:
+    if user is None:
+        return None
+    return {
+        "id": user.id,
+        "login": user.login,
+        "name": user.name,
+        "html_url": user.html_url,
+    }
+
+
+def _user_from_json(data: Union[dict, None]) -> Union[UserInfo, None]:
+    if data is None:
+        return None
+    return UserInfo(**data)
+
+
+def _commit_to_json(commit: CommitInfo) -> dict:
+    return {
+        "sha": commit.sha,
+        "message": commit.message,
+        "html_url": commit.html_url,
+        "author": _user_to_json(commit.author),
+        "committer": _user_to_json(commit.committer),
+    }
+
+
+def _commit_from_json(data: dict) -> CommitInfo:
+    return CommitInfo(
+        sha=data["sha"],
+        message=data["message"],
+        html_url=data["html_url"],
+        author=_user_from_json(data["author"]),
+        committer=_user_from_json(data["committer"]),
+    )
+
+
+def _timestamp_to_json(timestamp: Union[datetime, None]) -> Union[str, None]:
+    return None if timestamp is None else timestamp.isoformat()
+
+
+def _timestamp_from_json(value: Union[str, None]) -> Union[datetime, None]:
+    return None if value is None else datetime.fromisoformat(value)
+
+
+def _pull_to_json(pull: PullRequestInfo) -> dict:
+    return {
+        "number": pull.number,
+        "title": pull.title,
+        "body": pull.body,
+        "labels": [label.name for label in pull.labels],
+        "merged": pull.merged,
+        "merged_at": _timestamp_to_json(pull.merged_at),
+        "html_url": pull.html_url,
+    }
+
+
+def _pull_from_json(data: dict) -> PullRequestInfo:
+    return PullRequestInfo(
+        number=data["number"],
+        title=data["title"],
+        body=data["body"],
+        labels=tuple(Label(name=name) for name in data["labels"]),
+        merged=data["merged"],
+        merged_at=_timestamp_from_json(data["merged_at"]),
+        html_url=data["html_url"],
+    )
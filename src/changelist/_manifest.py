@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Union
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    """A repository and range of revisions to prepare release notes for.
+
+    `version` overrides the version given in the command line, if not `None`.
+    """
+
+    org_repo: str
+    start_rev: str
+    stop_rev: str
+    version: Union[str, None] = None
+
+    @property
+    def org_name(self) -> str:
+        return self.org_repo.split("/")[0]
+
+    @property
+    def repo_name(self) -> str:
+        return self.org_repo.split("/")[1]
+
+
+def parse_manifest(text: str) -> list[ManifestEntry]:
+    """Parse a manifest with an `org/repo start_rev stop_rev [version]` per line.
+
+    Empty lines and comments starting with "#" are ignored.
+
+    >>> parse_manifest('''
+    ... # Released together
+    ... org/a v1.0 v1.1
+    ... org/b v0.2 main 0.3  # Not tagged yet
+    ... ''')  # doctest: +NORMALIZE_WHITESPACE
+    [ManifestEntry(org_repo='org/a', start_rev='v1.0', stop_rev='v1.1', version=None),
+     ManifestEntry(org_repo='org/b', start_rev='v0.2', stop_rev='main', version='0.3')]
+    """
+    entries = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        fields = line.split("#", 1)[0].split()
+        if not fields:
+            continue
+        if len(fields) not in (3, 4) or fields[0].count("/") != 1:
+            msg = (
+                f"line {number} of manifest isn't "
+                f"'org/repo start_rev stop_rev [version]': {line!r}"
+            )
+            raise ValueError(msg)
+        entries.append(ManifestEntry(*fields))
+    if len({entry.org_repo for entry in entries}) != len(entries):
+        raise ValueError("manifest lists a repository more than once")
+    return entries
+
+
+def read_manifest(path: Path) -> list[ManifestEntry]:
+    """Read manifest from `path`, see :func:`parse_manifest`."""
+    return parse_manifest(path.read_text())
@@ -0,0 +1,165 @@
+import json
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Union
+
+from ._format import LabelClassifier, MdFormatter, RstFormatter
+from ._objects import (
+    ChangeNote,
+    Contributor,
+    contributor_from_json,
+    contributors_to_json,
+    note_from_json,
+    notes_to_json,
+)
+
+# Formats the notes can be written in, "json" writes the model itself
+FORMATS = ("md", "rst", "json")
+
+
+def parse_formats(value: str) -> list[str]:
+    """Parse a comma-separated list of formats, e.g. "md,rst".
+
+    >>> parse_formats("md,json")
+    ['md', 'json']
+    """
+    formats = list(dict.fromkeys(f.strip() for f in value.split(",") if f.strip()))
+    unknown = [f for f in formats if f not in FORMATS]
+    if not formats or unknown:
+        msg = f"format must be a comma-separated list of {FORMATS}, got {value!r}"
+        raise ValueError(msg)
+    return formats
+
+
+@dataclass(frozen=True)
+class NotesModel:
+    """Release notes of a repository, independent of the format they're written in.
+
+    Holds the results of fetching a range from GitHub together with the resolved
+    configuration options that formatting needs. A model saved as JSON can be
+    rendered in any format later on, without accessing GitHub again.
+    """
+
+    FORMAT_VERSION = 1
+
+    repo_name: str
+    version: str
+    change_notes: set[ChangeNote]
+    authors: set[Contributor]
+    reviewers: set[Contributor]
+    title_template: str
+    intro_template: str
+    outro_template: str
+    label_section_map: dict[str, str]
+    ignored_user_logins: tuple[str, ...]
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict,
+        *,
+        repo_name: str,
+        version: str,
+        change_notes: set[ChangeNote],
+        authors: set[Contributor],
+        reviewers: set[Contributor],
+    ) -> "NotesModel":
+        """Create with the formatting options in `config`."""
+        return cls(
+            repo_name=repo_name,
+            version=version,
+            change_notes=change_notes,
+            authors=authors,
+            reviewers=reviewers,
+            title_template=config["title_template"],
+            intro_template=config["intro_template"],
+            outro_template=config["outro_template"],
+            label_section_map=config["label_section_map"],
+            ignored_user_logins=tuple(config["ignored_user_logins"]),
+        )
+
+    @cached_property
+    def label_classifier(self) -> LabelClassifier:
+        """Classifier sorting labels into the sections of `label_section_map`."""
+        return LabelClassifier(self.label_section_map)
+
+    @cached_property
+    def notes_by_section(self) -> OrderedDict[str, set[ChangeNote]]:
+        """Map change notes to section titles, shared by the formatters."""
+        return self.label_classifier.index(self.change_notes)
+
+    def formatter(self, format: str) -> Union[MdFormatter, RstFormatter]:
+        """Return a formatter of the notes in `format`, "md" or "rst".
+
+        Formatters of the same model share its classifier and index of notes.
+        """
+        Formatter = {"md": MdFormatter, "rst": RstFormatter}[format]
+        return Formatter(
+            repo_name=self.repo_name,
+            change_notes=self.change_notes,
+            authors=self.authors,
+            reviewers=self.reviewers,
+            version=self.version,
+            title_template=self.title_template,
+            intro_template=self.intro_template,
+            outro_template=self.outro_template,
+            label_section_map=self.label_section_map,
+            ignored_user_logins=self.ignored_user_logins,
+            classifier=self.label_classifier,
+            notes_by_section=self.notes_by_section,
+        )
+
+    def iter_lines(self, format: str) -> Iterable[str]:
+        """Iterate the notes in one of :data:`FORMATS` line-wise."""
+        if format == "json":
+            yield json.dumps(self.to_json(), separators=(",", ":")) + "\n"
+        else:
+            yield from self.formatter(format).iter_lines()
+
+    def to_json(self) -> dict:
+        """Return as JSON-serializable dict, sorted to be reproducible."""
+        return {
+            "format_version": self.FORMAT_VERSION,
+            "repo_name": self.repo_name,
+            "version": self.version,
+            "change_notes": notes_to_json(self.change_notes),
+            "authors": contributors_to_json(self.authors),
+            "reviewers": contributors_to_json(self.reviewers),
+            "title_template": self.title_template,
+            "intro_template": self.intro_template,
+            "outro_template": self.outro_template,
+            "label_section_map": self.label_section_map,
+            "ignored_user_logins": list(self.ignored_user_logins),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "NotesModel":
+        """Create from a dict returned by :meth:`to_json`."""
+        if data.get("format_version") != cls.FORMAT_VERSION:
+            msg = f"unsupported format version of notes: {data.get('format_version')}"
+            raise ValueError(msg)
+        return cls(
+            repo_name=data["repo_name"],
+            version=data["version"],
+            change_notes={note_from_json(n) for n in data["change_notes"]},
+            authors={contributor_from_json(c) for c in data["authors"]},
+            reviewers={contributor_from_json(c) for c in data["reviewers"]},
+            title_template=data["title_template"],
+            intro_template=data["intro_template"],
+            outro_template=data["outro_template"],
+            label_section_map=data["label_section_map"],
+            ignored_user_logins=tuple(data["ignored_user_logins"]),
+        )
+
+
+def load_models(path: Path) -> list[NotesModel]:
+    """Load the models in `path`, written with the format "json".
+
+    Each line holds one model, so that the models of several files can be
+    concatenated into one (NDJSON).
+    """
+    with path.open() as fp:
+        return [NotesModel.from_json(json.loads(line)) for line in fp if line.strip()]
@@ -1,16 +1,21 @@
 import logging
 import re
+from collections.abc import Iterable
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
-from github.NamedUser import NamedUser
-from github.PullRequest import PullRequest
+from ._records import SLOTS, PullRequestInfo, UserInfo
+
+# Only needed for annotations, so that rendering saved notes doesn't import PyGithub
+if TYPE_CHECKING:
+    from github.NamedUser import NamedUser
+    from github.PullRequest import PullRequest
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, **SLOTS)
 class ChangeNote:
     """Describes an atomic change in the notes."""
 
@@ -23,7 +28,7 @@ class ChangeNote:
     @classmethod
     def from_pull_requests(
         cls,
-        pull_requests: set[PullRequest],
+        pull_requests: "Iterable[Union[PullRequest, PullRequestInfo]]",
         *,
         pr_summary_regex: str,
         pr_summary_label_regex: str,
@@ -89,7 +94,7 @@ class ChangeNote:
         return notes
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, **SLOTS)
 class Contributor:
     """A person mentioned in the notes as an author or reviewer.
 
@@ -108,7 +113,9 @@ class Contributor:
         return f"@{self.login}"
 
     @classmethod
-    def from_named_users(cls, named_users: set[NamedUser]) -> "set[Contributor]":
+    def from_named_users(
+        cls, named_users: "Iterable[Union[NamedUser, UserInfo]]"
+    ) -> "set[Contributor]":
         """ """
         contributors = set()
         for user in named_users:
@@ -120,3 +127,54 @@ class Contributor:
                 )
             )
         return contributors
+
+
+def note_to_json(note: ChangeNote) -> dict:
+    """Return `note` as a JSON-serializable dict."""
+    return {
+        "content": note.content,
+        "reference_name": note.reference_name,
+        "reference_url": note.reference_url,
+        "labels": list(note.labels),
+        "timestamp": note.timestamp and note.timestamp.isoformat(),
+    }
+
+
+def note_from_json(data: dict) -> ChangeNote:
+    """Create a note from a dict returned by :func:`note_to_json`."""
+    return ChangeNote(
+        content=data["content"],
+        reference_name=data["reference_name"],
+        reference_url=data["reference_url"],
+        labels=tuple(data["labels"]),
+        timestamp=data["timestamp"] and datetime.fromisoformat(data["timestamp"]),
+    )
+
+
+def notes_to_json(notes: Iterable[ChangeNote]) -> list[dict]:
+    """Return `notes` as JSON-serializable dicts, sorted to be reproducible."""
+    return sorted(
+        map(note_to_json, notes),
+        key=lambda n: (n["reference_name"], n["content"]),
+    )
+
+
+def contributor_to_json(contributor: Contributor) -> dict:
+    """Return `contributor` as a JSON-serializable dict."""
+    return {
+        "name": contributor.name,
+        "login": contributor.login,
+        "reference_url": contributor.reference_url,
+    }
+
+
+def contributor_from_json(data: dict) -> Contributor:
+    """Create a contributor from a dict returned by :func:`contributor_to_json`."""
+    return Contributor(
+        name=data["name"], login=data["login"], reference_url=data["reference_url"]
+    )
+
+
+def contributors_to_json(contributors: Iterable[Contributor]) -> list[dict]:
+    """Return `contributors` as JSON-serializable dicts, sorted by login."""
+    return sorted(map(contributor_to_json, contributors), key=lambda c: c["login"])
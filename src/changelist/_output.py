@@ -0,0 +1,37 @@
+import sys
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Union
+
+
+def lazy_tqdm(*args, **kwargs):
+    """Defer initialization of progress bar until first item is requested.
+
+    Calling `tqdm(...)` prints the progress bar right there and then. This can scramble
+    output, if more than one progress bar are initialized at the same time but their
+    iteration is meant to be done later in successive order.
+    """
+    from tqdm import tqdm
+
+    kwargs["file"] = kwargs.get("file", sys.stderr)
+    yield from tqdm(*args, **kwargs)
+
+
+def out_path(out: str, **fields: str) -> str:
+    """Replace placeholders like "{repo_name}" in `out` with `fields`."""
+    for name, value in fields.items():
+        out = out.replace(f"{{{name}}}", value)
+    return out
+
+
+def write_lines(lines: Iterable[str], out: Union[str, None]) -> None:
+    """Write `lines` to the file `out` or print them to STDOUT if it's `None`."""
+    if out:
+        path = Path(out)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as io:
+            io.writelines(lines)
+    else:
+        print()
+        sys.stdout.writelines(lines)
+        print()
@@ -0,0 +1,310 @@
+import logging
+import sys
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Union
+
+import requests
+from github import Github
+
+from ._config import add_config_defaults, git_config, local_config, remote_config
+from ._facts import FactStore
+from ._git import GitCommit, is_ancestor, local_commits_between, resolve_rev
+from ._identity import IdentityIndex
+from ._incremental import RunState, commit_info, pull_request_info
+from ._manifest import ManifestEntry
+from ._model import NotesModel
+from ._objects import ChangeNote, Contributor
+from ._output import lazy_tqdm, out_path, write_lines
+from ._profile import stage
+from ._query import (
+    GitHubGraphQl,
+    chunked,
+    contributors,
+    estimate_cost,
+    iter_commits_between,
+    pull_requests_from_commits,
+)
+from ._ratelimit import RateLimitScheduler
+
+logger = logging.getLogger(__name__)
+
+# Commits whose pull requests and contributors are fetched before moving on
+COMMIT_CHUNK_SIZE = 500
+
+
+@dataclass(frozen=True)
+class RunContext:
+    """Options and resources shared by the repositories and releases of a run.
+
+    Commits and the configuration are read from the local clone in `git_dir`
+    instead of GitHub, if given. With `incremental`, results are stored in
+    `state_dir` and reused by later runs. `quiet` hides progress bars, e.g. of
+    repositories that are processed concurrently.
+    """
+
+    gh: Github
+    session: requests.Session
+    scheduler: RateLimitScheduler
+    identities: IdentityIndex
+    facts: Union[FactStore, None]
+    state_dir: Path
+    formats: tuple[str, ...] = ("md",)
+    backend: str = "graphql"
+    jobs: int = 1
+    incremental: bool = False
+    git_dir: Union[Path, None] = None
+    config_path: Union[Path, None] = None
+    releases: tuple[str, ...] = ()
+    quiet: bool = False
+
+
+def repo_config(run: RunContext, entry: ManifestEntry) -> dict:
+    """Return the configuration of `entry` at its `stop_rev`, with defaults."""
+    if run.config_path is not None:
+        config = local_config(run.config_path)
+    elif run.git_dir is not None:
+        config = git_config(run.git_dir, rev=entry.stop_rev)
+    else:
+        config = remote_config(run.gh, entry.org_repo, rev=entry.stop_rev)
+    return add_config_defaults(config)
+
+
+def fetch_commits(run: RunContext, org_repo: str, base: str, head: str) -> Iterable:
+    """Return the commits after `base` up to `head`, from GitHub or `git_dir`."""
+    if run.git_dir is not None:
+        return local_commits_between(run.git_dir, org_repo, base, head)
+    return iter_commits_between(run.gh, org_repo, base, head)
+
+
+def previous_state(
+    run: RunContext, org_repo: str, start_rev: str, stop_rev: str
+) -> tuple[Union[RunState, None], str]:
+    """Return the state of a previous run for the range and `stop_rev`'s SHA.
+
+    The state is `None` if there is none or if `stop_rev` moved to a commit that
+    doesn't descend from the previous run's.
+    """
+    if run.git_dir is not None:
+        stop_sha = resolve_rev(run.git_dir, stop_rev)
+    else:
+        repo = run.gh.get_repo(org_repo)
+        stop_sha = repo.get_commit(stop_rev).sha
+    state = RunState.load(run.state_dir, org_repo, start_rev, stop_rev)
+    if state is None or state.stop_sha == stop_sha:
+        return state, stop_sha
+    if run.git_dir is not None:
+        is_ahead = is_ancestor(run.git_dir, state.stop_sha, stop_sha)
+    else:
+        is_ahead = repo.compare(base=state.stop_sha, head=stop_sha).status == "ahead"
+    if not is_ahead:
+        logger.warning(
+            "%s doesn't descend from the previous run's %s, fetching the full range",
+            stop_rev,
+            state.stop_sha,
+        )
+        return None, stop_sha
+    return state, stop_sha
+
+
+def pending_commits(
+    run: RunContext,
+    org_repo: str,
+    start_rev: str,
+    stop_rev: str,
+    *,
+    state: Union[RunState, None],
+    stop_sha: Union[str, None],
+) -> Iterable:
+    """Return the commits of the range that `state` doesn't cover yet."""
+    if state is None:
+        return fetch_commits(run, org_repo, start_rev, stop_rev)
+    if not state.complete:
+        # Resume an interrupted run, skipping the commits it processed
+        logger.info("resuming previous run with %i commits done", len(state.commits))
+        done = {commit.sha for commit in state.commits}
+        return (
+            commit
+            for commit in fetch_commits(run, org_repo, start_rev, stop_sha)
+            if commit.sha not in done
+        )
+    if state.stop_sha == stop_sha:
+        logger.info("no new commits since previous run at %s", stop_sha)
+        return ()
+    return fetch_commits(run, org_repo, state.stop_sha, stop_sha)
+
+
+def collect_notes(
+    run: RunContext,
+    ql: GitHubGraphQl,
+    config: dict,
+    org_repo: str,
+    start_rev: str,
+    stop_rev: str,
+) -> tuple[set[ChangeNote], set[Contributor], set[Contributor]]:
+    """Fetch the notes, authors and reviewers of the commits in a range."""
+    state, stop_sha, new_state = None, None, None
+    if run.incremental:
+        state, stop_sha = previous_state(run, org_repo, start_rev, stop_rev)
+        new_state = RunState(
+            org_repo=org_repo,
+            start_rev=start_rev,
+            stop_rev=stop_rev,
+            stop_sha=stop_sha,
+            pr_summary_regex=config["pr_summary_regex"],
+            pr_summary_label_regex=config["pr_summary_label_regex"],
+            complete=False,
+        )
+        if state is not None:
+            new_state.merge(state)
+
+    print(
+        f"Fetching commits of {org_repo} between {start_rev} and {stop_rev}...",
+        file=sys.stderr,
+    )
+    commits = pending_commits(
+        run, org_repo, start_rev, stop_rev, state=state, stop_sha=stop_sha
+    )
+    change_notes, authors, reviewers = set(), set(), set()
+    # Commits are processed in chunks, so that only the PyGithub objects of one
+    # chunk are held at a time. Only the compact records and results are kept
+    commit_chunks = chunked(
+        lazy_tqdm(commits, desc="Processing commits", disable=run.quiet),
+        COMMIT_CHUNK_SIZE,
+    )
+    while True:
+        with stage("commits"):
+            chunk = next(commit_chunks, None)
+        if chunk is None:
+            break
+        with stage("pull requests"):
+            pull_requests = pull_requests_from_commits(
+                chunk, ql=ql if run.backend == "graphql" else None, jobs=run.jobs
+            )
+        chunk = [
+            commit if isinstance(commit, GitCommit) else commit_info(commit)
+            for commit in chunk
+        ]
+        chunk_authors, chunk_reviewers = contributors(
+            org_repo=org_repo,
+            commits=chunk,
+            pull_requests=pull_requests,
+            jobs=run.jobs,
+            identities=run.identities,
+            ql=ql,
+        )
+        pull_requests = {pull_request_info(p) for p in pull_requests}
+        with stage("formatting"):
+            chunk_notes = ChangeNote.from_pull_requests(
+                pull_requests,
+                pr_summary_regex=config["pr_summary_regex"],
+                pr_summary_label_regex=config["pr_summary_label_regex"],
+            )
+        chunk_authors = Contributor.from_named_users(chunk_authors)
+        chunk_reviewers = Contributor.from_named_users(chunk_reviewers)
+        change_notes |= chunk_notes
+        authors |= chunk_authors
+        reviewers |= chunk_reviewers
+
+        if new_state is not None:
+            # Checkpoint, so that an interrupted run can be resumed
+            new_state.commits |= {commit_info(c) for c in chunk}
+            new_state.pull_requests |= pull_requests
+            new_state.change_notes |= chunk_notes
+            new_state.authors |= chunk_authors
+            new_state.reviewers |= chunk_reviewers
+            new_state.save(run.state_dir)
+
+    if new_state is None:
+        return change_notes, authors, reviewers
+    new_state.complete = True
+    path = new_state.save(run.state_dir)
+    logger.info("saved state of this run to %s", path)
+    return new_state.change_notes, new_state.authors, new_state.reviewers
+
+
+def notes_for_repo(
+    run: RunContext, entry: ManifestEntry, *, version: str, out: Union[str, None]
+) -> tuple[set[Contributor], set[Contributor]]:
+    """Write the notes of `entry` and of each release in `run.releases`.
+
+    Returns the authors and reviewers of all notes, without ignored users.
+    """
+    config = repo_config(run, entry)
+    ql = GitHubGraphQl(
+        org_name=entry.org_name,
+        repo_name=entry.repo_name,
+        scheduler=run.scheduler,
+        session=run.session,
+        facts=run.facts,
+    )
+
+    # The notes of each release cover the commits since the previous one.
+    # Consecutive ranges don't share commits, while users and the other
+    # resources above are shared
+    revs = [entry.start_rev, *run.releases, entry.stop_rev]
+    versions = [*run.releases, entry.version or version]
+    repo_authors, repo_reviewers = set(), set()
+    for start_rev, stop_rev, range_version in zip(revs, revs[1:], versions):
+        change_notes, authors, reviewers = collect_notes(
+            run, ql, config, entry.org_repo, start_rev, stop_rev
+        )
+        print(f"Formatting notes of {entry.org_repo}...", file=sys.stderr)
+        with stage("formatting"):
+            # Every format is rendered from the same fetched notes
+            notes = NotesModel.from_config(
+                config,
+                repo_name=entry.repo_name,
+                version=range_version,
+                change_notes=change_notes,
+                authors=authors,
+                reviewers=reviewers,
+            )
+            for format in run.formats:
+                notes_out = out and out_path(
+                    out,
+                    org_name=entry.org_name,
+                    repo_name=entry.repo_name,
+                    version=range_version,
+                    format=format,
+                )
+                write_lines(notes.iter_lines(format), notes_out)
+        repo_authors |= authors
+        repo_reviewers |= reviewers
+
+    ignored = set(config["ignored_user_logins"])
+    return (
+        {c for c in repo_authors if c.login not in ignored},
+        {c for c in repo_reviewers if c.login not in ignored},
+    )
+
+
+def print_estimates(
+    gh: Github,
+    entries: Iterable[ManifestEntry],
+    *,
+    backend: str,
+    git_dir: Union[Path, None],
+) -> None:
+    """Print the requests needed for each of `entries` and the remaining limits."""
+    for entry in entries:
+        if git_dir is not None:
+            commits = local_commits_between(
+                git_dir, entry.org_repo, entry.start_rev, entry.stop_rev
+            )
+            total_commits = len(commits)
+        else:
+            repo = gh.get_repo(entry.org_repo)
+            comparison = repo.compare(base=entry.start_rev, head=entry.stop_rev)
+            total_commits = comparison.total_commits
+        estimate = estimate_cost(
+            total_commits, backend=backend, local=git_dir is not None
+        )
+        print(f"Estimate for {entry.org_repo}: {estimate}", file=sys.stderr)
+    resources = gh.get_rate_limit().resources
+    print(
+        f"Remaining: {resources.core.remaining} REST requests and "
+        f"{resources.graphql.remaining} GraphQL points",
+        file=sys.stderr,
+    )
@@ -0,0 +1,229 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TypeVar, Union
+from urllib.parse import urlsplit
+
+import requests
+
+from ._http import LatencyStats, percentile
+from ._ratelimit import RateLimitScheduler
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+# Placeholders for the variable parts of REST endpoints, applied in order
+_ENDPOINT_PATTERNS = [
+    (re.compile(r"^/repos/[^/]+/[^/]+"), "/repos/{owner}/{repo}"),
+    (re.compile(r"/commits/[^/]+"), "/commits/{ref}"),
+    (re.compile(r"/compare/[^/]+"), "/compare/{basehead}"),
+    (re.compile(r"/contents/.+"), "/contents/{path}"),
+    (re.compile(r"^/users/[^/]+"), "/users/{login}"),
+    (re.compile(r"/\d+(?=/|$)"), "/{id}"),
+]
+
+
+def endpoint_of(method: str, url: str) -> str:
+    """Return the endpoint of a request, e.g. "GET /repos/{owner}/{repo}"."""
+    path = urlsplit(url).path
+    for pattern, placeholder in _ENDPOINT_PATTERNS:
+        path = pattern.sub(placeholder, path)
+    return f"{method} {path}"
+
+
+def _transferred_bytes(response: requests.Response) -> int:
+    """Return the size of the body as sent, i.e. compressed if it was."""
+    try:
+        return int(response.headers["Content-Length"])
+    except (KeyError, ValueError):
+        # Chunked responses don't announce their size
+        return len(response.content or b"")
+
+
+@dataclass
+class EndpointStats:
+    """Requests sent to an endpoint, `bytes` counts the bytes transferred.
+
+    `revalidated` counts the cached responses that were confirmed with a 304.
+    """
+
+    requests: int = 0
+    cached: int = 0
+    revalidated: int = 0
+    bytes: int = 0
+
+
+class Profile:
+    """Record where a run spends its time and which requests it makes.
+
+    Collects the wall time of each :func:`stage`, the requests per endpoint
+    including whether they were answered by the cache (see :meth:`record`), and
+    a summary of `scheduler` and `latencies` if given. Stages are only timed
+    while the profile is active (see :meth:`activate`).
+    """
+
+    def __init__(
+        self,
+        *,
+        scheduler: Union[RateLimitScheduler, None] = None,
+        latencies: Union[LatencyStats, None] = None,
+    ):
+        self.scheduler = scheduler
+        self.latencies = latencies
+        self.stages: dict[str, float] = {}
+        self.endpoints: dict[str, EndpointStats] = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self) -> Iterator["Profile"]:
+        """Make this the profile that :func:`stage` reports to."""
+        _active_profiles.append(self)
+        try:
+            yield self
+        finally:
+            _active_profiles.remove(self)
+
+    def record(self, response: requests.Response) -> None:
+        """Count `response` for its endpoint, cached or not."""
+        endpoint = endpoint_of(response.request.method, response.url)
+        cached = getattr(response, "from_cache", False)
+        revalidated = cached and getattr(response, "revalidated", False)
+        size = 0 if cached else _transferred_bytes(response)
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            stats.requests += 1
+            stats.cached += cached
+            stats.revalidated += revalidated
+            stats.bytes += size
+
+    def add_stage_time(self, name: str, seconds: float) -> None:
+        """Add `seconds` to the wall time of stage `name`."""
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def to_dict(self) -> dict:
+        """Return the profile as a JSON-serializable dictionary."""
+        data = {
+            "total_seconds": time.perf_counter() - self._start,
+            "stages": dict(self.stages),
+            "endpoints": {
+                endpoint: {
+                    "requests": stats.requests,
+                    "cached": stats.cached,
+                    "revalidated": stats.revalidated,
+                    "bytes": stats.bytes,
+                }
+                for endpoint, stats in sorted(self.endpoints.items())
+            },
+        }
+        hits = sum(stats.cached for stats in self.endpoints.values())
+        total = sum(stats.requests for stats in self.endpoints.values())
+        revalidated = sum(stats.revalidated for stats in self.endpoints.values())
+        data["cache"] = {
+            "hits": hits,
+            "misses": total - hits,
+            "revalidated": revalidated,
+        }
+        if self.scheduler is not None:
+            data["rate_limits"] = {
+                "graphql_points": self.scheduler.graphql_cost,
+                "retries": self.scheduler.retries,
+                "remaining": {
+                    resource: {"limit": limit.limit, "remaining": limit.remaining}
+                    for resource, limit in sorted(self.scheduler.limits.items())
+                },
+            }
+        if self.latencies is not None:
+            data["latencies"] = {
+                stage: {
+                    "count": len(samples),
+                    "p50": percentile(samples, 50),
+                    "p95": percentile(samples, 95),
+                    "p99": percentile(samples, 99),
+                }
+                for stage, samples in self.latencies.samples().items()
+            }
+        return data
+
+    def save(self, path: Path) -> None:
+        """Write the profile as JSON to `path`."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as fp:
+            json.dump(self.to_dict(), fp, indent=2)
+
+    def format_table(self) -> str:
+        """Return the profile as a human-readable table."""
+        data = self.to_dict()
+        lines = [f"{'Stage':<40} {'Seconds':>10}"]
+        for name, seconds in data["stages"].items():
+            lines.append(f"{name:<40} {seconds:>10.3f}")
+        lines.append(f"{'total':<40} {data['total_seconds']:>10.3f}")
+        lines.append("")
+
+        lines.append(
+            f"{'Endpoint':<60} {'Requests':>9} {'Cached':>7} {'304':>5} {'Bytes':>11}"
+        )
+        for endpoint, stats in data["endpoints"].items():
+            lines.append(
+                f"{endpoint:<60} {stats['requests']:>9} {stats['cached']:>7} "
+                f"{stats['revalidated']:>5} {stats['bytes']:>11}"
+            )
+        total_bytes = sum(stats["bytes"] for stats in data["endpoints"].values())
+        lines.append(f"{'total':<60} {'':>9} {'':>7} {'':>5} {total_bytes:>11}")
+
+        lines.append("")
+        lines.append(
+            f"Requests cache: {data['cache']['hits']} cache hits, "
+            f"{data['cache']['misses']} cache misses, "
+            f"{data['cache']['revalidated']} revalidated (304)"
+        )
+        if "rate_limits" in data:
+            lines.append(f"Rate limits: {self.scheduler}")
+        if "latencies" in data:
+            lines.append(f"Request latencies:\n{self.latencies}")
+        return "\n".join(lines)
+
+
+# Stack of profiles, the last one is active
+_active_profiles: list[Profile] = []
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the code within this context as stage `name` of the active profile.
+
+    Requests within the stage are attributed to it in the profile's latencies.
+    Does nothing if no profile is active.
+    """
+    if not _active_profiles:
+        yield
+        return
+    profile = _active_profiles[-1]
+    start = time.perf_counter()
+    try:
+        if profile.latencies is None:
+            yield
+        else:
+            with profile.latencies.stage(name):
+                yield
+    finally:
+        profile.add_stage_time(name, time.perf_counter() - start)
+
+
+def bind_stage(func: Callable[..., R]) -> Callable[..., R]:
+    """Wrap `func` to run in the current stage of the active profile.
+
+    Stages are entered per thread, so `func` should be wrapped before it's
+    passed to another thread.
+    """
+    if not _active_profiles or _active_profiles[-1].latencies is None:
+        return func
+    return _active_profiles[-1].latencies.bind(func)
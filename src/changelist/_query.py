@@ -1,35 +1,144 @@
 import json
 import logging
+import math
 import os
-from collections.abc import Iterable
-from dataclasses import dataclass
+import re
+from collections import deque
+from collections.abc import Callable, Generator, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Optional, TypeVar, Union
 
 import requests
 from github import Github
 from github.Commit import Commit
 from github.NamedUser import NamedUser
 from github.PullRequest import PullRequest
+from requests_cache import NEVER_EXPIRE, CacheMixin
+
+from ._facts import FactStore
+from ._git import GitCommit, co_authors_of
+from ._http import create_session
+from ._identity import IdentityIndex
+from ._profile import bind_stage, stage
+from ._ratelimit import RateLimitScheduler
+from ._records import (
+    CommitInfo,
+    CommitUsers,
+    GitActor,
+    PullRequestInfo,
+    UserInfo,
+)
 
 logger = logging.getLogger(__name__)
 
+# Queries for the authors of commits addressed by SHA, whose results never
+# change. Pull requests associated with a commit are edited after it's merged,
+# so they're cached by the default policy of the session, like users and reviews
+IMMUTABLE_QUERY_REGEX = re.compile(
+    r'^(?!.*associatedPullRequests).*object\(expression: "[0-9a-f]{40}"', re.DOTALL
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def map_concurrently(
+    func: Callable[[T], R], items: Iterable[T], *, jobs: int = 1
+) -> Iterator[R]:
+    """Apply `func` to each of `items` using a pool of `jobs` threads.
+
+    Results are yielded in the same order as `items`, so the outcome doesn't
+    depend on which request finishes first. Only a few items more than `jobs` are
+    taken from `items` ahead of the yielded results. That way, progress bars
+    wrapping `items` (see :func:`~changelist._output.lazy_tqdm`) still reflect
+    the actual progress.
+
+    With ``jobs=1``, `func` is called sequentially in the calling thread.
+    """
+    if jobs <= 1:
+        yield from map(func, items)
+        return
+
+    # Requests in the worker threads belong to the caller's stage
+    func = bind_stage(func)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Yield lists of up to `size` consecutive `items`, consuming them lazily."""
+    iter_items = iter(items)
+    while chunk := list(islice(iter_items, size)):
+        yield chunk
+
+
+def iter_commits_between(
+    gh: Github, org_name: str, start_rev: str, stop_rev: str
+) -> Iterator[Commit]:
+    """Yield commits between two revisions excluding the commit of `start_rev`.
+
+    Commits are fetched one page at a time as they are consumed.
+    """
+    repo = gh.get_repo(org_name)
+    start_sha = repo.get_commit(start_rev).sha
+    stop_sha = repo.get_commit(stop_rev).sha
+    found_stop = False
+    for commit in repo.compare(base=start_rev, head=stop_rev).commits:
+        assert commit.sha != start_sha
+        found_stop |= commit.sha == stop_sha
+        yield commit
+    assert found_stop
+
 
 def commits_between(
     gh: Github, org_name: str, start_rev: str, stop_rev: str
 ) -> set[Commit]:
     """Fetch commits between two revisions excluding the commit of `start_rev`."""
-    repo = gh.get_repo(org_name)
-    comparison = repo.compare(base=start_rev, head=stop_rev)
-    commits = set(comparison.commits)
-    assert repo.get_commit(start_rev) not in commits
-    assert repo.get_commit(stop_rev) in commits
-    return commits
+    return set(iter_commits_between(gh, org_name, start_rev, stop_rev))
 
 
-def pull_requests_from_commits(commits: Iterable[Commit]) -> set[PullRequest]:
-    """Fetch pull requests that are associated with the given `commits`."""
+def pull_requests_from_commits(
+    commits: Iterable[Commit],
+    *,
+    ql: Optional["GitHubGraphQl"] = None,
+    jobs: int = 1,
+) -> "set[Union[PullRequest, PullRequestInfo]]":
+    """Fetch pull requests that are associated with the given `commits`.
+
+    By default, pull requests are fetched with one REST request per commit. If `ql`
+    is given, pull requests for many commits are requested at once with GitHub's
+    GraphQL API instead, and returned as :class:`PullRequestInfo`.
+    Up to `jobs` requests are run concurrently.
+    """
+    if ql is None:
+        pulls_per_commit = map_concurrently(_rest_pulls_of_commit, commits, jobs=jobs)
+    else:
+        pulls_per_commit = _graphql_pulls_per_commit(commits, ql=ql, jobs=jobs)
+
+    return _collect_pull_requests(pulls_per_commit)
+
+
+def _rest_pulls_of_commit(commit: Commit) -> "tuple[Commit, list[PullRequest]]":
+    if isinstance(commit, GitCommit):
+        msg = "pull requests of local commits can only be fetched with GraphQL"
+        raise TypeError(msg)
+    return commit, list(commit.get_pulls())
+
+
+def _collect_pull_requests(
+    pulls_per_commit: "Iterable[tuple[Commit, list[PullRequest]]]",
+) -> "set[PullRequest]":
+    """Merge pull requests of each commit and log unexpected associations."""
     all_pull_requests = set()
-    for commit in commits:
-        commit_pull_requests = list(commit.get_pulls())
+    for commit, commit_pull_requests in pulls_per_commit:
         if len(commit_pull_requests) != 1:
             logger.info(
                 "%s with no or multiple PR(s): %r",
@@ -39,6 +148,8 @@ def pull_requests_from_commits(commits: Iterable[Commit]) -> set[PullRequest]:
         if any(not p.merged for p in commit_pull_requests):
             logger.error(
                 "%s with unmerged PRs: %r",
+                commit.html_url,
+                [p.html_url for p in commit_pull_requests if not p.merged],
             )
         for pull in commit_pull_requests:
             if pull in all_pull_requests:
@@ -51,126 +162,798 @@ def pull_requests_from_commits(commits: Iterable[Commit]) -> set[PullRequest]:
     return all_pull_requests
 
 
+def _graphql_pulls_per_commit(
+    commits: Iterable[Commit], *, ql: "GitHubGraphQl", jobs: int = 1
+) -> "Iterator[tuple[Commit, list[PullRequestInfo]]]":
+    """Yield each commit with its pull requests, fetched in batches via GraphQL.
+
+    `commits` are consumed one batch at a time, so that progress bars wrapping the
+    iterable stay meaningful.
+    """
+
+    def fetch(batch):
+        return batch, ql.find_pull_requests_batched(commit.sha for commit in batch)
+
+    for batch, pulls_by_sha in map_concurrently(
+        fetch, chunked(commits, ql.BATCH_SIZE), jobs=jobs
+    ):
+        for commit in batch:
+            yield commit, pulls_by_sha.get(commit.sha, [])
+
+
 @dataclass(frozen=True)
 class GitHubGraphQl:
-    """Interface to query GitHub's GraphQL API for a particular repository."""
+    """Interface to query GitHub's GraphQL API for a particular repository.
+
+    Queries are sent with `session`, which keeps connections alive between
+    queries. Pass a shared session (see :func:`~changelist._http.create_session`)
+    to reuse its connection pool across clients.
+
+    If `facts` is given, the batched queries for the pull requests associated
+    with commits and for reviewers only request what isn't known to the store
+    yet, and add the results to it.
+    """
 
     org_name: str
     repo_name: str
+    scheduler: Optional[RateLimitScheduler] = field(
+        default=None, compare=False, repr=False
+    )
+    session: requests.Session = field(
+        default_factory=create_session, compare=False, repr=False
+    )
+    facts: Optional[FactStore] = field(default=None, compare=False, repr=False)
 
     URL: str = "https://api.github.com/graphql"
-    GRAPHQL_AUTHORS: str = """
+    GRAPHQL_REPOSITORY: str = """
     query {{
+      rateLimit {{
+        cost
+        remaining
+        resetAt
+      }}
       repository (owner: "{org_name}" name: "{repo_name}") {{
-        object(expression: "{commit_sha}" ) {{
+        {fields}
+      }}
+    }}
+    """
+    GRAPHQL_COMMIT_AUTHORS: str = """
+        {alias}: object(expression: "{commit_sha}" ) {{
           ... on Commit {{
+            oid
             commitUrl
-            authors(first:{page_limit}) {{
+            authors(first:{page_limit}{after}) {{
+              pageInfo {{
+                hasNextPage
+                endCursor
+              }}
               edges {{
                 cursor
                 node {{
                   name
                   email
                   user {{
+                    id
                     login
                     databaseId
                   }}
                 }}
               }}
             }}
+            committer {{
+              name
+              email
+              user {{
+                id
+                login
+                databaseId
+              }}
+            }}
+          }}
+        }}
+    """
+    GRAPHQL_COMMIT_PULL_REQUESTS: str = """
+        {alias}: object(expression: "{commit_sha}" ) {{
+          ... on Commit {{
+            oid
+            commitUrl
+            associatedPullRequests(first:{pull_limit}) {{
+              totalCount
+              nodes {{
+                number
+                title
+                body
+                url
+                merged
+                mergedAt
+                labels(first:{page_limit}) {{
+                  totalCount
+                  nodes {{
+                    name
+                  }}
+                }}
+              }}
+            }}
+          }}
+        }}
+    """
+    GRAPHQL_PULL_REQUEST: str = """
+        {alias}: pullRequest(number: {number}) {{
+          number
+          title
+          body
+          url
+          merged
+          mergedAt
+          labels(first:{page_limit}) {{
+            totalCount
+            nodes {{
+              name
+            }}
           }}
         }}
+    """
+    GRAPHQL_PULL_REQUEST_REVIEWS: str = """
+        {alias}: pullRequest(number: {number}) {{
+          url
+          reviews(first:{page_limit}{after}) {{
+            pageInfo {{
+              hasNextPage
+              endCursor
+            }}
+            nodes {{
+              author {{
+                login
+                ... on User {{
+                  id
+                  databaseId
+                }}
+                ... on Bot {{
+                  id
+                  databaseId
+                }}
+              }}
+            }}
+          }}
+        }}
+    """
+    GRAPHQL_USERS: str = """
+    query {{
+      rateLimit {{
+        cost
+        remaining
+        resetAt
+      }}
+      nodes(ids: [{node_ids}]) {{
+        ... on User {{
+          id
+          databaseId
+          login
+          name
+          url
+        }}
+        ... on Bot {{
+          id
+          databaseId
+          login
+          url
+        }}
       }}
     }}
     """
     PAGE_LIMIT: int = 100
+    # Commits are rarely associated with more than one pull request
+    PULL_LIMIT: int = 10
+    # GitHub rejects queries that may return more than 500,000 nodes. Each aliased
+    # commit can return up to `PAGE_LIMIT` authors (plus the commit itself), so a
+    # batch of 50 commits stays far below that while keeping the point cost of a
+    # single query at about 1.
+    NODE_LIMIT: int = 500_000
+    BATCH_SIZE: int = 50
+    # The `nodes` field accepts up to 100 IDs
+    USER_BATCH_SIZE: int = 100
+
+    @property
+    def org_repo(self) -> str:
+        return f"{self.org_name}/{self.repo_name}"
 
     def _run_query(self, query: str) -> dict:
         """Fetch results for a GraphQl query."""
         headers = {"Authorization": f"Bearer {os.environ.get('GH_TOKEN')}"}
         sanitized_query = json.dumps({"query": query.replace("\n", "")})
-        response = requests.post(self.URL, data=sanitized_query, headers=headers)
+        kwargs = {}
+        # Only sessions with a cache accept an expiration per request
+        if isinstance(self.session, CacheMixin) and IMMUTABLE_QUERY_REGEX.search(query):
+            kwargs["expire_after"] = NEVER_EXPIRE
+        response = self.session.post(
+            self.URL, data=sanitized_query, headers=headers, **kwargs
+        )
+        response.raise_for_status()
         data = response.json()
+        if "errors" in data:
+            logger.error("GraphQL query returned errors: %r", data["errors"])
+        rate_limit = (data.get("data") or {}).get("rateLimit")
+        if (
+            self.scheduler is not None
+            and rate_limit
+            and not getattr(response, "from_cache", False)
+        ):
+            self.scheduler.record_graphql(rate_limit)
         return data
 
+    def _run(self, steps: Generator[str, dict, R]) -> R:
+        """Run the queries yielded by `steps` and send their results back.
+
+        Returns the final value of `steps`.
+        """
+        try:
+            query = next(steps)
+            while True:
+                query = steps.send(self._run_query(query))
+        except StopIteration as stop:
+            return stop.value
+
+    def _batches(self, items: list, *, nodes_per_item: int) -> Iterable[list]:
+        """Split `items` into batches that fit into a single query."""
+        batch_size = min(self.BATCH_SIZE, self.NODE_LIMIT // nodes_per_item)
+        for i in range(0, len(items), batch_size):
+            yield items[i : i + batch_size]
+
     def find_authors(self, commit_sha: str) -> dict[int, str]:
         """Find ID and login of (co-)author(s) for a commit.
 
         Other than GitHub's REST API, the GraphQL API supports returning all authors,
         including co-authors, of a commit.
         """
-        query = self.GRAPHQL_AUTHORS.format(
-            org_name=self.org_name,
-            repo_name=self.repo_name,
-            commit_sha=commit_sha,
-            page_limit=self.PAGE_LIMIT,
-        )
-        data = self._run_query(query)
-        commit = data["data"]["repository"]["object"]
-        edges = commit["authors"]["edges"]
-        if len(edges) == self.PAGE_LIMIT:
-            # TODO implement pagination if this becomes an issue, e.g. see
-            # https://github.com/scientific-python/devstats-data/blob/e3cd826518bf590083409318b0a7518f7781084f/query.py#L92-L107
+        return self.find_authors_batched([commit_sha])[commit_sha]
+
+    def find_authors_batched(
+        self, commit_shas: Iterable[str]
+    ) -> dict[str, dict[int, str]]:
+        """Find ID and login of (co-)author(s) for many commits at once.
+
+        Like :meth:`find_authors` but multiple commits are requested in a single
+        query using aliased fields. Commits with more than `PAGE_LIMIT` authors
+        are paginated in follow-up queries.
+        """
+        return self._run(self.iter_find_authors(commit_shas))
+
+    def iter_find_authors(
+        self, commit_shas: Iterable[str]
+    ) -> Generator[str, dict, dict[str, dict[int, str]]]:
+        """Yield queries to find authors for many commits.
+
+        The result of each query must be sent back into the generator, which
+        returns the same as :meth:`find_authors_batched`. This allows running the
+        queries with different HTTP clients.
+        """
+        users_by_sha = yield from self.iter_find_commit_users(commit_shas)
+
+        coauthors_by_sha = {}
+        for sha, users in users_by_sha.items():
+            coauthors = {}
+            for author in users.authors:
+                if author.user is None:
+                    logger.warning(
+                        "could not determine GitHub user for %r in %r",
+                        author,
+                        users.commit_url,
+                    )
+                    continue
+                coauthors[author.user.id] = author.user.login
+            assert coauthors
+            coauthors_by_sha[sha] = coauthors
+        return coauthors_by_sha
+
+    def find_commit_users_batched(
+        self, commit_shas: Iterable[str]
+    ) -> "dict[str, CommitUsers]":
+        """Find (co-)authors and committer of many commits at once.
+
+        Other than :meth:`find_authors_batched`, the git identities (name and email)
+        are returned as well, and authors without a GitHub user are included.
+        """
+        return self._run(self.iter_find_commit_users(commit_shas))
+
+    def iter_find_commit_users(
+        self, commit_shas: Iterable[str]
+    ) -> "Generator[str, dict, dict[str, CommitUsers]]":
+        """Yield queries to find authors and committer of many commits.
+
+        Works like :meth:`iter_find_authors`.
+        """
+        commit_shas = list(dict.fromkeys(commit_shas))
+        edges_by_sha = {sha: [] for sha in commit_shas}
+        commits_by_sha = {}
+
+        # Maps commit SHA to the cursor of the next page, `None` for the first one
+        pending = dict.fromkeys(commit_shas)
+        while pending:
+            next_pending = {}
+            for batch in self._batches(
+                list(pending.items()), nodes_per_item=self.PAGE_LIMIT + 2
+            ):
+                fields = "".join(
+                    self.GRAPHQL_COMMIT_AUTHORS.format(
+                        alias=f"commit{i}",
+                        commit_sha=sha,
+                        page_limit=self.PAGE_LIMIT,
+                        after=f' after:"{cursor}"' if cursor else "",
+                    )
+                    for i, (sha, cursor) in enumerate(batch)
+                )
+                query = self.GRAPHQL_REPOSITORY.format(
+                    org_name=self.org_name, repo_name=self.repo_name, fields=fields
+                )
+                data = yield query
+                repository = data["data"]["repository"]
+                for i, (sha, _) in enumerate(batch):
+                    commit = repository[f"commit{i}"]
+                    if commit is None:
+                        logger.error("could not find commit %s", sha)
+                        continue
+                    commits_by_sha[sha] = commit
+                    authors = commit["authors"]
+                    edges_by_sha[sha].extend(authors["edges"])
+                    if authors["pageInfo"]["hasNextPage"]:
+                        logger.debug(
+                            "fetching next page of authors for %r", commit["commitUrl"]
+                        )
+                        next_pending[sha] = authors["pageInfo"]["endCursor"]
+            pending = next_pending
+
+        users_by_sha = {}
+        for sha, commit in commits_by_sha.items():
+            users_by_sha[sha] = CommitUsers(
+                commit_url=commit["commitUrl"],
+                authors=tuple(
+                    GitActor.from_graphql(edge["node"]) for edge in edges_by_sha[sha]
+                ),
+                committer=GitActor.from_graphql(commit["committer"])
+                if commit["committer"]
+                else None,
+            )
+        return users_by_sha
+
+    def find_pull_requests_batched(
+        self, commit_shas: Iterable[str]
+    ) -> "dict[str, list[PullRequestInfo]]":
+        """Find pull requests associated with many commits at once.
+
+        Multiple commits are requested in a single query using aliased fields.
+        At most `PULL_LIMIT` pull requests per commit and `PAGE_LIMIT` labels per
+        pull request are included.
+
+        If the pull requests of a commit are known to `facts`, they're requested
+        by number instead. Their titles, descriptions and labels are edited even
+        after they're merged, so they're fetched again, like other mutable
+        resources subject to the expiration of the session's cache.
+        """
+        if self.facts is None:
+            return self._run(self.iter_find_pull_requests(commit_shas))
+        commit_shas = list(commit_shas)
+        numbers_by_sha = self.facts.pull_numbers_of(self.org_repo, commit_shas)
+        unknown = [sha for sha in commit_shas if sha not in numbers_by_sha]
+        pulls_by_sha = {}
+        if unknown:
+            pulls_by_sha = self._run(self.iter_find_pull_requests(unknown))
+            self.facts.add_pull_requests(self.org_repo, pulls_by_sha)
+        numbers = {number for numbers in numbers_by_sha.values() for number in numbers}
+        if numbers:
+            pulls = self._run(self.iter_find_pull_requests_by_number(numbers))
+            for sha, pull_numbers in numbers_by_sha.items():
+                pulls_by_sha[sha] = [pulls[n] for n in pull_numbers if n in pulls]
+        return pulls_by_sha
+
+    def iter_find_pull_requests(
+        self, commit_shas: Iterable[str]
+    ) -> "Generator[str, dict, dict[str, list[PullRequestInfo]]]":
+        """Yield queries to find pull requests associated with many commits.
+
+        Works like :meth:`iter_find_authors`.
+        """
+        commit_shas = list(dict.fromkeys(commit_shas))
+        nodes_per_item = 1 + self.PULL_LIMIT * (1 + self.PAGE_LIMIT)
+
+        pulls_by_sha = {}
+        for batch in self._batches(commit_shas, nodes_per_item=nodes_per_item):
+            fields = "".join(
+                self.GRAPHQL_COMMIT_PULL_REQUESTS.format(
+                    alias=f"commit{i}",
+                    commit_sha=sha,
+                    pull_limit=self.PULL_LIMIT,
+                    page_limit=self.PAGE_LIMIT,
+                )
+                for i, sha in enumerate(batch)
+            )
+            query = self.GRAPHQL_REPOSITORY.format(
+                org_name=self.org_name, repo_name=self.repo_name, fields=fields
+            )
+            data = yield query
+            repository = data["data"]["repository"]
+            for i, sha in enumerate(batch):
+                commit = repository[f"commit{i}"]
+                if commit is None:
+                    logger.error("could not find commit %s", sha)
+                    continue
+                pulls = commit["associatedPullRequests"]
+                if pulls["totalCount"] > self.PULL_LIMIT:
+                    logger.warning(
+                        "%r is associated with more than %i pull requests, "
+                        "only the first ones will be included",
+                        commit["commitUrl"],
+                        self.PULL_LIMIT,
+                    )
+                pulls_by_sha[sha] = [
+                    self._pull_request_from_graphql(node) for node in pulls["nodes"]
+                ]
+        return pulls_by_sha
+
+    def iter_find_pull_requests_by_number(
+        self, numbers: Iterable[int]
+    ) -> "Generator[str, dict, dict[int, PullRequestInfo]]":
+        """Yield queries to find many pull requests by their number.
+
+        Works like :meth:`iter_find_authors`. Pull requests that can't be found
+        are left out.
+        """
+        numbers = list(dict.fromkeys(numbers))
+        pulls = {}
+        for batch in self._batches(numbers, nodes_per_item=1 + self.PAGE_LIMIT):
+            fields = "".join(
+                self.GRAPHQL_PULL_REQUEST.format(
+                    alias=f"pull{i}", number=number, page_limit=self.PAGE_LIMIT
+                )
+                for i, number in enumerate(batch)
+            )
+            query = self.GRAPHQL_REPOSITORY.format(
+                org_name=self.org_name, repo_name=self.repo_name, fields=fields
+            )
+            data = yield query
+            repository = data["data"]["repository"]
+            for i, number in enumerate(batch):
+                node = repository[f"pull{i}"]
+                if node is None:
+                    logger.error("could not find pull request #%i", number)
+                    continue
+                pulls[number] = self._pull_request_from_graphql(node)
+        return pulls
+
+    def _pull_request_from_graphql(self, node: dict) -> PullRequestInfo:
+        if node["labels"]["totalCount"] > self.PAGE_LIMIT:
             logger.warning(
-                "reached page limit while querying authors in %r, "
-                "only the first %i authors will be included",
-                commit["commitUrl"],
+                "reached page limit while querying labels of %r, "
+                "only the first %i labels will be included",
+                node["url"],
                 self.PAGE_LIMIT,
             )
+        return PullRequestInfo.from_graphql(node)
+
+    def find_reviewers_batched(
+        self, numbers: Iterable[int]
+    ) -> "dict[int, set[UserInfo]]":
+        """Find the authors of reviews for many pull requests at once.
+
+        Multiple pull requests are requested in a single query using aliased
+        fields. Pull requests with more than `PAGE_LIMIT` reviews are paginated
+        in follow-up queries. Returns the reviewers mapped to the pull request's
+        number.
+        """
+        if self.facts is None:
+            return self._run(self.iter_find_reviewers(numbers))
+        numbers = list(numbers)
+        reviewers_by_number = self.facts.reviewers_of(self.org_repo, numbers)
+        unknown = [number for number in numbers if number not in reviewers_by_number]
+        if unknown:
+            fetched = self._run(self.iter_find_reviewers(unknown))
+            self.facts.add_reviewers(self.org_repo, fetched)
+            reviewers_by_number.update(fetched)
+        return reviewers_by_number
+
+    def iter_find_reviewers(
+        self, numbers: Iterable[int]
+    ) -> "Generator[str, dict, dict[int, set[UserInfo]]]":
+        """Yield queries to find reviewers of many pull requests.
+
+        Works like :meth:`iter_find_authors`. Pull requests that can't be found
+        are left out, so that they aren't mistaken for ones without reviewers.
+        """
+        numbers = list(dict.fromkeys(numbers))
+        reviewers_by_number = {}
 
-        coauthors = {}
-        for _i, edge in enumerate(edges):
-            node = edge["node"]
-            user = node["user"]
-            if user is None:
-                logger.warning(
-                    "could not determine GitHub user for %r in %r",
-                    node,
-                    commit["commitUrl"],
+        # Maps number to the cursor of the next page, `None` for the first one
+        pending = dict.fromkeys(numbers)
+        while pending:
+            next_pending = {}
+            for batch in self._batches(
+                list(pending.items()), nodes_per_item=self.PAGE_LIMIT + 1
+            ):
+                fields = "".join(
+                    self.GRAPHQL_PULL_REQUEST_REVIEWS.format(
+                        alias=f"pull{i}",
+                        number=number,
+                        page_limit=self.PAGE_LIMIT,
+                        after=f' after:"{cursor}"' if cursor else "",
+                    )
+                    for i, (number, cursor) in enumerate(batch)
                 )
-                continue
-            coauthors[user["databaseId"]] = user["login"]
+                query = self.GRAPHQL_REPOSITORY.format(
+                    org_name=self.org_name, repo_name=self.repo_name, fields=fields
+                )
+                data = yield query
+                repository = data["data"]["repository"]
+                for i, (number, _) in enumerate(batch):
+                    pull = repository[f"pull{i}"]
+                    if pull is None:
+                        logger.error("could not find pull request #%i", number)
+                        continue
+                    reviews = pull["reviews"]
+                    reviewers = reviewers_by_number.setdefault(number, set())
+                    for node in reviews["nodes"]:
+                        # Authors of deleted accounts are `None`
+                        if node["author"] and node["author"].get("databaseId"):
+                            reviewers.add(UserInfo.from_graphql(node["author"]))
+                    if reviews["pageInfo"]["hasNextPage"]:
+                        logger.debug(
+                            "fetching next page of reviews for %r", pull["url"]
+                        )
+                        next_pending[number] = reviews["pageInfo"]["endCursor"]
+            pending = next_pending
+        return reviewers_by_number
+
+    def find_users_batched(self, node_ids: Iterable[str]) -> "dict[str, UserInfo]":
+        """Find login, name and profile URL of many users at once.
+
+        Users are requested by their global node ID, up to `USER_BATCH_SIZE` per
+        query. Returns the users mapped to their node ID. Fetched users aren't
+        added to `facts`, :func:`hydrate_users` keeps them in its identity index.
+        """
+        return self._run(self.iter_find_users(node_ids))
 
-        assert coauthors
-        return coauthors
+    def iter_find_users(
+        self, node_ids: Iterable[str]
+    ) -> "Generator[str, dict, dict[str, UserInfo]]":
+        """Yield queries to find many users.
+
+        Works like :meth:`iter_find_authors`.
+        """
+        node_ids = list(dict.fromkeys(node_ids))
+        users = {}
+        for i in range(0, len(node_ids), self.USER_BATCH_SIZE):
+            batch = node_ids[i : i + self.USER_BATCH_SIZE]
+            query = self.GRAPHQL_USERS.format(
+                node_ids=", ".join(json.dumps(node_id) for node_id in batch)
+            )
+            data = yield query
+            for node_id, node in zip(batch, data["data"]["nodes"]):
+                if not node:
+                    logger.error("could not find user with node ID %r", node_id)
+                    continue
+                users[node_id] = UserInfo.from_graphql(node)
+        return users
 
 
 def contributors(
-    gh: Github,
     org_repo: str,
-    commits: Iterable[Commit],
-    pull_requests: Iterable[PullRequest],
-) -> tuple[set[NamedUser], set[NamedUser]]:
+    commits: Iterable[Union[Commit, CommitInfo, GitCommit]],
+    pull_requests: "Iterable[Union[PullRequest, PullRequestInfo]]",
+    *,
+    jobs: int = 1,
+    identities: Optional[IdentityIndex] = None,
+    ql: Optional[GitHubGraphQl] = None,
+) -> "tuple[set[UserInfo], set[UserInfo]]":
     """Fetch commit authors, co-authors and reviewers.
 
     `authors` are users which created or co-authored a commit.
     `reviewers` are users, who added reviews to a merged pull request or merged a
     pull request (committer of the merge commit).
+    Up to `jobs` requests are run concurrently.
+
+    The GitHub users of "Co-authored-by" trailers and of commits from a local git
+    repository (:class:`GitCommit`) are looked up in `identities` first. Only
+    commits with unknown identities are requested from the GraphQL API, and only
+    unknown users are fetched (see :func:`hydrate_users`). New results are added
+    to `identities`. Commits may be given as compact :class:`CommitInfo` records
+    instead of PyGithub objects. Reviews of pull requests from the GraphQL API
+    (:class:`PullRequestInfo`) are requested in batches as well, using `ql` if
+    given.
     """
     authors = set()
     reviewers = set()
+    identities = IdentityIndex() if identities is None else identities
+
+    if ql is None:
+        org_name, repo_name = org_repo.split("/")
+        ql = GitHubGraphQl(org_name=org_name, repo_name=repo_name)
+
+    def is_known(name, email):
+        # Resolve locally only if the details of the identity's user are known too
+        return (name, email) in identities and (
+            identities.user_id(name, email) is None
+            or identities.lookup(name, email) is not None
+        )
+
+    with stage("authors"):
+        unresolved_shas = []
+        local_shas = set()
+        for commit in commits:
+            if isinstance(commit, GitCommit):
+                # Only names and emails are known locally
+                author_identities = [
+                    (commit.author_name, commit.author_email),
+                    *commit.co_authors,
+                ]
+                committer_identities = [(commit.committer_name, commit.committer_email)]
+                local_shas.add(commit.sha)
+            else:
+                if commit.author:
+                    authors.add(commit.author)
+                if commit.committer:
+                    reviewers.add(commit.committer)
+                if isinstance(commit, CommitInfo):
+                    message = commit.message
+                else:
+                    message = commit.commit.message
+                if "Co-authored-by:" not in message:
+                    logger.debug("no co-authors in %r", commit.html_url)
+                    continue
+                author_identities = co_authors_of(message)
+                committer_identities = []
+
+            if not all(
+                is_known(*identity)
+                for identity in (*author_identities, *committer_identities)
+            ):
+                unresolved_shas.append(commit.sha)
+                continue
+            for found, commit_identities in [
+                (authors, author_identities),
+                (reviewers, committer_identities),
+            ]:
+                for name, email in commit_identities:
+                    user = identities.lookup(name, email)
+                    if user is not None:
+                        found.add(user)
+
+        # Fallback on GraphQL API to find co-authors as well
+        users_by_sha = ql.find_commit_users_batched(unresolved_shas)
+        for sha, users in users_by_sha.items():
+            for actor in (*users.authors, users.committer):
+                if actor is not None:
+                    identities.add_identity(
+                        actor.name, actor.email, actor.user and actor.user.id
+                    )
+            for author in users.authors:
+                if author.user is None:
+                    logger.warning(
+                        "could not determine GitHub user for %r in %r",
+                        author,
+                        users.commit_url,
+                    )
+                    continue
+                authors.add(author.user)
+            if sha in local_shas and users.committer and users.committer.user:
+                reviewers.add(users.committer.user)
+
+    def review_batches():
+        batch = []
+        for pull in pull_requests:
+            if not isinstance(pull, PullRequestInfo):
+                # Pull requests from the REST API are reviewed one at a time
+                yield [pull]
+                continue
+            batch.append(pull)
+            if len(batch) == ql.BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
-    org_name, repo_name = org_repo.split("/")
-    ql = GitHubGraphQl(org_name=org_name, repo_name=repo_name)
-
-    for commit in commits:
-        if commit.author:
-            authors.add(commit.author)
-        if commit.committer:
-            reviewers.add(commit.committer)
-        if "Co-authored-by:" in commit.commit.message:
-            # Fallback on GraphQL API to find co-authors as well
-            user_ids = ql.find_authors(commit.sha)
-            for user_id, user_login in user_ids.items():
-                named_user = gh.get_user_by_id(user_id)
-                assert named_user.login == user_login
-                authors.add(named_user)
-        else:
-            logger.debug("no co-authors in %r", commit.html_url)
-
-    for pull in pull_requests:
-        for review in pull.get_reviews():
-            if review.user:
-                reviewers.add(review.user)
+    def fetch_reviewers(batch):
+        if isinstance(batch[0], PullRequestInfo):
+            reviewers_by_number = ql.find_reviewers_batched(p.number for p in batch)
+            return set().union(*reviewers_by_number.values())
+        return {review.user for review in batch[0].get_reviews() if review.user}
 
+    with stage("reviewers"):
+        for batch_reviewers in map_concurrently(
+            fetch_reviewers, review_batches(), jobs=jobs
+        ):
+            reviewers.update(batch_reviewers)
+
+    with stage("users"):
+        complete = hydrate_users(ql, authors | reviewers, identities=identities)
+    authors = {complete[user.id] for user in authors}
+    reviewers = {complete[user.id] for user in reviewers}
     return authors, reviewers
+
+
+def hydrate_users(
+    ql: GitHubGraphQl,
+    users: "Iterable[Union[NamedUser, UserInfo]]",
+    *,
+    identities: IdentityIndex,
+) -> "dict[int, UserInfo]":
+    """Complete `users` with their name and profile URL, mapped to their ID.
+
+    Accessing the name of a partial :class:`NamedUser`, e.g. the author of a
+    commit, makes a request per user. Instead, users are looked up in
+    `identities` first and unknown ones are requested in batches via GraphQL by
+    their node ID. Fetched users are added to `identities`.
+    """
+    users = {user.id: user for user in users}
+    unknown = {
+        user.node_id: user_id
+        for user_id, user in users.items()
+        if identities.user(user_id) is None and user.node_id
+    }
+    logger.debug("fetching %i of %i users", len(unknown), len(users))
+    for user in ql.find_users_batched(unknown).values():
+        identities.add_user(user)
+
+    complete = {}
+    for user_id, user in users.items():
+        complete[user_id] = identities.user(user_id)
+        if complete[user_id] is None:
+            logger.warning("could not fetch details of user %r", user.login)
+            complete[user_id] = UserInfo(
+                id=user_id, login=user.login, node_id=user.node_id
+            )
+    return complete
+
+
+@dataclass(frozen=True)
+class CostEstimate:
+    """Upper bound of the requests needed to fetch the notes for a range."""
+
+    commits: int
+    rest_requests: int
+    graphql_queries: int
+    graphql_points: int
+
+    def __str__(self) -> str:
+        return (
+            f"{self.commits} commits: up to {self.rest_requests} REST requests and "
+            f"{self.graphql_queries} GraphQL queries ({self.graphql_points} points)"
+        )
+
+
+def estimate_cost(
+    total_commits: int, *, backend: str = "graphql", local: bool = False
+) -> CostEstimate:
+    """Estimate the requests needed to fetch the notes for `total_commits`.
+
+    Assumes the worst case without a cache: every commit has its own pull
+    request, co-authors and a separate author. Commits of a local clone
+    (`local`) don't need any requests to be listed.
+    """
+    ql = GitHubGraphQl
+    rest_requests = 0
+    graphql_queries = 0
+    graphql_points = 0
+
+    def add_queries(items, batch_size, connections_per_item):
+        nonlocal graphql_queries, graphql_points
+        queries = math.ceil(items / batch_size)
+        # GitHub charges one point per 100 requested connections, at least one
+        points = max(1, math.ceil(batch_size * connections_per_item / 100))
+        graphql_queries += queries
+        graphql_points += queries * points
+
+    if not local:
+        # Comparison, its pages and the checks of both revisions
+        rest_requests += 3 + math.ceil(total_commits / 250)
+    if backend == "rest":
+        # Pull requests and their reviews
+        rest_requests += 2 * total_commits
+    else:
+        add_queries(total_commits, ql.BATCH_SIZE, 1 + ql.PULL_LIMIT)
+        add_queries(total_commits, ql.BATCH_SIZE, 1)
+    add_queries(total_commits, ql.BATCH_SIZE, 1)
+    add_queries(2 * total_commits, ql.USER_BATCH_SIZE, 0)
+    return CostEstimate(
+        commits=total_commits,
+        rest_requests=rest_requests,
+        graphql_queries=graphql_queries,
+        graphql_points=graphql_points,
+    )
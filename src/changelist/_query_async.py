@@ -0,0 +1,288 @@
+import asyncio
+import json
+import logging
+import os
+from collections.abc import Generator, Iterable
+from typing import Optional, TypeVar
+
+try:
+    import httpx
+except ModuleNotFoundError:
+    httpx = None
+
+from ._query import GitHubGraphQl, _collect_pull_requests
+from ._records import CommitInfo, PullRequestInfo, UserInfo
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+
+class AsyncGitHub:
+    """Asynchronous client for GitHub's REST and GraphQL API.
+
+    All requests share a single pool of keep-alive connections and at most
+    `max_concurrency` requests are in flight at the same time. Use it as an
+    asynchronous context manager, e.g.::
+
+        async with AsyncGitHub(token) as client:
+            commits = await commits_between(client, "org/repo", "v1.0", "main")
+
+    Requires the optional dependency `httpx`.
+    """
+
+    API_URL = "https://api.github.com"
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        *,
+        max_concurrency: int = 10,
+        api_url: str = API_URL,
+        timeout: float = 30.0,
+    ):
+        if httpx is None:
+            raise ModuleNotFoundError(
+                "the asyncio engine requires httpx, "
+                "install it with `pip install changelist[async]`"
+            )
+        token = token or os.environ.get("GH_TOKEN")
+        headers = {"Accept": "application/vnd.github+json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        self.api_url = api_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+        # Created on first use, so that it is bound to the running event loop
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close all connections."""
+        await self._client.aclose()
+
+    async def _request(self, method: str, url: str, **kwargs) -> "httpx.Response":
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            response = await self._client.request(method, url, **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def get(self, path: str, **params) -> dict:
+        """Fetch a single resource from the REST API."""
+        response = await self._request("GET", f"{self.api_url}{path}", params=params)
+        return response.json()
+
+    async def get_paginated(self, path: str, *, key: Optional[str] = None) -> list:
+        """Fetch all pages of a list from the REST API.
+
+        If the endpoint doesn't return a list directly, `key` selects the list in
+        each returned page.
+        """
+        items = []
+        url = f"{self.api_url}{path}"
+        params = {"per_page": 100}
+        while url:
+            response = await self._request("GET", url, params=params)
+            data = response.json()
+            items.extend(data[key] if key else data)
+            url = response.links.get("next", {}).get("url")
+            # The URL of the next page already includes all parameters
+            params = None
+        return items
+
+    async def graphql(self, query: str) -> dict:
+        """Fetch results for a GraphQL query."""
+        content = json.dumps({"query": query.replace("\n", "")})
+        response = await self._request(
+            "POST", f"{self.api_url}/graphql", content=content
+        )
+        data = response.json()
+        if "errors" in data:
+            logger.error("GraphQL query returned errors: %r", data["errors"])
+        return data
+
+    async def run_graphql(self, steps: Generator[str, dict, R]) -> R:
+        """Run the queries yielded by `steps` and send their results back.
+
+        `steps` is one of the generators provided by :class:`GitHubGraphQl`, e.g.
+        :meth:`GitHubGraphQl.iter_find_authors`.
+        """
+        try:
+            query = next(steps)
+            while True:
+                query = steps.send(await self.graphql(query))
+        except StopIteration as stop:
+            return stop.value
+
+
+def _batched(items: list, size: int) -> list[list]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+async def commits_between(
+    client: AsyncGitHub, org_repo: str, start_rev: str, stop_rev: str
+) -> set[CommitInfo]:
+    """Fetch commits between two revisions excluding the commit of `start_rev`."""
+    commits = await client.get_paginated(
+        f"/repos/{org_repo}/compare/{start_rev}...{stop_rev}", key="commits"
+    )
+    return {CommitInfo.from_rest(commit) for commit in commits}
+
+
+async def pull_requests_from_commits(
+    client: AsyncGitHub,
+    org_repo: str,
+    commits: Iterable[CommitInfo],
+    *,
+    ql: Optional[GitHubGraphQl] = None,
+) -> set[PullRequestInfo]:
+    """Fetch pull requests that are associated with the given `commits`.
+
+    By default, pull requests are fetched with one REST request per commit. If `ql`
+    is given, pull requests for many commits are requested at once with GitHub's
+    GraphQL API instead.
+    """
+    commits = list(commits)
+    if ql is None:
+        pulls = await asyncio.gather(
+            *(
+                client.get_paginated(f"/repos/{org_repo}/commits/{commit.sha}/pulls")
+                for commit in commits
+            )
+        )
+        pulls_per_commit = [
+            (commit, [PullRequestInfo.from_rest(pull) for pull in commit_pulls])
+            for commit, commit_pulls in zip(commits, pulls)
+        ]
+    else:
+        results = await asyncio.gather(
+            *(
+                client.run_graphql(
+                    ql.iter_find_pull_requests(commit.sha for commit in batch)
+                )
+                for batch in _batched(commits, ql.BATCH_SIZE)
+            )
+        )
+        pulls_by_sha = {}
+        for result in results:
+            pulls_by_sha.update(result)
+        pulls_per_commit = [
+            (commit, pulls_by_sha.get(commit.sha, [])) for commit in commits
+        ]
+    return _collect_pull_requests(pulls_per_commit)
+
+
+async def contributors(
+    client: AsyncGitHub,
+    org_repo: str,
+    commits: Iterable[CommitInfo],
+    pull_requests: Iterable[PullRequestInfo],
+    *,
+    ql: Optional[GitHubGraphQl] = None,
+) -> tuple[set[UserInfo], set[UserInfo]]:
+    """Fetch commit authors, co-authors and reviewers.
+
+    `authors` are users which created or co-authored a commit.
+    `reviewers` are users, who added reviews to a merged pull request or merged a
+    pull request (committer of the merge commit).
+
+    Like :func:`changelist._query.contributors`, co-authors, reviews and the
+    details of users are requested in batches with GitHub's GraphQL API, using
+    `ql` if given. Batches are requested concurrently.
+    """
+    authors = set()
+    reviewers = set()
+
+    if ql is None:
+        org_name, repo_name = org_repo.split("/")
+        ql = GitHubGraphQl(org_name=org_name, repo_name=repo_name)
+
+    coauthored_shas = []
+    for commit in commits:
+        if commit.author:
+            authors.add(commit.author)
+        if commit.committer:
+            reviewers.add(commit.committer)
+        if "Co-authored-by:" in commit.message:
+            coauthored_shas.append(commit.sha)
+        else:
+            logger.debug("no co-authors in %r", commit.html_url)
+
+    async def find_coauthors():
+        # Fallback on GraphQL API to find co-authors as well
+        results = await asyncio.gather(
+            *(
+                client.run_graphql(ql.iter_find_commit_users(batch))
+                for batch in _batched(coauthored_shas, ql.BATCH_SIZE)
+            )
+        )
+        coauthors = set()
+        for users_by_sha in results:
+            for users in users_by_sha.values():
+                for author in users.authors:
+                    if author.user is None:
+                        logger.warning(
+                            "could not determine GitHub user for %r in %r",
+                            author,
+                            users.commit_url,
+                        )
+                        continue
+                    coauthors.add(author.user)
+        return coauthors
+
+    async def find_reviewers():
+        numbers = [pull.number for pull in pull_requests]
+        results = await asyncio.gather(
+            *(
+                client.run_graphql(ql.iter_find_reviewers(batch))
+                for batch in _batched(numbers, ql.BATCH_SIZE)
+            )
+        )
+        return {
+            user
+            for reviewers_by_number in results
+            for pull_reviewers in reviewers_by_number.values()
+            for user in pull_reviewers
+        }
+
+    coauthors, pull_reviewers = await asyncio.gather(find_coauthors(), find_reviewers())
+    authors.update(coauthors)
+    reviewers.update(pull_reviewers)
+
+    # Users embedded in other resources lack their name, so fetch complete users
+    node_ids = sorted({user.node_id for user in authors | reviewers if user.node_id})
+    results = await asyncio.gather(
+        *(
+            client.run_graphql(ql.iter_find_users(batch))
+            for batch in _batched(node_ids, ql.USER_BATCH_SIZE)
+        )
+    )
+    users_by_id = {
+        user.id: user
+        for users_by_node_id in results
+        for user in users_by_node_id.values()
+    }
+
+    def complete(user):
+        if user.id not in users_by_id:
+            logger.warning("could not fetch details of user %r", user.login)
+            return user
+        return users_by_id[user.id]
+
+    authors = {complete(user) for user in authors}
+    reviewers = {complete(user) for user in reviewers}
+    return authors, reviewers
@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Union
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+def resource_of(url: str) -> str:
+    """Return the name of the rate limit that applies to a request to `url`."""
+    if url.rstrip("/").endswith("/graphql"):
+        return "graphql"
+    if "/search/" in url:
+        return "search"
+    return "core"
+
+
+@dataclass
+class RateLimit:
+    """State of one of GitHub's rate limits, `reset` is in seconds since epoch."""
+
+    limit: int
+    remaining: int
+    reset: float
+
+
+class RateLimitScheduler:
+    """Pace requests to GitHub's API so that they stay within its rate limits.
+
+    The state of each rate limit is taken from the `X-RateLimit-*` headers of
+    every response. As long as more than a `reserve` fraction of a limit is
+    left, requests are sent right away. Below that, the remaining requests are
+    spread evenly until the limit resets, and once it is exhausted, requests
+    wait for the reset.
+
+    Responses that indicate a primary or secondary rate limit are retried up to
+    `max_retries` times, honoring `Retry-After` or backing off exponentially,
+    as long as the wait doesn't exceed `max_wait` seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        reserve: float = 0.1,
+        max_retries: int = 5,
+        max_wait: float = 15 * 60,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.limits: dict[str, RateLimit] = {}
+        self.graphql_cost = 0
+        self.retries = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def __str__(self) -> str:
+        with self._lock:
+            limits = ", ".join(
+                f"{resource} {limit.remaining}/{limit.limit} left"
+                for resource, limit in sorted(self.limits.items())
+            )
+        return (
+            f"{limits or 'no requests sent'}, "
+            f"{self.graphql_cost} GraphQL points spent, {self.retries} retries"
+        )
+
+    def delay(self, resource: str) -> float:
+        """Return how long to wait before the next request counting to `resource`.
+
+        Reserves one request of the limit, so that concurrent callers are spread
+        out as well.
+        """
+        with self._lock:
+            limit = self.limits.get(resource)
+            if limit is None:
+                return 0.0
+            until_reset = max(limit.reset - self._clock(), 0.0)
+            remaining = limit.remaining
+            limit.remaining -= 1
+        if until_reset == 0:
+            return 0.0
+        if remaining <= 0:
+            return until_reset
+        if remaining >= self.reserve * limit.limit:
+            return 0.0
+        return until_reset / remaining
+
+    def wait(self, resource: str) -> None:
+        """Block until the next request counting to `resource` may be sent."""
+        delay = self.delay(resource)
+        if delay > 0:
+            logger.info("waiting %.1f s for the %s rate limit", delay, resource)
+            self._sleep(delay)
+
+    def update(self, response: requests.Response) -> None:
+        """Update the state of a rate limit from the headers of `response`."""
+        headers = response.headers
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        resource = headers.get("X-RateLimit-Resource", resource_of(response.url))
+        limit = RateLimit(
+            limit=int(headers.get("X-RateLimit-Limit", 0)),
+            remaining=int(headers["X-RateLimit-Remaining"]),
+            reset=float(headers.get("X-RateLimit-Reset", 0)),
+        )
+        with self._lock:
+            self.limits[resource] = limit
+
+    def record_graphql(self, rate_limit: dict) -> None:
+        """Record the `rateLimit { cost remaining resetAt }` of a GraphQL query."""
+        reset = datetime.fromisoformat(rate_limit["resetAt"].replace("Z", "+00:00"))
+        with self._lock:
+            self.graphql_cost += rate_limit["cost"]
+            limit = self.limits.get("graphql")
+            if limit is not None:
+                limit.remaining = rate_limit["remaining"]
+                limit.reset = reset.timestamp()
+        logger.debug(
+            "GraphQL query cost %i points, %i left",
+            rate_limit["cost"],
+            rate_limit["remaining"],
+        )
+
+    def retry_delay(
+        self, response: requests.Response, attempt: int
+    ) -> Union[float, None]:
+        """Return how long to wait before retrying `response`, `None` if not needed.
+
+        Follows GitHub's advice on handling rate limits: honor `Retry-After`, wait
+        for the reset of an exhausted primary limit, and otherwise back off
+        exponentially starting at one minute.
+        """
+        rate_limited_graphql = (
+            response.status_code == 200
+            and resource_of(response.url) == "graphql"
+            and b'"RATE_LIMITED"' in response.content
+        )
+        if response.status_code not in (403, 429) and not rate_limited_graphql:
+            return None
+        if "Retry-After" in response.headers:
+            return float(response.headers["Retry-After"])
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            reset = float(response.headers.get("X-RateLimit-Reset", 0))
+            return max(reset - self._clock(), 0.0) + 1
+        if rate_limited_graphql or b"secondary rate limit" in response.content:
+            return 60.0 * 2**attempt
+        # Other reasons for 403, e.g. missing permissions, aren't retried
+        return None
+
+    def send(
+        self,
+        send: Callable[..., requests.Response],
+        request: requests.PreparedRequest,
+        **kwargs,
+    ) -> requests.Response:
+        """Send `request` with `send` when allowed, retrying if rate limited."""
+        resource = resource_of(request.url)
+        attempt = 0
+        while True:
+            self.wait(resource)
+            response = send(request, **kwargs)
+            self.update(response)
+            delay = self.retry_delay(response, attempt)
+            if delay is None:
+                return response
+            if attempt >= self.max_retries or delay > self.max_wait:
+                logger.error(
+                    "giving up on %s after %i retries due to rate limit",
+                    request.url,
+                    attempt,
+                )
+                return response
+            logger.warning("hit %s rate limit, retrying in %.0f s", resource, delay)
+            with self._lock:
+                self.retries += 1
+            self._sleep(delay)
+            attempt += 1
@@ -0,0 +1,159 @@
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Union
+
+# Records are created for every commit, pull request and user of a range. Without
+# a `__dict__` per instance they need a fraction of the memory. `slots` requires
+# Python >= 3.10, older versions fall back to regular dataclasses
+SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(frozen=True, **SLOTS)
+class Label:
+    """Label of a pull request, mirrors :class:`github.Label.Label` partially."""
+
+    name: str
+
+
+@dataclass(frozen=True, **SLOTS)
+class PullRequestInfo:
+    """Pull request as returned by GitHub's GraphQL API.
+
+    Provides the attributes of :class:`github.PullRequest.PullRequest` that are
+    needed to create a :class:`~changelist._objects.ChangeNote`.
+    """
+
+    number: int
+    title: str
+    body: Union[str, None]
+    labels: tuple[Label, ...]
+    merged: bool
+    merged_at: Union[datetime, None]
+    html_url: str
+
+    @classmethod
+    def from_graphql(cls, node: dict) -> "PullRequestInfo":
+        """Create from a `PullRequest` node returned by the GraphQL API."""
+        return cls(
+            number=node["number"],
+            title=node["title"],
+            body=node["body"],
+            labels=tuple(
+                Label(name=label["name"]) for label in node["labels"]["nodes"]
+            ),
+            merged=node["merged"],
+            merged_at=_parse_timestamp(node["mergedAt"]),
+            html_url=node["url"],
+        )
+
+    @classmethod
+    def from_rest(cls, data: dict) -> "PullRequestInfo":
+        """Create from a pull request returned by the REST API."""
+        merged_at = _parse_timestamp(data["merged_at"])
+        return cls(
+            number=data["number"],
+            title=data["title"],
+            body=data["body"],
+            labels=tuple(Label(name=label["name"]) for label in data["labels"]),
+            merged=merged_at is not None,
+            merged_at=merged_at,
+            html_url=data["html_url"],
+        )
+
+
+@dataclass(frozen=True, **SLOTS)
+class UserInfo:
+    """GitHub user, mirrors :class:`github.NamedUser.NamedUser` partially.
+
+    Users are identified by their `id` and `login`. `name` may be `None`, if the
+    user didn't set one or it wasn't requested.
+    """
+
+    id: int
+    login: str
+    name: Union[str, None] = field(default=None, compare=False)
+    html_url: str = field(default="", compare=False)
+    node_id: str = field(default="", compare=False)
+
+    @classmethod
+    def from_rest(cls, data: dict) -> "UserInfo":
+        """Create from a user returned by the REST API."""
+        return cls(
+            id=data["id"],
+            login=data["login"],
+            name=data.get("name"),
+            html_url=data["html_url"],
+            node_id=data.get("node_id", ""),
+        )
+
+    @classmethod
+    def from_graphql(cls, node: dict) -> "UserInfo":
+        """Create from a `User` node returned by the GraphQL API."""
+        return cls(
+            id=node["databaseId"],
+            login=node["login"],
+            name=node.get("name"),
+            html_url=node.get("url", ""),
+            node_id=node.get("id", ""),
+        )
+
+
+@dataclass(frozen=True, **SLOTS)
+class CommitInfo:
+    """Commit, mirrors :class:`github.Commit.Commit` partially."""
+
+    sha: str
+    message: str
+    html_url: str
+    author: Union[UserInfo, None]
+    committer: Union[UserInfo, None]
+
+    @classmethod
+    def from_rest(cls, data: dict) -> "CommitInfo":
+        """Create from a commit returned by the REST API."""
+        author = data.get("author")
+        committer = data.get("committer")
+        return cls(
+            sha=data["sha"],
+            message=data["commit"]["message"],
+            html_url=data["html_url"],
+            author=UserInfo.from_rest(author) if author else None,
+            committer=UserInfo.from_rest(committer) if committer else None,
+        )
+
+
+@dataclass(frozen=True, **SLOTS)
+class GitActor:
+    """Name and email of a git author or committer.
+
+    `user` is the GitHub user associated with the email, if any.
+    """
+
+    name: str
+    email: str
+    user: Union[UserInfo, None]
+
+    @classmethod
+    def from_graphql(cls, node: dict) -> "GitActor":
+        """Create from a `GitActor` node returned by the GraphQL API."""
+        user = node["user"]
+        if user is not None:
+            user = UserInfo.from_graphql(user)
+        return cls(name=node["name"], email=node["email"], user=user)
+
+
+@dataclass(frozen=True, **SLOTS)
+class CommitUsers:
+    """Authors, including co-authors, and committer of a commit."""
+
+    commit_url: str
+    authors: tuple[GitActor, ...]
+    committer: Union[GitActor, None]
+
+
+def _parse_timestamp(value: Union[str, None]) -> Union[datetime, None]:
+    """Parse an ISO 8601 timestamp as returned by GitHub's API."""
+    if value is None:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
@@ -0,0 +1,212 @@
+import gzip
+import io
+import json
+import logging
+import re
+import threading
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+logger = logging.getLogger(__name__)
+
+# An aliased field of a GraphQL query, e.g. `commit0: object(expression: "..." ) {`
+_ALIAS_REGEX = re.compile(r"(\w+): ((?:object|pullRequest)\([^)]*\)) \{")
+_NODE_IDS_REGEX = re.compile(r"nodes\(ids: \[(.*?)\]\)")
+# Headers needed to interpret a response again, rate limits are left out so
+# that replays aren't paced
+_KEPT_HEADERS = ("Content-Type", "Link", "ETag", "Last-Modified")
+# Only used to build responses, never sends anything
+_ADAPTER = HTTPAdapter()
+
+
+def aliased_fields(query: str) -> Iterator[tuple[str, str]]:
+    """Yield the alias and the text of each aliased field in a GraphQL `query`.
+
+    The text doesn't include the alias, so that the same field is recognized
+    regardless of the batch it was queried in.
+    """
+    for match in _ALIAS_REGEX.finditer(query):
+        depth = 0
+        for end in range(match.end() - 1, len(query)):
+            if query[end] == "{":
+                depth += 1
+            elif query[end] == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+        yield match[1], query[match.start(2) : end + 1]
+
+
+def node_ids_of(query: str) -> Union[list[str], None]:
+    """Return the IDs of a `nodes(ids: [...])` query, `None` for other queries."""
+    match = _NODE_IDS_REGEX.search(query)
+    if match is None:
+        return None
+    return json.loads(f"[{match[1]}]")
+
+
+def graphql_query_of(request: requests.PreparedRequest) -> Union[str, None]:
+    """Return the GraphQL query sent with `request`, `None` for REST requests."""
+    if urlsplit(request.url).path.rstrip("/") != "/graphql":
+        return None
+    return json.loads(request.body)["query"]
+
+
+def build_response(
+    request: requests.PreparedRequest,
+    status: int,
+    body: bytes,
+    headers: Union[dict, None] = None,
+) -> requests.Response:
+    """Build a response to `request` as if it was received from the network."""
+    raw = HTTPResponse(
+        body=io.BytesIO(body),
+        headers={"Content-Type": "application/json", **(headers or {})},
+        status=status,
+        preload_content=False,
+        decode_content=False,
+    )
+    return _ADAPTER.build_response(request, raw)
+
+
+class Snapshot:
+    """Responses of GitHub's API that a run needs, to repeat it offline.
+
+    While recording, each response passing through :meth:`send` is added to the
+    snapshot. While replaying (see :meth:`load`), :meth:`send` answers requests
+    from the snapshot and never accesses the network; requests that weren't
+    recorded fail with :class:`LookupError`.
+
+    REST responses are stored by method and URL. Results of GraphQL queries are
+    stored for each aliased field and node instead, as the batches these are
+    queried in depend on the order of sets and on the number of jobs.
+
+    `args` are the arguments that identify the run, e.g. its range of revisions.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, args: dict, *, replay: bool = False):
+        self.args = args
+        self.replay = replay
+        self.rest: dict[str, dict] = {}
+        self.fields: dict[str, dict] = {}
+        self.nodes: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.rest) + len(self.fields) + len(self.nodes)
+
+    def send(
+        self,
+        send: Callable[..., requests.Response],
+        request: requests.PreparedRequest,
+        **kwargs,
+    ) -> requests.Response:
+        """Send `request` with `send` and record it, or answer it from the snapshot."""
+        if self.replay:
+            return self.response_for(request)
+        response = send(request, **kwargs)
+        self.add(request, response)
+        return response
+
+    def add(
+        self, request: requests.PreparedRequest, response: requests.Response
+    ) -> None:
+        """Record the `response` to `request`."""
+        query = graphql_query_of(request)
+        if query is None:
+            headers = {
+                key: response.headers[key]
+                for key in _KEPT_HEADERS
+                if key in response.headers
+            }
+            with self._lock:
+                self.rest[f"{request.method} {request.url}"] = {
+                    "status": response.status_code,
+                    "headers": headers,
+                    "body": response.content.decode(),
+                }
+            return
+
+        if not response.ok:
+            return
+        result = response.json()
+        data = result.get("data")
+        # Errors, e.g. an exhausted rate limit, are handled by the caller, which
+        # may send the query again. Only complete results are replayed
+        if "errors" in result or not data:
+            logger.debug("not recording GraphQL response with errors")
+            return
+        with self._lock:
+            node_ids = node_ids_of(query)
+            if node_ids is not None:
+                self.nodes.update(zip(node_ids, data["nodes"]))
+            for alias, text in aliased_fields(query):
+                self.fields[text] = data["repository"][alias]
+
+    def response_for(self, request: requests.PreparedRequest) -> requests.Response:
+        """Return the recorded response to `request`."""
+        query = graphql_query_of(request)
+        try:
+            if query is None:
+                recorded = self.rest[f"{request.method} {request.url}"]
+                return build_response(
+                    request,
+                    recorded["status"],
+                    recorded["body"].encode(),
+                    recorded["headers"],
+                )
+            # Like rate limit headers, the cost is left out, as replays are free
+            data = {}
+            node_ids = node_ids_of(query)
+            if node_ids is not None:
+                data["nodes"] = [self.nodes[node_id] for node_id in node_ids]
+            else:
+                data["repository"] = {
+                    alias: self.fields[text] for alias, text in aliased_fields(query)
+                }
+        except KeyError:
+            msg = (
+                f"{request.method} {request.url} wasn't recorded in the snapshot, "
+                "record it again with the same options"
+            )
+            raise LookupError(msg) from None
+        return build_response(request, 200, json.dumps({"data": data}).encode())
+
+    @classmethod
+    def load(cls, path: Path) -> "Snapshot":
+        """Load a snapshot from `path` to replay it."""
+        with gzip.open(path, "rt", encoding="utf-8") as fp:
+            data = json.load(fp)
+        if data.get("format_version") != cls.FORMAT_VERSION:
+            msg = f"unsupported snapshot format in {path}"
+            raise ValueError(msg)
+        snapshot = cls(data["args"], replay=True)
+        snapshot.rest = data["rest"]
+        snapshot.fields = data["fields"]
+        snapshot.nodes = data["nodes"]
+        logger.info("loaded %i responses from snapshot %s", len(snapshot), path)
+        return snapshot
+
+    def save(self, path: Path) -> None:
+        """Save the snapshot as compressed JSON to `path`."""
+        with self._lock:
+            data = {
+                "format_version": self.FORMAT_VERSION,
+                "args": self.args,
+                "rest": self.rest,
+                "fields": self.fields,
+                "nodes": self.nodes,
+            }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as fp:
+            json.dump(data, fp, separators=(",", ":"))
+        tmp_path.replace(path)
@@ -0,0 +1,213 @@
+import json
+from datetime import timedelta
+
+import pytest
+import requests
+import requests_cache
+from github import Github, GithubException
+from requests.adapters import HTTPAdapter
+from requests_cache import DO_NOT_CACHE, NEVER_EXPIRE, CacheMixin
+from requests_cache.policy.expiration import get_url_expiration
+
+from changelist._cache import CachePolicy, CacheStats, install_cache
+from changelist._query import GitHubGraphQl
+from changelist._snapshot import build_response
+
+SHA = "0123456789abcdef0123456789abcdef01234567"
+REPO = "https://api.github.com/repos/org/repo"
+POLICY = CachePolicy()
+
+
+def _pygithub_url(monkeypatch, call) -> str:
+    """Return the URL of the request that PyGithub sends for `call(repo)`."""
+    urls = []
+
+    def send(_adapter, request, **_):
+        urls.append(request.url)
+        return build_response(request, 404, b'{"message": "Not Found"}')
+
+    with monkeypatch.context() as m:
+        m.setattr(HTTPAdapter, "send", send)
+        repo = Github(retry=None, lazy=True).get_repo("org/repo")
+        with pytest.raises(GithubException):
+            call(repo)
+    return urls[-1]
+
+
+class Test_CachePolicy:
+    @pytest.mark.parametrize(
+        "url",
+        [
+            f"{REPO}/commits/{SHA}",
+            f"{REPO}/compare/{SHA}...{SHA}",
+            f"{REPO}/contents/pyproject.toml?ref={SHA}",
+        ],
+    )
+    def test_immutable(self, url):
+        urls_expire_after = POLICY.urls_expire_after()
+        assert get_url_expiration(url, urls_expire_after) == NEVER_EXPIRE
+
+    @pytest.mark.parametrize(
+        "url",
+        [
+            f"{REPO}/commits/main",
+            f"{REPO}/compare/v1.0...main",
+            f"{REPO}/compare/v1.0...{SHA}?page=2",
+            f"{REPO}/contents/pyproject.toml?ref=main",
+        ],
+    )
+    def test_refs(self, url):
+        urls_expire_after = POLICY.urls_expire_after()
+        assert get_url_expiration(url, urls_expire_after) == timedelta(minutes=5)
+
+    @pytest.mark.parametrize(
+        "url",
+        [
+            f"{REPO}",
+            f"{REPO}/pulls/42",
+            f"{REPO}/commits/{SHA}/pulls?per_page=100",
+            f"{REPO}/pulls/42/reviews?page=2",
+            "https://api.github.com/graphql",
+            "https://api.github.com/user/123",
+            "https://api.github.com/users/octocat",
+        ],
+    )
+    def test_default(self, url):
+        urls_expire_after = POLICY.urls_expire_after()
+        assert get_url_expiration(url, urls_expire_after) is None
+
+    @pytest.mark.parametrize(
+        ("call", "expected"),
+        [
+            (lambda repo: repo.get_commit(SHA).stats, NEVER_EXPIRE),
+            (lambda repo: repo.compare(SHA, SHA).status, NEVER_EXPIRE),
+            (lambda repo: repo.get_contents("pyproject.toml", ref=SHA), NEVER_EXPIRE),
+            (lambda repo: repo.get_commit("main").stats, timedelta(minutes=5)),
+            (lambda repo: repo.compare("v1.0", "main").status, timedelta(minutes=5)),
+            (lambda repo: repo.get_pull(42).title, None),
+        ],
+    )
+    def test_pygithub_urls(self, monkeypatch, call, expected):
+        # PyGithub's URLs include the port, e.g. "https://api.github.com:443/..."
+        url = _pygithub_url(monkeypatch, call)
+        assert get_url_expiration(url, POLICY.urls_expire_after()) == expected
+
+    def test_rate_limit(self):
+        urls_expire_after = POLICY.urls_expire_after()
+        url = "https://api.github.com/rate_limit"
+        assert get_url_expiration(url, urls_expire_after) == DO_NOT_CACHE
+
+    @pytest.mark.parametrize(
+        ("url", "body", "expected"),
+        [
+            ("https://api.github.com/graphql", b'{"data": {}}', True),
+            ("https://api.github.com/graphql", b'{"data": null, "errors": []}', False),
+            ("https://api.github.com/graphql", b'{"data": {"errors": 1}}', True),
+            (f"{REPO}/pulls/42", b'{"errors": []}', True),
+        ],
+    )
+    def test_is_cacheable(self, url, body, expected):
+        request = requests.Request("POST", url).prepare()
+        response = build_response(request, 200, body)
+        assert POLICY.is_cacheable(response) is expected
+
+
+class _MockResponse:
+    def __init__(self, from_cache):
+        self.from_cache = from_cache
+
+
+def test_cache_stats():
+    stats = CacheStats()
+    for from_cache in [True, False, False]:
+        stats.record(_MockResponse(from_cache))
+    assert (stats.hits, stats.misses) == (1, 2)
+    assert str(stats) == "1 cache hits, 2 cache misses, 0 revalidated (304)"
+
+
+def test_revalidate_expired(tmp_path, monkeypatch):
+    sent = []
+
+    def send(_adapter, request, **_):
+        sent.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return build_response(request, 304, b"", {"ETag": '"v1"'})
+        return build_response(request, 200, b'{"login": "octocat"}', {"ETag": '"v1"'})
+
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    # Responses expire immediately but are kept for revalidation
+    policy = CachePolicy(default_expire_after=0)
+    try:
+        stats = install_cache(tmp_path / "cache", policy=policy, backend="memory")
+        for _ in range(3):
+            response = requests.get("https://api.github.com/users/octocat")
+            assert response.json() == {"login": "octocat"}
+    finally:
+        requests_cache.uninstall_cache()
+    assert len(sent) == 3
+    assert "If-None-Match" not in sent[0].headers
+    assert (stats.hits, stats.misses, stats.revalidated) == (2, 1, 2)
+
+
+def test_rate_limit_through_pygithub(tmp_path, monkeypatch):
+    sent = []
+    remaining = iter([4000, 3999])
+
+    def send(_adapter, request, **_):
+        sent.append(request)
+        limit = {"limit": 5000, "remaining": next(remaining), "reset": 2000000000}
+        data = {"resources": {"core": limit, "graphql": limit}}
+        return build_response(request, 200, json.dumps(data).encode())
+
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    try:
+        stats = install_cache(tmp_path / "cache", backend="memory")
+        gh = Github(retry=None)
+        counts = [gh.get_rate_limit().resources.core.remaining for _ in range(2)]
+    finally:
+        requests_cache.uninstall_cache()
+    # The remaining requests are always current, e.g. for --dry-run
+    assert counts == [4000, 3999]
+    assert (stats.hits, stats.misses) == (0, 2)
+
+
+def test_install_cache_twice(tmp_path):
+    try:
+        for _ in range(2):
+            install_cache(tmp_path / "cache", backend="memory")
+            assert isinstance(requests.Session(), CacheMixin)
+    finally:
+        requests_cache.uninstall_cache()
+
+
+def test_graphql_expiration(tmp_path, monkeypatch):
+    sent = []
+
+    def send(_adapter, request, **_):
+        sent.append(request)
+        body = b'{"data": {}}'
+        if "broken" in request.body:
+            body = b'{"data": null, "errors": [{"type": "RATE_LIMITED"}]}'
+        return build_response(request, 200, body)
+
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    # Only queries for commit SHAs are kept, everything else expires right away
+    policy = CachePolicy(default_expire_after=0)
+    queries = [
+        f'{{ repository {{ c0: object(expression: "{SHA}" ) {{ oid }} }} }}',
+        '{ nodes(ids: ["U_1"]) { id } }',
+        '{ broken: object(expression: "' + SHA + '" ) { oid } }',
+        GitHubGraphQl.GRAPHQL_COMMIT_PULL_REQUESTS.format(
+            alias="c0", commit_sha=SHA, pull_limit=1, page_limit=1
+        ),
+    ]
+    try:
+        install_cache(tmp_path / "cache", policy=policy, backend="memory")
+        ql = GitHubGraphQl(org_name="org", repo_name="repo", session=requests.Session())
+        for _ in range(2):
+            for query in queries:
+                ql._run_query(query)
+    finally:
+        requests_cache.uninstall_cache()
+    # Pull requests associated with a commit are edited after it's merged
+    assert len(sent) == 7
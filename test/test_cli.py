@@ -0,0 +1,309 @@
+import json
+import shutil
+import subprocess
+import sys
+from functools import partial
+
+import pytest
+import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
+
+from changelist import _cli
+from changelist._config import add_config_defaults
+from changelist._git import resolve_rev
+from changelist._model import NotesModel
+from changelist._snapshot import aliased_fields, build_response, node_ids_of
+
+# The CLI passes the token to PyGithub the way it always did
+ignore_token_warning = pytest.mark.filterwarnings(
+    "ignore:Argument login_or_token:DeprecationWarning"
+)
+
+
+@pytest.mark.parametrize("module", ["github", "requests_cache", "tqdm"])
+def test_import_is_lazy(module):
+    # Starting the CLI, e.g. for `--help`, shouldn't pay for importing modules
+    # that only network stages need
+    code = f"import sys, changelist.__main__; print({module!r} in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_help():
+    result = subprocess.run(
+        [sys.executable, "-m", "changelist", "--help"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert "usage:" in result.stdout
+
+
+@pytest.mark.parametrize("command", [[], ["render", "notes.json"]])
+def test_invalid_format(command):
+    result = subprocess.run(
+        [sys.executable, "-m", "changelist", *command, "--format", "md,html"],
+        capture_output=True,
+        check=False,
+        text=True,
+    )
+    assert result.returncode == 2
+    assert "usage:" in result.stderr
+    assert "format must be a comma-separated list" in result.stderr
+
+
+def test_add_config_defaults_copies():
+    first = add_config_defaults({})
+    first["label_section_map"].clear()
+    second = add_config_defaults({})
+    assert second["label_section_map"]
+    assert add_config_defaults({"title_template": "x"})["title_template"] == "x"
+
+
+def test_render(tmp_path):
+    notes = NotesModel.from_config(
+        add_config_defaults({}),
+        repo_name="repo",
+        version="1.0",
+        change_notes=set(),
+        authors=set(),
+        reviewers=set(),
+    )
+    model = tmp_path / "notes.json"
+    model.write_text("".join(notes.iter_lines("json")))
+    out = tmp_path / "{repo_name}-{version}.{format}"
+    code = (
+        "import sys, changelist.__main__ as m; m.main(); "
+        "print('github' in sys.modules, file=sys.stderr)"
+    )
+    args = ["render", str(model), "--format", "md,rst", "--out", str(out)]
+    result = subprocess.run(
+        [sys.executable, "-c", code, *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Rendering doesn't need PyGithub
+    assert result.stderr.splitlines()[-1] == "False"
+    assert (tmp_path / "repo-1.0.md").read_text() == str(notes.formatter("md"))
+    assert (tmp_path / "repo-1.0.rst").read_text() == str(notes.formatter("rst"))
+
+
+RATE_LIMIT = {"limit": 5000, "remaining": 4000, "reset": 2000000000, "used": 1}
+
+
+def _github_send(_adapter, request, **_):
+    path = request.path_url.split("?")[0]
+    data = {
+        "/repos/org/repo": {"name": "repo", "full_name": "org/repo"},
+        "/repos/org/repo/compare/v1.0...main": {"total_commits": 3, "commits": []},
+        "/rate_limit": {"resources": {"core": RATE_LIMIT, "graphql": RATE_LIMIT}},
+    }[path]
+    return build_response(request, 200, json.dumps(data).encode())
+
+
+@ignore_token_warning
+def test_replay_keeps_stores(tmp_path, monkeypatch):
+    monkeypatch.setenv("GH_TOKEN", "-")
+    for name in ["IDENTITY_INDEX_PATH", "FACT_STORE_PATH"]:
+        path = tmp_path / name
+        path.write_text("")
+        monkeypatch.setattr(_cli, name, path)
+    monkeypatch.setattr(_cli, "REQUESTS_CACHE_PATH", tmp_path / "cache.sqlite")
+    monkeypatch.setattr(HTTPAdapter, "send", _github_send)
+    kwargs = {
+        "org_repo": "org/repo",
+        "start_rev": "v1.0",
+        "stop_rev": "main",
+        "version": "1.0",
+        "out": None,
+        "formats": ["md"],
+        "config_path": None,
+        "verbose": 0,
+        "dry_run": True,
+    }
+    snapshot = str(tmp_path / "snapshot.json.gz")
+    try:
+        _cli.main(**kwargs, clear_cache=False, record=snapshot)
+        monkeypatch.undo()
+        monkeypatch.setenv("GH_TOKEN", "-")
+        for name in ["IDENTITY_INDEX_PATH", "FACT_STORE_PATH"]:
+            monkeypatch.setattr(_cli, name, tmp_path / name)
+        _cli.main(**kwargs, clear_cache=True, replay=snapshot)
+    finally:
+        requests_cache.uninstall_cache()
+    # Snapshots bypass the identity index and fact store, so they're kept
+    assert (tmp_path / "IDENTITY_INDEX_PATH").exists()
+    assert (tmp_path / "FACT_STORE_PATH").exists()
+
+
+USER = {"id": "U_1", "databaseId": 1, "login": "ana", "url": "https://github.com/ana"}
+
+
+@ignore_token_warning
+def test_rest_timeout(tmp_path, monkeypatch):
+    timeouts = []
+
+    def send(adapter, request, **kwargs):
+        timeouts.append(kwargs["timeout"])
+        return _github_send(adapter, request, **kwargs)
+
+    monkeypatch.setenv("GH_TOKEN", "-")
+    monkeypatch.setattr(_cli, "REQUESTS_CACHE_PATH", tmp_path / "cache.sqlite")
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    try:
+        _cli.main(
+            org_repo="org/repo",
+            start_rev="v1.0",
+            stop_rev="main",
+            version="1.0",
+            out=None,
+            formats=["md"],
+            clear_cache=False,
+            config_path=None,
+            verbose=0,
+            dry_run=True,
+            timeout=7.5,
+        )
+    finally:
+        requests_cache.uninstall_cache()
+    # PyGithub's own default timeout doesn't take precedence
+    assert timeouts
+    assert set(timeouts) == {7.5}
+
+
+@ignore_token_warning
+def test_deprecated_format(tmp_path, monkeypatch):
+    monkeypatch.setenv("GH_TOKEN", "-")
+    monkeypatch.setattr(_cli, "REQUESTS_CACHE_PATH", tmp_path / "cache.sqlite")
+    monkeypatch.setattr(HTTPAdapter, "send", _github_send)
+    kwargs = {
+        "org_repo": "org/repo",
+        "start_rev": "v1.0",
+        "stop_rev": "main",
+        "version": "1.0",
+        "out": None,
+        "clear_cache": False,
+        "config_path": None,
+        "verbose": 0,
+        "dry_run": True,
+    }
+    try:
+        # Callers from before `formats` keep working
+        deprecated = partial(
+            pytest.warns, DeprecationWarning, match="`format` is deprecated"
+        )
+        with deprecated() as record:
+            _cli.main(**kwargs, format="rst")
+        assert record[0].filename == __file__
+        with deprecated(), pytest.raises(ValueError, match="format must be"):
+            _cli.main(**kwargs, format="html")
+        with deprecated(), pytest.raises(ValueError, match="can't be used together"):
+            _cli.main(**kwargs, format="md", formats=["md"])
+    finally:
+        requests_cache.uninstall_cache()
+
+
+class _FakeGraphQlSession:
+    """Answers the GraphQL queries for commits that each belong to a pull request."""
+
+    def __init__(self, numbers_by_sha):
+        self.numbers_by_sha = numbers_by_sha
+
+    @staticmethod
+    def _pull(number):
+        return {
+            "number": number,
+            "title": f"Change {number}",
+            "body": None,
+            "url": f"https://github.com/org/repo/pull/{number}",
+            "merged": True,
+            "mergedAt": "2024-01-01T00:00:00Z",
+            "labels": {"totalCount": 1, "nodes": [{"name": "Bug fix"}]},
+        }
+
+    def _field(self, text):
+        page_info = {"hasNextPage": False, "endCursor": None}
+        if text.startswith("pullRequest"):
+            number = int(text.split(":", 1)[1].split(")", 1)[0])
+            reviews = {"pageInfo": page_info, "nodes": []}
+            return {**self._pull(number), "reviews": reviews}
+        sha = text.split('"')[1]
+        commit = {"oid": sha, "commitUrl": f"https://github.com/org/repo/commit/{sha}"}
+        if "associatedPullRequests" not in text:
+            actor = {"name": "Ana", "email": "ana@example.org", "user": USER}
+            edges = [{"cursor": "1", "node": actor}]
+            authors = {"pageInfo": page_info, "edges": edges}
+            return {**commit, "authors": authors, "committer": actor}
+        pull = self._pull(self.numbers_by_sha[sha])
+        return {**commit, "associatedPullRequests": {"totalCount": 1, "nodes": [pull]}}
+
+    def post(self, url, data, headers):
+        query = json.loads(data)["query"]
+        node_ids = node_ids_of(query)
+        if node_ids is not None:
+            data = {"nodes": [{**USER, "name": "Ana"} for _ in node_ids]}
+        else:
+            fields = aliased_fields(query)
+            data = {"repository": {alias: self._field(text) for alias, text in fields}}
+        request = requests.Request("POST", url).prepare()
+        return build_response(request, 200, json.dumps({"data": data}).encode())
+
+
+@ignore_token_warning
+@pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+def test_releases(tmp_path, monkeypatch):
+    monkeypatch.setenv("GH_TOKEN", "-")
+    monkeypatch.setattr(_cli, "REQUESTS_CACHE_PATH", tmp_path / "cache.sqlite")
+    monkeypatch.setattr(_cli, "IDENTITY_INDEX_PATH", tmp_path / "identities.json")
+    monkeypatch.setattr(_cli, "FACT_STORE_PATH", tmp_path / "facts.sqlite")
+    repo = tmp_path / "repo"
+    env = {
+        "GIT_AUTHOR_NAME": "Ana",
+        "GIT_AUTHOR_EMAIL": "ana@example.org",
+        "GIT_COMMITTER_NAME": "Ana",
+        "GIT_COMMITTER_EMAIL": "ana@example.org",
+        "HOME": str(tmp_path),
+    }
+
+    def git(*args):
+        subprocess.run(["git", "-C", str(repo), *args], check=True, env=env)
+
+    repo.mkdir()
+    git("init", "--quiet", "--initial-branch=main")
+    numbers_by_sha = {}
+    for tag, number in [("v1.0", 1), ("v1.1", 2), (None, 3), ("v1.2", 4), (None, 5)]:
+        git("commit", "--quiet", "--allow-empty", "-m", f"Change {number}")
+        numbers_by_sha[resolve_rev(repo, "HEAD")] = number
+        if tag:
+            git("tag", tag)
+
+    try:
+        _cli.main(
+            org_repo="org/repo",
+            start_rev="v1.0",
+            stop_rev="main",
+            version="2.0",
+            out=str(tmp_path / "notes-{version}.md"),
+            formats=["md"],
+            clear_cache=False,
+            config_path=None,
+            verbose=0,
+            git_dir=str(repo),
+            releases=["v1.1", "v1.2"],
+            session=_FakeGraphQlSession(numbers_by_sha),
+        )
+    finally:
+        requests_cache.uninstall_cache()
+
+    # Each release lists the changes since the previous one, the last release
+    # covers the range up to `stop_rev` and uses `version`
+    expected = {"v1.1": [2], "v1.2": [3, 4], "2.0": [5]}
+    for version, numbers in expected.items():
+        notes = (tmp_path / f"notes-{version}.md").read_text()
+        assert notes.startswith(f"# repo {version}\n")
+        found = [n for n in range(1, 6) if f"[#{n}]" in notes]
+        assert found == numbers
@@ -0,0 +1,65 @@
+from dataclasses import replace
+from datetime import datetime, timezone
+
+from changelist._facts import FactStore
+from changelist._records import Label, PullRequestInfo, UserInfo
+
+PULL = PullRequestInfo(
+    number=1,
+    title="Add `foo`",
+    body="```release-note\nAdd `foo` and `bar`.\n```",
+    labels=(Label("New feature"), Label("api")),
+    merged=True,
+    merged_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    html_url="https://github.com/org/repo/pull/1",
+)
+
+USER = UserInfo(
+    id=1, login="lungile", name="Nur Lungile", html_url="https://x.y", node_id="U_1"
+)
+
+
+def test_pull_requests(tmp_path):
+    unmerged = replace(PULL, number=2, merged=False, merged_at=None)
+    facts = FactStore(tmp_path / "facts.sqlite")
+    facts.add_pull_requests(
+        "org/repo", {"sha0": [PULL], "sha1": [], "sha2": [PULL, unmerged]}
+    )
+    facts.close()
+
+    # Facts persist across runs
+    facts = FactStore(tmp_path / "facts.sqlite")
+    result = facts.pull_numbers_of("org/repo", ["sha0", "sha1", "sha2", "sha3"])
+    # Commits with pull requests that aren't merged yet are skipped
+    assert result == {"sha0": [1], "sha1": []}
+    assert (facts.hits, facts.misses) == (2, 2)
+    # Namespaced by repository
+    assert facts.pull_numbers_of("org/other", ["sha0"]) == {}
+
+
+def test_reviewers():
+    facts = FactStore()
+    partial = UserInfo(id=2, login="madhu", node_id="U_2")
+    facts.add_reviewers("org/repo", {1: {USER, partial}, 2: set()})
+    result = facts.reviewers_of("org/repo", [1, 2, 3])
+    assert result == {1: {USER, partial}, 2: set()}
+    assert (facts.hits, facts.misses) == (2, 1)
+    assert next(user for user in result[1] if user.id == 1).name == "Nur Lungile"
+    assert facts.reviewers_of("org/other", [1]) == {}
+
+    facts.clear()
+    assert facts.reviewers_of("org/repo", [1]) == {}
+
+
+def test_outdated_schema(tmp_path):
+    facts = FactStore(tmp_path / "facts.sqlite")
+    facts.add_reviewers("org/repo", {1: {USER}})
+    facts._connection.execute("CREATE TABLE users (id INTEGER PRIMARY KEY)")
+    facts._connection.execute("PRAGMA user_version = 1")
+    facts._connection.commit()
+    facts.close()
+    facts = FactStore(tmp_path / "facts.sqlite")
+    assert facts.reviewers_of("org/repo", [1]) == {}
+    # Tables of older schemas are dropped as well
+    tables = facts._connection.execute("SELECT name FROM sqlite_master").fetchall()
+    assert ("users",) not in tables
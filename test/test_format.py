@@ -2,7 +2,13 @@ from datetime import datetime
 from pathlib import Path
 
 from changelist._config import DEFAULT_CONFIG_PATH, local_config
-from changelist._format import ChangeNote, Contributor, MdFormatter, RstFormatter
+from changelist._format import (
+    ChangeNote,
+    Contributor,
+    LabelClassifier,
+    MdFormatter,
+    RstFormatter,
+)
 
 here = Path(__file__).parent
 
@@ -71,6 +77,27 @@ DEFAULT_FORMATTER_KWARGS = {
 }
 
 
+class Test_LabelClassifier:
+    def test_sections_of(self):
+        classifier = LabelClassifier({"new": "Features", "bug|fix": "Fixes"})
+        assert classifier.sections == ("Features", "Fixes", "Other")
+        assert classifier.sections_of(("New feature", "Bug fix")) == {
+            "Features",
+            "Fixes",
+        }
+        assert classifier.sections_of(("api",)) == frozenset()
+        # Each label is only matched once
+        classifier._regexes.clear()
+        assert classifier.sections_of_label("Bug fix") == {"Fixes"}
+
+    def test_index(self):
+        classifier = LabelClassifier(DEFAULT_CONFIG["label_section_map"])
+        index = classifier.index(NOTES)
+        assert list(index) == list(classifier.sections)
+        assert index["Other"] == {NOTES[3]}
+        assert sum(len(notes) for notes in index.values()) >= len(NOTES)
+
+
 class Test_MdFormatter:
     def test_iteration(self):
         formatter = MdFormatter(**DEFAULT_FORMATTER_KWARGS)
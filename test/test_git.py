@@ -0,0 +1,96 @@
+import shutil
+import subprocess
+
+import pytest
+
+from changelist._config import git_config
+from changelist._git import (
+    is_ancestor,
+    local_commits_between,
+    read_file,
+    resolve_rev,
+)
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+
+
+def _git(path, *args, **env):
+    subprocess.run(
+        ["git", "-C", str(path), *args],
+        check=True,
+        capture_output=True,
+        env={
+            "GIT_AUTHOR_NAME": "Nur Lungile",
+            "GIT_AUTHOR_EMAIL": "lungile@example.org",
+            "GIT_COMMITTER_NAME": "GitHub",
+            "GIT_COMMITTER_EMAIL": "noreply@github.com",
+            "HOME": str(path),
+            **env,
+        },
+    )
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    _git(tmp_path, "init", "--initial-branch=main")
+    _git(tmp_path, "commit", "--allow-empty", "-m", "Initial commit")
+    _git(tmp_path, "tag", "v1.0")
+    _git(tmp_path, "commit", "--allow-empty", "-m", "Add `foo`")
+    _git(
+        tmp_path,
+        "commit",
+        "--allow-empty",
+        "-m",
+        "Fix `bar`\n\nSome details.\n\n"
+        "Co-authored-by: Madhu Esen <madhu@example.org>\n"
+        "Co-authored-by: Bot <bot@example.org>",
+        GIT_AUTHOR_NAME="Ana",
+        GIT_AUTHOR_EMAIL="ana@example.org",
+    )
+    return tmp_path
+
+
+def test_local_commits_between(git_repo):
+    commits = local_commits_between(git_repo, "org/repo", "v1.0", "main")
+    assert len(commits) == 2
+    commits = {commit.message.splitlines()[0]: commit for commit in commits}
+
+    foo = commits["Add `foo`"]
+    assert foo.author_email == "lungile@example.org"
+    assert foo.committer_email == "noreply@github.com"
+    assert foo.co_authors == ()
+    assert foo.html_url == f"https://github.com/org/repo/commit/{foo.sha}"
+
+    bar = commits["Fix `bar`"]
+    assert bar.author_name == "Ana"
+    assert "Some details." in bar.message
+    assert bar.co_authors == (
+        ("Madhu Esen", "madhu@example.org"),
+        ("Bot", "bot@example.org"),
+    )
+
+
+def test_empty_range(git_repo):
+    assert local_commits_between(git_repo, "org/repo", "main", "main") == set()
+
+
+def test_revisions(git_repo):
+    v1 = resolve_rev(git_repo, "v1.0")
+    main = resolve_rev(git_repo, "main")
+    assert len(v1) == len(main) == 40
+    assert is_ancestor(git_repo, v1, main)
+    assert not is_ancestor(git_repo, main, v1)
+    with pytest.raises(RuntimeError, match="rev-parse"):
+        resolve_rev(git_repo, "unknown")
+
+
+def test_git_config(git_repo):
+    assert read_file(git_repo, "main", "pyproject.toml") is None
+    assert git_config(git_repo, rev="main") == {}
+    (git_repo / "pyproject.toml").write_text(
+        '[tool.changelist]\ntitle_template = "{version}"\n'
+    )
+    _git(git_repo, "add", "pyproject.toml")
+    _git(git_repo, "commit", "-m", "Configure changelist")
+    assert git_config(git_repo, rev="main") == {"title_template": "{version}"}
+    assert git_config(git_repo, rev="v1.0") == {}
@@ -0,0 +1,166 @@
+import io
+import threading
+
+import pytest
+import requests
+
+from changelist._http import LatencyStats, RequestPolicy, create_session, percentile
+from changelist._query import GitHubGraphQl
+
+
+def test_create_session():
+    session = create_session(pool_size=16)
+    adapter = session.get_adapter("https://api.github.com/graphql")
+    assert adapter._pool_maxsize == 16
+    assert adapter._pool_block
+    assert "gzip" in session.headers["Accept-Encoding"]
+
+
+def test_graphql_shared_session():
+    session = create_session()
+    ql = GitHubGraphQl(org_name="org", repo_name="repo", session=session)
+    other = GitHubGraphQl(org_name="org", repo_name="other", session=session)
+    assert ql.session is other.session
+    # Sessions aren't shared by default
+    assert GitHubGraphQl("org", "repo").session is not session
+
+
+def _request(method="GET", url="https://api.github.com/repos/org/repo"):
+    return requests.Request(method, url).prepare()
+
+
+def _response(status_code=200):
+    response = requests.Response()
+    response.status_code = status_code
+    response.raw = io.BytesIO()
+    return response
+
+
+class _FlakySend:
+    """Fails with the given outcomes first, then succeeds."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.timeouts = []
+
+    def __call__(self, request, *, timeout):
+        self.timeouts.append(timeout)
+        if self.outcomes:
+            outcome = self.outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return _response(outcome)
+        return _response(200)
+
+
+class Test_RequestPolicy:
+    def test_default_timeout(self):
+        policy = RequestPolicy(timeout=12)
+        send = _FlakySend()
+        policy.send(send, _request())
+        policy.send(send, _request(), timeout=5)
+        # Longer timeouts of callers, e.g. PyGithub's default, are shortened
+        policy.send(send, _request(), timeout=15)
+        assert send.timeouts == [12, 5, 12]
+
+    def test_retry_reads(self):
+        sleeps = []
+        policy = RequestPolicy(retries=3, sleep=sleeps.append)
+        send = _FlakySend(requests.ConnectionError(), requests.ReadTimeout(), 503)
+        assert policy.send(send, _request()).status_code == 200
+        assert len(send.timeouts) == 4
+        # Full jitter below the doubled backoff
+        assert all(0 <= s <= 0.5 * 2**i for i, s in enumerate(sleeps))
+
+    def test_retry_graphql_queries(self):
+        policy = RequestPolicy(sleep=lambda _: None)
+        send = _FlakySend(502)
+        request = _request("POST", "https://api.github.com/graphql")
+        assert policy.send(send, request).status_code == 200
+
+    def test_no_retry_writes(self):
+        policy = RequestPolicy(sleep=lambda _: None)
+        send = _FlakySend(requests.ConnectionError())
+        with pytest.raises(requests.ConnectionError):
+            policy.send(send, _request("POST"))
+        assert policy.send(_FlakySend(503), _request("POST")).status_code == 503
+
+    def test_give_up(self):
+        policy = RequestPolicy(retries=1, sleep=lambda _: None)
+        send = _FlakySend(503, 503, 503)
+        assert policy.send(send, _request()).status_code == 503
+        assert len(send.timeouts) == 2
+
+    def test_budget(self):
+        now = [0.0]
+        policy = RequestPolicy(timeout=30, budget=10, clock=lambda: now[0])
+        send = _FlakySend()
+        now[0] = 4
+        policy.send(send, _request())
+        assert send.timeouts == [6]
+        now[0] = 11
+        with pytest.raises(TimeoutError):
+            policy.send(send, _request())
+
+    def test_hedge(self):
+        release = threading.Event()
+        calls = []
+
+        def send(request, **_):
+            calls.append(request)
+            if len(calls) == 1:
+                # The first request stalls until the hedged one completed
+                release.wait(5)
+                return _response(500)
+            release.set()
+            return _response(200)
+
+        policy = RequestPolicy(hedge_after=0.01)
+        assert policy.send(send, _request()).status_code == 200
+        assert len(calls) == 2
+
+    def test_latencies(self):
+        latencies = LatencyStats()
+        policy = RequestPolicy(latencies=latencies)
+        with latencies.stage("commits"):
+            for _ in range(3):
+                policy.send(_FlakySend(), _request())
+        policy.send(_FlakySend(), _request())
+        samples = latencies.samples()
+        assert len(samples["commits"]) == 3
+        assert len(samples["other"]) == 1
+        assert str(latencies).startswith("commits: 3 requests, p50 ")
+
+    def test_stages_per_thread(self):
+        latencies = LatencyStats()
+        entered = threading.Barrier(2)
+
+        def run(name):
+            with latencies.stage(name):
+                # Both threads are within their stage at the same time
+                entered.wait(5)
+                latencies.record(1.0)
+                entered.wait(5)
+
+        threads = [threading.Thread(target=run, args=(n,)) for n in ["a", "b"]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert latencies.samples() == {"a": [1.0], "b": [1.0]}
+        assert latencies.current_stage == "other"
+
+        with latencies.stage("commits"):
+            bound = latencies.bind(lambda: latencies.record(2.0))
+        thread = threading.Thread(target=bound)
+        thread.start()
+        thread.join()
+        assert latencies.samples()["commits"] == [2.0]
+
+
+def test_percentile():
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 95) == 95
+    assert percentile(samples, 99) == 99
+    assert percentile([3.0], 99) == 3
@@ -0,0 +1,66 @@
+import json
+from datetime import timedelta
+
+from changelist._identity import IdentityIndex
+from changelist._records import UserInfo
+
+USER = UserInfo(
+    id=1, login="octocat", name="The Octocat", html_url="https://github.com/octocat"
+)
+
+
+class Test_IdentityIndex:
+    def test_lookup(self):
+        index = IdentityIndex()
+        index.add_identity("Octo Cat", "octo@example.com", 1)
+        index.add_identity("Anonymous", "anon@example.com", None)
+        assert ("Octo Cat", "octo@example.com") in index
+        assert ("Anonymous", "anon@example.com") in index
+        assert ("Someone", "someone@example.com") not in index
+
+        # User details aren't known yet
+        assert index.lookup("Octo Cat", "octo@example.com") is None
+        index.add_user(USER)
+        assert index.lookup("Octo Cat", "octo@example.com") == USER
+        assert index.lookup("Anonymous", "anon@example.com") is None
+        assert index.user_id("Octo Cat", "octo@example.com") == 1
+
+    def test_roundtrip(self, tmp_path):
+        path = tmp_path / "identities.json"
+        index = IdentityIndex(path)
+        index.add_identity("Octo Cat", "octo@example.com", 1)
+        index.add_identity("Anonymous", "anon@example.com", None)
+        index.add_user(USER)
+        index.save()
+
+        loaded = IdentityIndex.load(path)
+        assert len(loaded) == 2
+        assert loaded.user_id("Anonymous", "anon@example.com") is None
+        assert ("Anonymous", "anon@example.com") in loaded
+        user = loaded.lookup("Octo Cat", "octo@example.com")
+        assert (user.id, user.login, user.name, user.html_url) == (
+            USER.id,
+            USER.login,
+            USER.name,
+            USER.html_url,
+        )
+
+    def test_load_missing(self, tmp_path):
+        index = IdentityIndex.load(tmp_path / "missing.json")
+        assert len(index) == 0
+
+    def test_load_drops_old_users(self, tmp_path):
+        path = tmp_path / "identities.json"
+        index = IdentityIndex(path)
+        index.add_identity("Octo Cat", "octo@example.com", 1)
+        index.add_user(USER)
+        index.save()
+
+        data = json.loads(path.read_text())
+        data["users"][0]["fetched_at"] -= timedelta(days=2).total_seconds()
+        path.write_text(json.dumps(data))
+
+        loaded = IdentityIndex.load(path, max_age=timedelta(days=1))
+        # Identities are kept, only the user's details must be fetched again
+        assert loaded.user_id("Octo Cat", "octo@example.com") == 1
+        assert loaded.user(1) is None
@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+
+from changelist._config import DEFAULT_CONFIG_PATH, local_config
+from changelist._incremental import RunState
+from changelist._objects import ChangeNote, Contributor
+from changelist._records import CommitInfo, Label, PullRequestInfo, UserInfo
+
+DEFAULT_CONFIG = local_config(DEFAULT_CONFIG_PATH)
+
+USER = UserInfo(id=1, login="lungile", name="Nur Lungile", html_url="https://x.y")
+
+PULL = PullRequestInfo(
+    number=1,
+    title="Add `foo`",
+    body="```release-note\nAdd `foo` and `bar`.\n```",
+    labels=(Label("New feature"),),
+    merged=True,
+    merged_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    html_url="https://github.com/org/repo/pull/1",
+)
+
+
+def _state(**kwargs):
+    kwargs = {
+        "org_repo": "org/repo",
+        "start_rev": "v1.0",
+        "stop_rev": "main",
+        "stop_sha": "a" * 40,
+        "pr_summary_regex": DEFAULT_CONFIG["pr_summary_regex"],
+        "pr_summary_label_regex": DEFAULT_CONFIG["pr_summary_label_regex"],
+        **kwargs,
+    }
+    return RunState(**kwargs)
+
+
+class Test_RunState:
+    def test_roundtrip(self, tmp_path):
+        state = _state(
+            commits={
+                CommitInfo(
+                    sha="a" * 40,
+                    message="Add foo",
+                    html_url="https://github.com/org/repo/commit/a",
+                    author=USER,
+                    committer=None,
+                )
+            },
+            pull_requests={PULL},
+            change_notes={
+                ChangeNote(
+                    content="Add `foo` and `bar`.",
+                    reference_name="#1",
+                    reference_url=PULL.html_url,
+                    labels=("New feature",),
+                    timestamp=PULL.merged_at,
+                )
+            },
+            authors={Contributor(name=None, login="madhu", reference_url="x")},
+            reviewers={Contributor(name="Nur", login="lungile", reference_url="y")},
+        )
+        path = state.save(tmp_path)
+        assert path.parent == tmp_path
+
+        loaded = RunState.load(tmp_path, "org/repo", "v1.0", "main")
+        assert loaded == state
+        assert next(iter(loaded.commits)).author.name == "Nur Lungile"
+        assert RunState.load(tmp_path, "org/repo", "v1.0", "v2.0") is None
+
+    def test_checkpoint(self, tmp_path):
+        _state(complete=False).save(tmp_path)
+        assert not RunState.load(tmp_path, "org/repo", "v1.0", "main").complete
+
+    def test_merge(self):
+        previous = _state(
+            pull_requests={PULL},
+            change_notes=ChangeNote.from_pull_requests(
+                {PULL},
+                pr_summary_regex=DEFAULT_CONFIG["pr_summary_regex"],
+                pr_summary_label_regex=DEFAULT_CONFIG["pr_summary_label_regex"],
+            ),
+            authors={Contributor(name=None, login="madhu", reference_url="x")},
+        )
+        state = _state(
+            stop_sha="b" * 40,
+            authors={Contributor(name="Nur", login="lungile", reference_url="y")},
+        )
+        state.merge(previous)
+        assert {c.login for c in state.authors} == {"madhu", "lungile"}
+        assert {n.content for n in state.change_notes} == {"Add `foo` and `bar`."}
+
+    def test_merge_changed_options(self):
+        previous = _state(
+            pull_requests={PULL},
+            change_notes=ChangeNote.from_pull_requests(
+                {PULL},
+                pr_summary_regex=DEFAULT_CONFIG["pr_summary_regex"],
+                pr_summary_label_regex=DEFAULT_CONFIG["pr_summary_label_regex"],
+            ),
+        )
+        state = _state(pr_summary_regex="^unmatched(?P<summary>.*)")
+        state.merge(previous)
+        # Falls back to the title with the new options
+        assert {n.content for n in state.change_notes} == {"Add `foo`"}
@@ -0,0 +1,28 @@
+import pytest
+
+from changelist._manifest import ManifestEntry, parse_manifest, read_manifest
+
+
+def test_read_manifest(tmp_path):
+    path = tmp_path / "manifest.txt"
+    path.write_text("org/a v1.0 v1.1\n\n  org/b v0.2 main 0.3\n")
+    entries = read_manifest(path)
+    assert entries == [
+        ManifestEntry("org/a", "v1.0", "v1.1"),
+        ManifestEntry("org/b", "v0.2", "main", "0.3"),
+    ]
+    assert (entries[1].org_name, entries[1].repo_name) == ("org", "b")
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "org/a v1.0",
+        "org/a v1.0 v1.1 1.1 extra",
+        "a v1.0 v1.1",
+        "org/a v1.0 v1.1\norg/a v1.1 v1.2",
+    ],
+)
+def test_parse_manifest_invalid(text):
+    with pytest.raises(ValueError, match="manifest"):
+        parse_manifest(text)
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from changelist._config import add_config_defaults
+from changelist._model import NotesModel, load_models, parse_formats
+from changelist._objects import ChangeNote, Contributor
+
+
+def _model(version="1.0"):
+    note = ChangeNote(
+        content="Add feature",
+        reference_name="#1",
+        reference_url="https://github.com/org/repo/pull/1",
+        labels=("enhancement",),
+        timestamp=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+    user = Contributor(
+        name="Jane", login="jane", reference_url="https://github.com/jane"
+    )
+    return NotesModel.from_config(
+        add_config_defaults({}),
+        repo_name="repo",
+        version=version,
+        change_notes={note},
+        authors={user},
+        reviewers={user},
+    )
+
+
+def test_parse_formats():
+    assert parse_formats("md, rst,md") == ["md", "rst"]
+    for value in ["", "md,html"]:
+        with pytest.raises(ValueError, match="comma-separated list"):
+            parse_formats(value)
+
+
+def test_json_roundtrip(tmp_path):
+    models = [_model("1.0"), _model("1.1")]
+    path = tmp_path / "notes.json"
+    # Models written one per line can be concatenated
+    path.write_text("".join("".join(m.iter_lines("json")) for m in models))
+    loaded = load_models(path)
+    assert loaded == models
+    for format in ["md", "rst"]:
+        assert "".join(loaded[0].iter_lines(format)) == str(models[0].formatter(format))
+
+
+def test_unsupported_version():
+    data = _model().to_json() | {"format_version": 0}
+    with pytest.raises(ValueError, match="unsupported format version"):
+        NotesModel.from_json(data)
+
+
+def test_formatters_share_index():
+    model = _model()
+    md, rst = model.formatter("md"), model.formatter("rst")
+    assert md.label_classifier is rst.label_classifier is model.label_classifier
+    assert md._notes_by_section is rst._notes_by_section
+    assert str(md) == str(model.formatter("md"))
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+import requests
+
+from changelist._http import LatencyStats
+from changelist._profile import Profile, endpoint_of, stage
+
+REPO = "https://api.github.com/repos/org/repo"
+SHA = "0123456789abcdef0123456789abcdef01234567"
+
+
+@pytest.mark.parametrize(
+    ("method", "url", "expected"),
+    [
+        ("GET", REPO, "GET /repos/{owner}/{repo}"),
+        (
+            "GET",
+            f"{REPO}/commits/{SHA}/pulls",
+            "GET /repos/{owner}/{repo}/commits/{ref}/pulls",
+        ),
+        (
+            "GET",
+            f"{REPO}/compare/v1.0...main?page=2",
+            "GET /repos/{owner}/{repo}/compare/{basehead}",
+        ),
+        (
+            "GET",
+            f"{REPO}/contents/a/pyproject.toml",
+            "GET /repos/{owner}/{repo}/contents/{path}",
+        ),
+        (
+            "GET",
+            f"{REPO}/pulls/42/reviews",
+            "GET /repos/{owner}/{repo}/pulls/{id}/reviews",
+        ),
+        ("GET", "https://api.github.com/user/123", "GET /user/{id}"),
+        ("POST", "https://api.github.com/graphql", "POST /graphql"),
+    ],
+)
+def test_endpoint_of(method, url, expected):
+    assert endpoint_of(method, url) == expected
+
+
+def _response(url, *, content=b"{}", from_cache=False, revalidated=False, headers=None):
+    response = requests.Response()
+    response.headers.update(headers or {})
+    response.status_code = 200
+    response.url = url
+    response.request = requests.Request("GET", url).prepare()
+    response._content = content
+    response.from_cache = from_cache
+    response.revalidated = revalidated
+    return response
+
+
+class Test_Profile:
+    def test_record(self):
+        profile = Profile()
+        profile.record(_response(f"{REPO}/pulls/1", content=b"x" * 10))
+        profile.record(_response(f"{REPO}/pulls/2", content=b"x" * 5))
+        # Compressed responses are counted by their transferred size
+        profile.record(
+            _response(
+                f"{REPO}/pulls/3", content=b"x" * 50, headers={"Content-Length": "7"}
+            )
+        )
+        profile.record(_response(f"{REPO}/pulls/2", from_cache=True, revalidated=True))
+        data = profile.to_dict()
+        assert data["endpoints"] == {
+            "GET /repos/{owner}/{repo}/pulls/{id}": {
+                "requests": 4,
+                "cached": 1,
+                "revalidated": 1,
+                "bytes": 22,
+            }
+        }
+        assert data["cache"] == {"hits": 1, "misses": 3, "revalidated": 1}
+
+    def test_stage(self):
+        latencies = LatencyStats()
+        profile = Profile(latencies=latencies)
+        with stage("ignored"):
+            pass
+        with profile.activate():
+            with stage("commits"):
+                latencies.record(0.5)
+            with stage("commits"):
+                pass
+        assert set(profile.stages) == {"commits"}
+        assert latencies.samples() == {"commits": [0.5]}
+        assert profile.to_dict()["latencies"]["commits"]["p99"] == 0.5
+
+    def test_save(self, tmp_path):
+        profile = Profile()
+        with profile.activate(), stage("formatting"):
+            profile.record(_response(REPO))
+        path = tmp_path / "profile" / "run.json"
+        profile.save(path)
+        data = json.loads(path.read_text())
+        assert set(data["stages"]) == {"formatting"}
+        assert data["endpoints"]["GET /repos/{owner}/{repo}"]["requests"] == 1
+
+        table = profile.format_table()
+        assert "formatting" in table
+        assert "GET /repos/{owner}/{repo}" in table
@@ -0,0 +1,506 @@
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from changelist._config import DEFAULT_CONFIG_PATH, local_config
+from changelist._facts import FactStore
+from changelist._git import GitCommit
+from changelist._identity import IdentityIndex
+from changelist._objects import ChangeNote
+from changelist._query import (
+    GitHubGraphQl,
+    chunked,
+    contributors,
+    estimate_cost,
+    hydrate_users,
+    map_concurrently,
+    pull_requests_from_commits,
+)
+from changelist._records import CommitInfo, PullRequestInfo, UserInfo
+
+DEFAULT_CONFIG = local_config(DEFAULT_CONFIG_PATH)
+
+
+_COMMITTER = {
+    "name": "GitHub",
+    "email": "noreply@github.com",
+    "user": {"login": "web-flow", "databaseId": 1},
+}
+
+
+def _author_edge(user_id, login):
+    return {
+        "cursor": f"cursor-{user_id}",
+        "node": {
+            "name": login.title(),
+            "email": f"{login}@example.org",
+            "user": {"login": login, "databaseId": user_id},
+        },
+    }
+
+
+class _MockGitHubGraphQl(GitHubGraphQl):
+    """Answers queries with canned data instead of sending them to GitHub."""
+
+    def __init__(self, authors_by_sha, **kwargs):
+        super().__init__(org_name="org", repo_name="repo", **kwargs)
+        object.__setattr__(self, "authors_by_sha", authors_by_sha)
+        object.__setattr__(self, "queries", [])
+
+    def _run_query(self, query):
+        self.queries.append(query)
+        repository = {}
+        pattern = (
+            r'(?P<alias>\w+): object\(expression: "(?P<sha>\w+)" \)'
+            r"[^(]*authors\(first:(?P<first>\d+)(?: after:\"cursor-(?P<after>\d+)\")?"
+        )
+        for match in re.finditer(pattern, query):
+            edges = self.authors_by_sha[match["sha"]]
+            if match["after"]:
+                ids = [edge["node"]["user"]["databaseId"] for edge in edges]
+                edges = edges[ids.index(int(match["after"])) + 1 :]
+            first = int(match["first"])
+            repository[match["alias"]] = {
+                "oid": match["sha"],
+                "commitUrl": f"https://github.com/org/repo/commit/{match['sha']}",
+                "committer": _COMMITTER,
+                "authors": {
+                    "pageInfo": {
+                        "hasNextPage": len(edges) > first,
+                        "endCursor": edges[:first][-1]["cursor"],
+                    },
+                    "edges": edges[:first],
+                },
+            }
+        return {"data": {"repository": repository}}
+
+
+def _pull_request_node(number, labels=()):
+    return {
+        "number": number,
+        "title": f"Title of #{number}",
+        "body": None,
+        "url": f"https://github.com/org/repo/pull/{number}",
+        "merged": True,
+        "mergedAt": "2024-01-02T03:04:05Z",
+        "labels": {
+            "totalCount": len(labels),
+            "nodes": [{"name": label} for label in labels],
+        },
+    }
+
+
+class _MockPullRequestGraphQl(GitHubGraphQl):
+    """Answers queries for associated pull requests with canned data."""
+
+    def __init__(self, pulls_by_sha, **kwargs):
+        super().__init__(org_name="org", repo_name="repo", **kwargs)
+        object.__setattr__(self, "pulls_by_sha", pulls_by_sha)
+        object.__setattr__(self, "queries", [])
+
+    def _run_query(self, query):
+        self.queries.append(query)
+        repository = {}
+        pattern = r'(?P<alias>\w+): object\(expression: "(?P<sha>\w+)" \)'
+        for match in re.finditer(pattern, query):
+            nodes = self.pulls_by_sha[match["sha"]]
+            repository[match["alias"]] = {
+                "oid": match["sha"],
+                "commitUrl": f"https://github.com/org/repo/commit/{match['sha']}",
+                "associatedPullRequests": {"totalCount": len(nodes), "nodes": nodes},
+            }
+        nodes = {
+            node["number"]: node
+            for nodes in self.pulls_by_sha.values()
+            for node in nodes
+        }
+        pattern = r"(?P<alias>\w+): pullRequest\(number: (?P<number>\d+)\)"
+        for match in re.finditer(pattern, query):
+            repository[match["alias"]] = nodes.get(int(match["number"]))
+        return {"data": {"repository": repository}}
+
+
+class Test_GitHubGraphQl:
+    def test_find_authors_batched(self):
+        authors_by_sha = {
+            f"sha{i}": [_author_edge(i, f"user{i}"), _author_edge(1000, "common")]
+            for i in range(7)
+        }
+        ql = _MockGitHubGraphQl(authors_by_sha, BATCH_SIZE=3)
+        result = ql.find_authors_batched(authors_by_sha)
+        assert len(ql.queries) == 3
+        assert result == {f"sha{i}": {i: f"user{i}", 1000: "common"} for i in range(7)}
+
+    def test_find_authors_pagination(self):
+        authors_by_sha = {
+            "sha0": [_author_edge(i, f"user{i}") for i in range(5)],
+            "sha1": [_author_edge(10, "user10")],
+        }
+        ql = _MockGitHubGraphQl(authors_by_sha, PAGE_LIMIT=2)
+        result = ql.find_authors_batched(authors_by_sha)
+        # First query fetches both commits, two more to paginate authors of sha0
+        assert len(ql.queries) == 3
+        assert "sha1" not in ql.queries[1]
+        assert result["sha0"] == {i: f"user{i}" for i in range(5)}
+        assert result["sha1"] == {10: "user10"}
+
+    def test_find_authors(self):
+        ql = _MockGitHubGraphQl({"sha0": [_author_edge(1, "user1")]})
+        assert ql.find_authors("sha0") == {1: "user1"}
+
+    def test_find_pull_requests_batched(self):
+        pulls_by_sha = {
+            "sha0": [_pull_request_node(1, labels=["Bug fix"])],
+            "sha1": [_pull_request_node(1, labels=["Bug fix"])],
+            "sha2": [],
+            "sha3": [_pull_request_node(2), _pull_request_node(3)],
+        }
+        ql = _MockPullRequestGraphQl(pulls_by_sha, BATCH_SIZE=3)
+        result = ql.find_pull_requests_batched(pulls_by_sha)
+        assert len(ql.queries) == 2
+        assert result["sha0"] == result["sha1"]
+        assert result["sha2"] == []
+        assert [pull.number for pull in result["sha3"]] == [2, 3]
+
+        pull = result["sha0"][0]
+        assert pull.labels[0].name == "Bug fix"
+        assert pull.merged_at == datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        assert pull.html_url == "https://github.com/org/repo/pull/1"
+
+    def test_find_pull_requests_facts(self):
+        pulls_by_sha = {
+            "sha0": [_pull_request_node(1)],
+            "sha1": [],
+        }
+        facts = FactStore()
+        ql = _MockPullRequestGraphQl(pulls_by_sha, facts=facts)
+        first = ql.find_pull_requests_batched(["sha0", "sha1"])
+        assert len(ql.queries) == 1
+
+        ql = _MockPullRequestGraphQl(pulls_by_sha, facts=facts)
+        assert ql.find_pull_requests_batched(["sha0", "sha1"]) == first
+        # Known pull requests are requested by number, commits without any not
+        assert len(ql.queries) == 1
+        assert "associatedPullRequests" not in ql.queries[0]
+        assert "pullRequest(number: 1)" in ql.queries[0]
+
+    def test_find_pull_requests_facts_edited(self):
+        facts = FactStore()
+        pulls_by_sha = {"sha0": [_pull_request_node(1)]}
+        _MockPullRequestGraphQl(pulls_by_sha, facts=facts).find_pull_requests_batched(
+            ["sha0"]
+        )
+        # Titles, descriptions and labels are edited after merging
+        edited = {**_pull_request_node(1, labels=["Bug fix"]), "title": "Edited"}
+        ql = _MockPullRequestGraphQl({"sha0": [edited]}, facts=facts)
+        (pull,) = ql.find_pull_requests_batched(["sha0"])["sha0"]
+        assert pull.title == "Edited"
+        assert [label.name for label in pull.labels] == ["Bug fix"]
+
+    def test_find_pull_requests_facts_unmerged(self):
+        facts = FactStore()
+        unmerged = {**_pull_request_node(2), "merged": False, "mergedAt": None}
+        pulls_by_sha = {"sha0": [_pull_request_node(1), unmerged]}
+        for _ in range(2):
+            ql = _MockPullRequestGraphQl(pulls_by_sha, facts=facts)
+            result = ql.find_pull_requests_batched(["sha0"])
+            assert [pull.number for pull in result["sha0"]] == [1, 2]
+            # Commits with open pull requests may still be associated with others
+            assert "associatedPullRequests" in ql.queries[0]
+        assert facts.pull_numbers_of("org/repo", ["sha0"]) == {}
+
+
+class Test_PullRequestInfo:
+    def test_change_notes(self):
+        node = _pull_request_node(7, labels=["Documentation"])
+        node["body"] = "```release-note\nA summary.\n```"
+        pull = PullRequestInfo.from_graphql(node)
+        notes = ChangeNote.from_pull_requests(
+            {pull},
+            pr_summary_regex=DEFAULT_CONFIG["pr_summary_regex"],
+            pr_summary_label_regex=DEFAULT_CONFIG["pr_summary_label_regex"],
+        )
+        (note,) = notes
+        assert note.content == "A summary."
+        assert note.reference_name == "#7"
+        assert note.labels == ("Documentation",)
+
+
+class _MockUsersGraphQl(GitHubGraphQl):
+    """Answers queries for user nodes with canned data."""
+
+    def __init__(self, **kwargs):
+        super().__init__(org_name="org", repo_name="repo", **kwargs)
+        object.__setattr__(self, "queries", [])
+
+    def _run_query(self, query):
+        self.queries.append(query)
+        node_ids = re.search(r"nodes\(ids: \[(.*)\]\)", query)[1]
+        nodes = []
+        for node_id in json.loads(f"[{node_ids}]"):
+            user_id = int(node_id.removeprefix("U_"))
+            nodes.append(
+                {
+                    "id": node_id,
+                    "databaseId": user_id,
+                    "login": f"user{user_id}",
+                    "name": f"User {user_id}",
+                    "url": f"https://github.com/user{user_id}",
+                }
+            )
+        return {"data": {"nodes": nodes}}
+
+
+class Test_hydrate_users:
+    def test_batches(self):
+        ql = _MockUsersGraphQl()
+        identities = IdentityIndex()
+        users = [UserInfo(id=i, login=f"user{i}", node_id=f"U_{i}") for i in range(250)]
+        complete = hydrate_users(ql, users, identities=identities)
+        assert len(ql.queries) == 3
+        assert complete[42].name == "User 42"
+        assert complete[42].html_url == "https://github.com/user42"
+        assert identities.user(42) == complete[42]
+
+    def test_known_users(self):
+        ql = _MockUsersGraphQl()
+        identities = IdentityIndex()
+        identities.add_user(UserInfo(id=1, login="user1", name="Known"))
+        users = [
+            UserInfo(id=1, login="user1", node_id="U_1"),
+            UserInfo(id=2, login="user2", node_id="U_2"),
+        ]
+        complete = hydrate_users(ql, users, identities=identities)
+        assert len(ql.queries) == 1
+        assert "U_1" not in ql.queries[0]
+        assert complete[1].name == "Known"
+        assert complete[2].name == "User 2"
+
+        hydrate_users(ql, users, identities=identities)
+        assert len(ql.queries) == 1
+
+
+class _MockReviewsGraphQl(GitHubGraphQl):
+    """Answers queries for reviews of pull requests with canned data."""
+
+    def __init__(self, reviewers_by_number, **kwargs):
+        super().__init__(org_name="org", repo_name="repo", **kwargs)
+        object.__setattr__(self, "reviewers_by_number", reviewers_by_number)
+        object.__setattr__(self, "queries", [])
+
+    def _run_query(self, query):
+        self.queries.append(query)
+        repository = {}
+        pattern = (
+            r"(?P<alias>\w+): pullRequest\(number: (?P<number>\d+)\)"
+            r"[^(]*reviews\(first:(?P<first>\d+)(?: after:\"(?P<after>\d+)\")?"
+        )
+        for match in re.finditer(pattern, query):
+            logins = self.reviewers_by_number.get(int(match["number"]))
+            if logins is None:
+                repository[match["alias"]] = None
+                continue
+            start = int(match["after"] or 0)
+            stop = start + int(match["first"])
+            repository[match["alias"]] = {
+                "url": f"https://github.com/org/repo/pull/{match['number']}",
+                "reviews": {
+                    "pageInfo": {
+                        "hasNextPage": len(logins) > stop,
+                        "endCursor": str(stop),
+                    },
+                    "nodes": [
+                        {
+                            "author": {
+                                "login": login,
+                                "id": f"U_{login}",
+                                "databaseId": hash(login),
+                            }
+                            if login
+                            else None
+                        }
+                        for login in logins[start:stop]
+                    ],
+                },
+            }
+        return {"data": {"repository": repository}}
+
+
+class Test_find_reviewers_batched:
+    def test_batched(self):
+        reviewers_by_number = {
+            number: [f"reviewer{number % 3}", None] for number in range(60)
+        }
+        ql = _MockReviewsGraphQl(reviewers_by_number)
+        result = ql.find_reviewers_batched(range(60))
+        # 60 pull requests fit into 2 queries with a batch size of 50
+        assert len(ql.queries) == 2
+        assert {user.login for user in result[4]} == {"reviewer1"}
+        assert result[4] == {UserInfo(id=hash("reviewer1"), login="reviewer1")}
+
+    def test_paginated(self):
+        logins = [f"reviewer{i}" for i in range(250)]
+        ql = _MockReviewsGraphQl({1: logins, 2: ["other"]})
+        result = ql.find_reviewers_batched([1, 2])
+        assert len(ql.queries) == 3
+        assert {user.login for user in result[1]} == set(logins)
+        assert {user.login for user in result[2]} == {"other"}
+        # Only the pull request with more reviews is requested again
+        assert "number: 2" not in ql.queries[1]
+
+    def test_missing(self, caplog):
+        facts = FactStore()
+        ql = _MockReviewsGraphQl({1: ["reviewer"], 2: []}, facts=facts)
+        result = ql.find_reviewers_batched([1, 2, 3])
+        assert "could not find pull request #3" in caplog.text
+        assert set(result) == {1, 2}
+        # Missing pull requests aren't stored as having no reviewers
+        assert set(facts.reviewers_of("org/repo", [1, 2, 3])) == {1, 2}
+        ql.find_reviewers_batched([3])
+        assert "number: 3" in ql.queries[-1]
+
+
+@dataclass(frozen=True)
+class _MockPull:
+    """Mocks github.PullRequest.PullRequest partially."""
+
+    number: int
+    merged: bool = True
+
+    @property
+    def html_url(self):
+        return f"https://github.com/org/repo/pull/{self.number}"
+
+
+@dataclass(frozen=True)
+class _MockCommit:
+    """Mocks github.Commit.Commit partially."""
+
+    sha: str
+    pulls: tuple[_MockPull, ...]
+
+    @property
+    def html_url(self):
+        return f"https://github.com/org/repo/commit/{self.sha}"
+
+    def get_pulls(self):
+        time.sleep(0.001)
+        return iter(self.pulls)
+
+
+class Test_map_concurrently:
+    def test_order(self):
+        def slow_square(x):
+            time.sleep(0.001 * (x % 3))
+            return x * x
+
+        result = list(map_concurrently(slow_square, range(50), jobs=8))
+        assert result == [x * x for x in range(50)]
+
+    def test_threads(self):
+        result = set(
+            map_concurrently(lambda _: threading.get_ident(), range(20), jobs=4)
+        )
+        assert threading.get_ident() not in result
+
+    def test_sequential(self):
+        result = set(map_concurrently(lambda _: threading.get_ident(), range(5)))
+        assert result == {threading.get_ident()}
+
+    def test_bounded_lookahead(self):
+        consumed = []
+
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        results = map_concurrently(lambda x: x, items(), jobs=4)
+        assert next(results) == 0
+        assert len(consumed) <= 2 * 4
+
+
+def test_pull_requests_from_commits_jobs():
+    commits = [
+        _MockCommit(sha=f"sha{i}", pulls=(_MockPull(number=i // 2),)) for i in range(40)
+    ]
+    sequential = pull_requests_from_commits(commits)
+    concurrent = pull_requests_from_commits(commits, jobs=8)
+    assert sequential == concurrent
+    assert {pull.number for pull in concurrent} == set(range(20))
+
+
+def test_contributors_known_identities(monkeypatch):
+    def offline_post(url, **_):
+        msg = f"unexpected request to {url}"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr("requests.post", offline_post)
+    commit = GitCommit(
+        sha="abc",
+        message="Fix bug\n\nCo-authored-by: Co Author <co@example.org>",
+        html_url="https://github.com/org/repo/commit/abc",
+        author_name="Author",
+        author_email="author@example.org",
+        committer_name="GitHub",
+        committer_email="noreply@github.com",
+    )
+    identities = IdentityIndex()
+    for user_id, (name, email) in enumerate(
+        [
+            ("Author", "author@example.org"),
+            ("Co Author", "co@example.org"),
+            ("GitHub", "noreply@github.com"),
+        ],
+        start=1,
+    ):
+        identities.add_identity(name, email, user_id)
+        identities.add_user(UserInfo(id=user_id, login=name.lower()))
+
+    authors, reviewers = contributors("org/repo", [commit], [], identities=identities)
+    assert {user.login for user in authors} == {"author", "co author"}
+    assert {user.login for user in reviewers} == {"github"}
+
+
+def test_contributors_commit_info(monkeypatch):
+    def offline_post(url, **_):
+        msg = f"unexpected request to {url}"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr("requests.post", offline_post)
+    author = UserInfo(id=1, login="author", node_id="U_1")
+    committer = UserInfo(id=2, login="github", node_id="U_2")
+    commit = CommitInfo(
+        sha="abc",
+        message="Fix bug",
+        html_url="https://github.com/org/repo/commit/abc",
+        author=author,
+        committer=committer,
+    )
+    identities = IdentityIndex()
+    identities.add_user(author)
+    identities.add_user(committer)
+
+    authors, reviewers = contributors("org/repo", [commit], [], identities=identities)
+    assert authors == {author}
+    assert reviewers == {committer}
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 2)) == []
+
+
+def test_estimate_cost():
+    graphql = estimate_cost(120)
+    rest = estimate_cost(120, backend="rest")
+    local = estimate_cost(120, local=True)
+    assert rest.rest_requests == 3 + 1 + 2 * 120
+    assert graphql.rest_requests == 3 + 1
+    assert local.rest_requests == 0
+    assert graphql.graphql_queries > rest.graphql_queries
+    assert graphql.graphql_points >= graphql.graphql_queries
+    assert estimate_cost(0).graphql_queries == 0
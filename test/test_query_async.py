@@ -0,0 +1,265 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from changelist._query import GitHubGraphQl
+
+pytest.importorskip("httpx")
+
+from changelist._query_async import (
+    AsyncGitHub,
+    commits_between,
+    contributors,
+    pull_requests_from_commits,
+)
+
+
+def _user(user_id, login):
+    return {
+        "id": user_id,
+        "node_id": f"U_{user_id}",
+        "login": login,
+        "html_url": f"https://github.com/{login}",
+    }
+
+
+def _graphql_user(user):
+    return {"id": user["node_id"], "login": user["login"], "databaseId": user["id"]}
+
+
+def _commit(sha, message, author):
+    return {
+        "sha": sha,
+        "html_url": f"https://github.com/org/repo/commit/{sha}",
+        "commit": {"message": message},
+        "author": author,
+        "committer": _user(1, "web-flow"),
+    }
+
+
+def _pull(number):
+    return {
+        "number": number,
+        "title": f"Title of #{number}",
+        "body": None,
+        "labels": [{"name": "Bug fix"}],
+        "merged_at": "2024-01-02T03:04:05Z",
+        "html_url": f"https://github.com/org/repo/pull/{number}",
+    }
+
+
+USERS = {
+    1: _user(1, "web-flow"),
+    2: _user(2, "alice"),
+    3: _user(3, "bob"),
+    4: _user(4, "carol"),
+}
+
+COMMITS = [
+    _commit("sha0", "Fix a bug", USERS[2]),
+    _commit("sha1", "Add a feature\n\nCo-authored-by: Carol <c@a.rol>", USERS[3]),
+    _commit("sha2", "Fix bug again", USERS[2]),
+]
+
+ROUTES = {
+    "/repos/org/repo/compare/v1.0...main": (
+        {"commits": COMMITS[:2]},
+        '<{url}/repos/org/repo/compare/v1.0...main?page=2>; rel="next"',
+    ),
+    "/repos/org/repo/compare/v1.0...main?page=2": ({"commits": COMMITS[2:]}, None),
+    "/repos/org/repo/commits/sha0/pulls": ([_pull(10)], None),
+    "/repos/org/repo/commits/sha1/pulls": ([_pull(11)], None),
+    "/repos/org/repo/commits/sha2/pulls": ([_pull(10)], None),
+}
+
+# Reviewers of each pull request, `None` for deleted accounts
+REVIEWERS = {10: [USERS[3]], 11: [USERS[2], None]}
+
+
+class _FakeGitHubHandler(BaseHTTPRequestHandler):
+    """Serves canned responses of GitHub's REST and GraphQL API."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, data, link=None):
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(
+                self.server.max_in_flight, self.server.in_flight
+            )
+        time.sleep(0.01)
+        with self.server.lock:
+            self.server.in_flight -= 1
+
+        content = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        if link:
+            self.send_header("Link", link.format(url=self.server.url))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        path = re.sub(r"[?&]per_page=\d+", "", self.path).replace("?&", "?")
+        if path not in ROUTES:
+            self.send_error(404)
+            return
+        self._respond(*ROUTES[path])
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        query = json.loads(self.rfile.read(length))["query"]
+        self.server.queries.append(query)
+        if match := re.search(r"nodes\(ids: \[(.*?)\]\)", query):
+            nodes = []
+            for node_id in json.loads(f"[{match[1]}]"):
+                user = USERS[int(node_id.removeprefix("U_"))]
+                nodes.append(
+                    {
+                        **_graphql_user(user),
+                        "name": user["login"].title(),
+                        "url": user["html_url"],
+                    }
+                )
+            self._respond({"data": {"nodes": nodes}})
+            return
+        repository = {}
+        for alias, number in re.findall(r"(\w+): pullRequest\(number: (\d+)\)", query):
+            repository[alias] = {
+                "url": f"https://github.com/org/repo/pull/{number}",
+                "reviews": {
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                    "nodes": [
+                        {"author": user and _graphql_user(user)}
+                        for user in REVIEWERS[int(number)]
+                    ],
+                },
+            }
+        for alias, sha in re.findall(r'(\w+): object\(expression: "(\w+)" \)', query):
+            if "associatedPullRequests" in query:
+                nodes = [
+                    {
+                        "number": pull["number"],
+                        "title": pull["title"],
+                        "body": pull["body"],
+                        "url": pull["html_url"],
+                        "merged": True,
+                        "mergedAt": pull["merged_at"],
+                        "labels": {"totalCount": 1, "nodes": pull["labels"]},
+                    }
+                    for pull in ROUTES[f"/repos/org/repo/commits/{sha}/pulls"][0]
+                ]
+                repository[alias] = {
+                    "oid": sha,
+                    "commitUrl": f"https://github.com/org/repo/commit/{sha}",
+                    "associatedPullRequests": {"totalCount": 1, "nodes": nodes},
+                }
+            else:
+                edges = [
+                    {
+                        "cursor": "1",
+                        "node": {
+                            "name": "Bob",
+                            "email": "b@o.b",
+                            "user": _graphql_user(USERS[3]),
+                        },
+                    },
+                    {
+                        "cursor": "2",
+                        "node": {
+                            "name": "Carol",
+                            "email": "c@a.rol",
+                            "user": _graphql_user(USERS[4]),
+                        },
+                    },
+                ]
+                repository[alias] = {
+                    "oid": sha,
+                    "commitUrl": f"https://github.com/org/repo/commit/{sha}",
+                    "committer": {
+                        "name": "GitHub",
+                        "email": "noreply@github.com",
+                        "user": _graphql_user(USERS[1]),
+                    },
+                    "authors": {
+                        "pageInfo": {"hasNextPage": False, "endCursor": "2"},
+                        "edges": edges,
+                    },
+                }
+        self._respond({"data": {"repository": repository}})
+
+
+@pytest.fixture
+def fake_github():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeGitHubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.queries = []
+    server.paths = []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _run_pipeline(server, *, max_concurrency=4, ql=None):
+    async def pipeline():
+        async with AsyncGitHub(
+            "token", api_url=server.url, max_concurrency=max_concurrency
+        ) as client:
+            commits = await commits_between(client, "org/repo", "v1.0", "main")
+            pulls = await pull_requests_from_commits(client, "org/repo", commits, ql=ql)
+            authors, reviewers = await contributors(client, "org/repo", commits, pulls)
+        return commits, pulls, authors, reviewers
+
+    return asyncio.run(pipeline())
+
+
+class Test_AsyncPipeline:
+    def test_full(self, fake_github):
+        commits, pulls, authors, reviewers = _run_pipeline(fake_github)
+
+        assert {commit.sha for commit in commits} == {"sha0", "sha1", "sha2"}
+        assert {pull.number for pull in pulls} == {10, 11}
+        assert {user.login for user in authors} == {"alice", "bob", "carol"}
+        assert {user.login for user in reviewers} == {"web-flow", "alice", "bob"}
+        assert {user.name for user in authors} == {"Alice", "Bob", "Carol"}
+        # One query each for co-authors, reviews and the details of users
+        assert len(fake_github.queries) == 3
+        # Reviews and users aren't requested one at a time with the REST API
+        assert not [p for p in fake_github.paths if "/reviews" in p or "/user" in p]
+
+    def test_graphql_pull_requests(self, fake_github):
+        ql = GitHubGraphQl(org_name="org", repo_name="repo", BATCH_SIZE=2)
+        _, pulls, _, _ = _run_pipeline(fake_github, ql=ql)
+        assert {pull.number for pull in pulls} == {10, 11}
+        # Two queries for associated pull requests, one each for co-authors,
+        # reviews and users
+        assert len(fake_github.queries) == 5
+
+    def test_bounded_concurrency(self, fake_github):
+        _run_pipeline(fake_github, max_concurrency=2)
+        assert 1 <= fake_github.max_in_flight <= 2
+        # Connections are reused across requests
+        assert fake_github.connections <= 2
@@ -0,0 +1,118 @@
+import requests
+
+from changelist._ratelimit import RateLimitScheduler, resource_of
+
+NOW = 1_700_000_000.0
+
+
+def _response(status_code=200, headers=None, content=b"{}", url=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = content
+    response.url = url or "https://api.github.com/repos/org/repo"
+    return response
+
+
+def _rate_headers(remaining, *, limit=5000, reset=NOW + 100, resource="core"):
+    return {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(int(reset)),
+        "X-RateLimit-Resource": resource,
+    }
+
+
+class _Clock:
+    def __init__(self):
+        self.now = NOW
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_resource_of():
+    assert resource_of("https://api.github.com/graphql") == "graphql"
+    assert resource_of("https://api.github.com/search/issues?q=x") == "search"
+    assert resource_of("https://api.github.com/repos/org/repo") == "core"
+
+
+class Test_RateLimitScheduler:
+    def test_no_delay_with_enough_left(self):
+        clock = _Clock()
+        scheduler = RateLimitScheduler(clock=clock, sleep=clock.sleep)
+        assert scheduler.delay("core") == 0
+        scheduler.update(_response(headers=_rate_headers(4000)))
+        assert scheduler.delay("core") == 0
+
+    def test_spread_below_reserve(self):
+        clock = _Clock()
+        scheduler = RateLimitScheduler(clock=clock, sleep=clock.sleep)
+        scheduler.update(_response(headers=_rate_headers(50)))
+        # 100 seconds until reset are spread over the remaining 50 requests
+        assert scheduler.delay("core") == 2
+        assert scheduler.delay("core") == 100 / 49
+
+    def test_wait_for_reset(self):
+        clock = _Clock()
+        scheduler = RateLimitScheduler(clock=clock, sleep=clock.sleep)
+        scheduler.update(_response(headers=_rate_headers(0)))
+        scheduler.wait("core")
+        assert clock.sleeps == [100]
+        # The limit has been reset in the meantime
+        assert scheduler.delay("core") == 0
+
+    def test_retry_secondary_limit(self):
+        clock = _Clock()
+        scheduler = RateLimitScheduler(clock=clock, sleep=clock.sleep)
+        responses = [
+            _response(
+                403, content=b'{"message": "You have exceeded a secondary rate limit"}'
+            ),
+            _response(429, headers={"Retry-After": "30"}),
+            _response(200),
+        ]
+
+        def send(_):
+            return responses.pop(0)
+
+        request = requests.Request("GET", "https://api.github.com/repos/o/r").prepare()
+        response = scheduler.send(send, request)
+        assert response.status_code == 200
+        assert clock.sleeps == [60, 30]
+        assert scheduler.retries == 2
+
+    def test_forbidden_not_retried(self):
+        clock = _Clock()
+        scheduler = RateLimitScheduler(clock=clock, sleep=clock.sleep)
+        request = requests.Request("GET", "https://api.github.com/repos/o/r").prepare()
+        response = scheduler.send(lambda _: _response(403), request)
+        assert response.status_code == 403
+        assert clock.sleeps == []
+
+    def test_give_up(self):
+        clock = _Clock()
+        scheduler = RateLimitScheduler(max_retries=2, clock=clock, sleep=clock.sleep)
+        request = requests.Request("GET", "https://api.github.com/repos/o/r").prepare()
+        response = scheduler.send(
+            lambda _: _response(429, headers={"Retry-After": "1"}), request
+        )
+        assert response.status_code == 429
+        assert clock.sleeps == [1, 1]
+
+    def test_record_graphql(self):
+        scheduler = RateLimitScheduler()
+        url = "https://api.github.com/graphql"
+        headers = _rate_headers(4000, resource="graphql")
+        scheduler.update(_response(headers=headers, url=url))
+        scheduler.record_graphql(
+            {"cost": 6, "remaining": 3994, "resetAt": "2023-11-14T22:15:00Z"}
+        )
+        assert scheduler.graphql_cost == 6
+        assert scheduler.limits["graphql"].remaining == 3994
+        assert "6 GraphQL points spent" in str(scheduler)
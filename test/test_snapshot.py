@@ -0,0 +1,109 @@
+import json
+
+import pytest
+import requests
+
+from changelist._query import GitHubGraphQl
+from changelist._snapshot import Snapshot, aliased_fields, build_response
+
+REPO = "https://api.github.com/repos/org/repo"
+ARGS = {"org_repo": "org/repo", "start_rev": "v1.0", "stop_rev": "main"}
+
+
+def _graphql_request(query):
+    return requests.Request(
+        "POST", "https://api.github.com/graphql", data=json.dumps({"query": query})
+    ).prepare()
+
+
+def _reviews_query(numbers):
+    ql = GitHubGraphQl(org_name="org", repo_name="repo")
+    fields = "".join(
+        ql.GRAPHQL_PULL_REQUEST_REVIEWS.format(
+            alias=f"pull{i}", number=number, page_limit=ql.PAGE_LIMIT, after=""
+        )
+        for i, number in enumerate(numbers)
+    )
+    query = ql.GRAPHQL_REPOSITORY.format(
+        org_name="org", repo_name="repo", fields=fields
+    )
+    return query.replace("\n", "")
+
+
+def _reviews(number):
+    return {"url": f"https://github.com/org/repo/pull/{number}", "reviews": {}}
+
+
+def test_aliased_fields():
+    fields = dict(aliased_fields(_reviews_query([1, 2])))
+    assert list(fields) == ["pull0", "pull1"]
+    assert fields["pull0"].startswith("pullRequest(number: 1)")
+    assert fields["pull0"].endswith("}")
+    assert fields["pull0"].count("{") == fields["pull0"].count("}")
+
+
+def _send(request, **_):
+    if request.url.endswith("/graphql"):
+        query = json.loads(request.body)["query"]
+        data = {
+            "rateLimit": {"cost": 1, "remaining": 4999, "resetAt": "2030-01-01T00:00Z"},
+            "repository": {
+                alias: _reviews(int(text.split(")")[0].split()[-1]))
+                for alias, text in aliased_fields(query)
+            },
+        }
+        return build_response(request, 200, json.dumps({"data": data}).encode())
+    headers = {"Link": f'<{REPO}?page=2>; rel="next"', "X-RateLimit-Remaining": "0"}
+    return build_response(request, 200, b'{"name": "repo"}', headers)
+
+
+def test_snapshot_record_and_replay(tmp_path):
+    snapshot = Snapshot(ARGS)
+    snapshot.send(_send, requests.Request("GET", REPO).prepare())
+    snapshot.send(_send, _graphql_request(_reviews_query([1, 2, 3])))
+    assert len(snapshot) == 4
+    snapshot.save(tmp_path / "snapshot.json.gz")
+
+    replay = Snapshot.load(tmp_path / "snapshot.json.gz")
+    assert replay.args == ARGS
+
+    def unreachable(*_, **__):
+        raise AssertionError
+
+    response = replay.send(unreachable, requests.Request("GET", REPO).prepare())
+    assert response.json() == {"name": "repo"}
+    assert "Link" in response.headers
+    # Replays aren't paced by recorded rate limits
+    assert "X-RateLimit-Remaining" not in response.headers
+
+    # Fields are found regardless of the batch they were recorded in
+    response = replay.send(unreachable, _graphql_request(_reviews_query([3, 1])))
+    assert response.json()["data"]["repository"] == {
+        "pull0": _reviews(3),
+        "pull1": _reviews(1),
+    }
+    # Replays don't spend GraphQL points
+    assert "rateLimit" not in response.json()["data"]
+
+    with pytest.raises(LookupError, match="wasn't recorded"):
+        replay.send(unreachable, _graphql_request(_reviews_query([4])))
+    with pytest.raises(LookupError, match="wasn't recorded"):
+        replay.send(unreachable, requests.Request("GET", f"{REPO}/pulls").prepare())
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"data": None, "errors": [{"type": "RATE_LIMITED"}]},
+        {"data": {"repository": None}, "errors": [{"type": "NOT_FOUND"}]},
+        {"errors": [{"message": "Parse error"}]},
+    ],
+)
+def test_snapshot_skips_errors(body):
+    def send(request, **_):
+        return build_response(request, 200, json.dumps(body).encode())
+
+    snapshot = Snapshot(ARGS)
+    response = snapshot.send(send, _graphql_request(_reviews_query([1])))
+    assert response.json() == body
+    assert len(snapshot) == 0